@@ -10,8 +10,6 @@ from typing import Any
 
 import dotenv
 from flask import Flask, render_template
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 
 from .config import Config
 
@@ -45,14 +43,29 @@ def create_app(config_class: type[Config] = Config) -> Flask:
     app.config.from_object(config_class)
     
     # Инициализируем Flask-Limiter для защиты от bruteforce атаки
-    limiter = Limiter(
-        app=app,
-        key_func=get_remote_address,
-        default_limits=["200 per day", "50 per hour"],
-        storage_uri="memory://"
-    )
+    # (лимиты и хранилище счётчиков — RATELIMIT_* в конфигурации)
+    from .ratelimit import limiter
+    limiter.init_app(app)
     app.limiter = limiter
     
+    # Приблизительные лимиты заменяют точные для view, где адресов может быть очень много
+    app.approximate_limiters = {}
+    if app.config['RATELIMIT_APPROXIMATE']:
+        from .ratelimit import ApproximateLimiter
+        for endpoint, limit_key in (
+            ('auth.login', 'RATELIMIT_LOGIN'),
+            ('auth.register', 'RATELIMIT_REGISTER'),
+        ):
+            app.approximate_limiters[endpoint] = ApproximateLimiter(
+                app.config[limit_key],
+                app.config['RATELIMIT_SKETCH_EPSILON'],
+                app.config['RATELIMIT_SKETCH_DELTA'],
+                app.config['RATELIMIT_SKETCH_BUCKETS'],
+                app.config['RATELIMIT_SKETCH_NEAR_RATIO'],
+                name=endpoint,
+                strategy=limiter.limiter
+            )
+    
     if not app.debug and not app.testing:
         import logging
         if not app.logger.handlers:
@@ -70,54 +83,202 @@ def create_app(config_class: type[Config] = Config) -> Flask:
     cli.register_cli_commands(app)
     
     # Инициализируем сервисы
-    from .repositories import UserRepository, PostRepository, CommentRepository
-    from .services import JWTService, UserAuthService, PostService, CommentService
+    from .cache import NegativeCache, QueryCache, SharedCache, SingleFlight, TTLCache
+    from .db import get_db_path
+    from .models import codec
+    from .repositories import (
+        UserRepository, PostRepository, CommentRepository, RevokedTokenRepository,
+        LoginAttemptRepository
+    )
+    from .services import (
+        JWTService, UserAuthService, PostService, CommentService,
+        TokenVersionService, RevocationService, PasswordHasher, LoginResolver
+    )
+    from .services.login_attempt_service import LoginAttemptService
+    from .services.csrf_service import CSRFService
+    from .page_cache import init_page_cache
+    
+    def shareable_cache(name: str, maxsize: int, ttl: int):
+        """Кэш в общем файле, если он настроен, иначе в памяти процесса."""
+        if app.config['SHARED_CACHE_PATH']:
+            return SharedCache(
+                app.config['SHARED_CACHE_PATH'], name, maxsize, ttl,
+                app.config['SHARED_CACHE_MAX_BYTES'], codec.dumps, codec.loads
+            )
+        return TTLCache(maxsize, ttl, name=name)
+    
+    # Создаем кэши (статистика доступна через `flask cache-stats`)
+    app.caches = {
+        'posts': shareable_cache(
+            'posts',
+            app.config['POST_CACHE_SIZE'],
+            app.config['POST_CACHE_TTL']
+        ),
+        'users': shareable_cache(
+            'users',
+            app.config['USER_CACHE_SIZE'],
+            app.config['USER_CACHE_TTL']
+        ),
+        'jwt': TTLCache(
+            app.config['JWT_VERIFY_CACHE_SIZE'],
+            app.config['JWT_VERIFY_CACHE_TTL'],
+            name='jwt'
+        ),
+        'fragments': shareable_cache(
+            'fragments',
+            app.config['FRAGMENT_CACHE_SIZE'],
+            app.config['FRAGMENT_CACHE_TTL']
+        ),
+    }
+    
+    app.query_cache = QueryCache(
+        get_db_path(app.config['DATABASE_URL']),
+        app.config['QUERY_CACHE_SIZE'],
+        app.config['QUERY_CACHE_TTL']
+    )
     
     # Создаем экземпляры репозиториев
     app.user_repo = UserRepository()
     app.post_repo = PostRepository()
     app.comment_repo = CommentRepository()
+    app.token_repo = RevokedTokenRepository()
+    app.login_attempt_repo = LoginAttemptRepository()
     
     # Создаем экземпляры сервисов
-    app.jwt_service = JWTService()
-    app.auth_service = UserAuthService(app.user_repo, app.jwt_service)
-    app.post_service = PostService(app.post_repo)
-    app.comment_service = CommentService(app.comment_repo, app.post_repo)
-    # TODO: Создать CSRF сервис после реализации
-    # app.csrf_service = CSRFService(app.config['SECRET_KEY'])
+    app.jwt_service = JWTService(app.caches['jwt'])
+    app.token_versions = TokenVersionService(
+        app.user_repo, app.config['TOKEN_VERSION_REFRESH_SECONDS']
+    )
+    app.revocations = RevocationService(
+        app.token_repo,
+        app.config['REVOCATION_BLOOM_CAPACITY'],
+        app.config['REVOCATION_BLOOM_ERROR_RATE'],
+        app.config['REVOCATION_REBUILD_SECONDS']
+    )
+    app.password_hasher = PasswordHasher(
+        app.config['PASSWORD_POOL_WORKERS'],
+        app.config['PASSWORD_POOL_MAX_PENDING'] or None,
+        app.config['PASSWORD_POOL_TIMEOUT'],
+        app.config['PASSWORD_HASH_METHOD']
+    )
+    app.auth_service = UserAuthService(
+        app.user_repo, app.jwt_service, app.caches['users'],
+        app.token_versions, app.revocations, app.password_hasher
+    )
+    app.login_attempt_service = LoginAttemptService(
+        app.login_attempt_repo,
+        app.config['LOGIN_ATTEMPTS_MAX_KEYS'],
+        app.config['LOGIN_ATTEMPTS_FLUSH_SECONDS'],
+        app.config['LOGIN_ATTEMPTS_BATCH_SIZE'],
+        app.config['LOGIN_ATTEMPTS_RAW_DAYS'],
+        app.config['LOGIN_ATTEMPTS_TOTALS_DAYS']
+    )
+    app.login_resolver = LoginResolver(
+        app.user_repo,
+        app.auth_service,
+        app.login_attempt_service,
+        app.config['LOGIN_MAX_CANDIDATES']
+    )
+    use_bloom = app.config['NEGATIVE_CACHE_BLOOM']
+    app.post_service = PostService(
+        app.post_repo,
+        app.caches['posts'],
+        # Загрузку поста, сохранённого другим воркером, видно только в общем кэше
+        SingleFlight(
+            'posts',
+            app.config['SINGLE_FLIGHT_LOCK_DIR'] if app.config['SHARED_CACHE_PATH'] else None,
+            app.config['SINGLE_FLIGHT_TIMEOUT']
+        ),
+        missing_posts=NegativeCache(
+            'missing_posts',
+            app.config['NEGATIVE_CACHE_SIZE'],
+            app.config['NEGATIVE_CACHE_TTL'],
+            app.post_repo.find_all_ids if use_bloom else None,
+            rebuild_interval=app.config['NEGATIVE_CACHE_REBUILD_SECONDS']
+        )
+    )
+    init_page_cache(app)
+    app.comment_service = CommentService(
+        app.comment_repo,
+        app.post_repo,
+        app.post_service,
+        NegativeCache(
+            'missing_comments',
+            app.config['NEGATIVE_CACHE_SIZE'],
+            app.config['NEGATIVE_CACHE_TTL'],
+            app.comment_repo.find_all_ids if use_bloom else None,
+            rebuild_interval=app.config['NEGATIVE_CACHE_REBUILD_SECONDS']
+        )
+    )
+    app.csrf_service = CSRFService(
+        app.config['SECRET_KEY'],
+        app.config['CSRF_TOKEN_MAX_AGE'],
+        app.config['CSRF_COOKIE_NAME'],
+        app.config['SESSION_COOKIE_SECURE']
+    )
     
     # Регистрируем обработчики ошибок
     register_error_handlers(app)
     
-    # Подключаем JWT middleware
+    # Подключаем JWT middleware (пользователь загружается лениво)
     from . import auth
     app.before_request(auth.load_user_from_token)
+    app.after_request(auth.clear_invalid_auth_cookie)
+    
+    # Подключаем CSRF защиту (токен проверяется без сессии и БД)
+    from .services.csrf_service import set_csrf_cookie
+    
+    @app.before_request
+    def csrf_protect():
+        """Проверяет CSRF токен для небезопасных HTTP методов."""
+        if app.config['WTF_CSRF_ENABLED'] and not app.csrf_service.validate_request():
+            from flask import abort
+            abort(400, description="Invalid CSRF token")
     
-    # TODO: Подключить CSRF middleware после создания сервиса
-    # def csrf_protect():
-    #     """Проверяет CSRF токен для небезопасных HTTP методов."""
-    #     if not app.csrf_service.validate_request():
-    #         from flask import abort, flash, redirect, url_for
-    #         abort(400, description="Invalid CSRF token")
-    # 
-    # app.before_request(csrf_protect)
+    app.after_request(set_csrf_cookie)
     
     # Регистрируем blueprints
     from .views import auth_bp, blog_bp
     app.register_blueprint(auth_bp)
     app.register_blueprint(blog_bp)
     
-    # TODO: Добавить CSRF токен в контекст шаблонов после создания сервиса
+    @app.get('/health')
+    @limiter.exempt
+    def health():
+        """Проверка живости для балансировщика (без лимитов запросов)."""
+        return {'status': 'ok'}
+    
     @app.context_processor
     def inject_csrf_token():
-        """Временная заглушка для CSRF токена."""
-        return {'csrf_token': lambda: 'temp_csrf_token'}
+        """Добавляет в контекст шаблонов функцию csrf_token().
+        
+        Токен вычисляется только если шаблон его использует.
+        """
+        return {'csrf_token': app.csrf_service.get_token}
     
     @app.context_processor
     def inject_current_user():
-        """Добавляет текущего пользователя в контекст шаблонов."""
+        """Добавляет текущего пользователя в контекст шаблонов.
+        
+        Прокси откладывает проверку токена до первого обращения
+        шаблона к current_user. Общая оболочка страницы рендерится
+        без пользователя: его данные выводятся только через hole().
+        """
+        from werkzeug.local import LocalProxy
         from .auth import get_current_user
-        return {'current_user': get_current_user()}
+        from .holes import is_shell_render
+        if is_shell_render():
+            return {'current_user': None}
+        return {'current_user': LocalProxy(get_current_user)}
+    
+    # Тег {% cache %} для фрагментов, общих для всех пользователей
+    from .fragment_cache import FragmentCacheExtension
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = app.caches['fragments']
+    
+    # hole('имя', ...) — персональный фрагмент в общей оболочке страницы
+    from .holes import hole
+    app.jinja_env.globals['hole'] = hole
     
     # Добавляем фильтр для преобразования переносов строк в HTML
     @app.template_filter('nl2br')
@@ -127,16 +288,30 @@ def create_app(config_class: type[Config] = Config) -> Flask:
             return ''
         return text.replace('\n', '<br>\n')
     
+    # Прогреваем кэши до того, как воркер начнёт принимать запросы
+    app.warmup_report = None
+    if app.config['WARMUP_ON_STARTUP']:
+        from .warmup import warm_up
+        app.warmup_report = warm_up(
+            app,
+            app.config['WARMUP_RECENT_POSTS'],
+            app.config['WARMUP_LISTING_PAGES']
+        )
+        app.logger.info(app.warmup_report.summary())
+        for error in app.warmup_report.errors:
+            app.logger.warning("Прогрев: %s", error)
+    
     return app
 
 
 def register_error_handlers(app: Flask) -> None:
     """Регистрирует обработчики ошибок согласно стандартам Flask 3.0."""
+    from .page_cache import error_page
     
     @app.errorhandler(404)
     def page_not_found(error):
         """Обработка ошибки 404."""
-        return render_template('errors/404.html'), 404
+        return error_page(404)
     
     @app.errorhandler(500)
     def internal_error(error):
@@ -146,4 +321,8 @@ def register_error_handlers(app: Flask) -> None:
     @app.errorhandler(Exception)
     def handle_exception(e):
         """Обработка непредвиденных исключений."""
+        from werkzeug.exceptions import HTTPException
+        if isinstance(e, HTTPException):
+            # 429 от лимитера и прочие HTTP ошибки отдаём со своим кодом
+            return e
         return render_template('errors/500.html', error=str(e)), 500
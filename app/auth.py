@@ -14,14 +14,32 @@
 from functools import wraps
 from typing import Callable, Optional
 
-from flask import current_app, g, redirect, request, session, url_for
+from flask import current_app, g, redirect, request, url_for
+
+
+def _auth_failure_response():
+    """Формирует ответ для запроса без валидной авторизации.
+    
+    Returns:
+        JSON-ошибка 401 для API или редирект на страницу входа
+    """
+    # Если это API запрос, возвращаем 401
+    if request.path.startswith('/api/'):
+        return {'error': 'Требуется авторизация'}, 401
+    
+    # Иначе перенаправляем на страницу входа
+    response = redirect(url_for('auth.login'))
+    if g.get('auth_token_invalid'):
+        # Токен невалиден, удаляем cookie
+        response.delete_cookie('auth_token')
+    return response
 
 
 def login_required(f: Callable) -> Callable:
     """Декоратор для защиты маршрутов требующих авторизации.
     
-    Проверяет наличие валидного JWT токена в cookies и устанавливает
-    текущего пользователя в flask.g.current_user
+    Использует общий для запроса контекст авторизации (get_current_user),
+    поэтому токен проверяется не более одного раза за запрос.
     
     Args:
         f: Декорируемая функция
@@ -31,27 +49,8 @@ def login_required(f: Callable) -> Callable:
     """
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # Проверяем, есть ли токен в cookies
-        token = request.cookies.get('auth_token')
-        
-        if not token:
-            # Если это API запрос, возвращаем 401
-            if request.path.startswith('/api/'):
-                return {'error': 'Требуется авторизация'}, 401
-            # Иначе перенаправляем на страницу входа
-            return redirect(url_for('auth.login'))
-        
-        # Проверяем валидность токена
-        user = current_app.auth_service.get_user_by_token(token)
-        
-        if not user:
-            # Токен невалиден, удаляем cookie
-            response = redirect(url_for('auth.login'))
-            response.delete_cookie('auth_token')
-            return response
-        
-        # Устанавливаем текущего пользователя
-        g.current_user = user
+        if get_current_user() is None:
+            return _auth_failure_response()
         
         return f(*args, **kwargs)
     
@@ -72,19 +71,10 @@ def admin_required(f: Callable) -> Callable:
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Сначала проверяем авторизацию
-        token = request.cookies.get('auth_token')
-        
-        if not token:
-            if request.path.startswith('/api/'):
-                return {'error': 'Требуется авторизация'}, 401
-            return redirect(url_for('auth.login'))
-        
-        user = current_app.auth_service.get_user_by_token(token)
+        user = get_current_user()
         
-        if not user:
-            response = redirect(url_for('auth.login'))
-            response.delete_cookie('auth_token')
-            return response
+        if user is None:
+            return _auth_failure_response()
         
         # Проверяем права администратора
         if not user.is_admin:
@@ -92,21 +82,41 @@ def admin_required(f: Callable) -> Callable:
                 return {'error': 'Требуются права администратора'}, 403
             return redirect(url_for('blog.index'))
         
-        # Устанавливаем текущего пользователя
-        g.current_user = user
-        
         return f(*args, **kwargs)
     
     return decorated_function
 
 
+def _resolve_current_user() -> Optional[object]:
+    """Проверяет JWT токен из cookies и загружает пользователя.
+    
+    Returns:
+        Пользователь или None если токена нет или он невалиден
+    """
+    token = g.get('auth_token', request.cookies.get('auth_token'))
+    if not token:
+        return None
+    
+    user = current_app.auth_service.get_user_by_token(token)
+    if user is None:
+        # Cookie будет удалена в clear_invalid_auth_cookie
+        g.auth_token_invalid = True
+    return user
+
+
 def get_current_user() -> Optional[object]:
     """Получает текущего авторизованного пользователя.
     
+    Пользователь загружается лениво при первом обращении и
+    запоминается в flask.g до конца запроса: маршруты и шаблоны,
+    которые не используют current_user, не проверяют токен вовсе.
+    
     Returns:
         Текущий пользователь или None если не авторизован
     """
-    return getattr(g, 'current_user', None)
+    if 'current_user' not in g:
+        g.current_user = _resolve_current_user()
+    return g.current_user
 
 
 def is_authenticated() -> bool:
@@ -129,29 +139,32 @@ def is_admin() -> bool:
 
 
 def load_user_from_token():
-    """Middleware для загрузки пользователя из JWT токена.
+    """Middleware для подготовки контекста авторизации.
     
-    Вызывается перед каждым запросом для установки текущего пользователя
-    на основе JWT токена в cookies.
+    Вызывается перед каждым запросом и только запоминает токен из
+    cookies: проверка подписи и загрузка пользователя откладываются
+    до первого вызова get_current_user().
     """
     # Пропускаем статические файлы и ошибки
     if request.endpoint == 'static' or request.path.startswith('/static/'):
         return
     
     # Пробуем получить токен из cookies
-    token = request.cookies.get('auth_token')
+    g.auth_token = request.cookies.get('auth_token')
+
+
+def clear_invalid_auth_cookie(response):
+    """Удаляет cookie с невалидным токеном после обработки запроса.
     
-    if token:
-        # Проверяем валидность токена
-        user = current_app.auth_service.get_user_by_token(token)
+    Args:
+        response: Flask response объект
         
-        if user:
-            # Устанавливаем текущего пользователя
-            g.current_user = user
-        else:
-            # Токен невалиден, удаляем cookie
-            if hasattr(request, 'response'):
-                request.response.delete_cookie('auth_token')
+    Returns:
+        Тот же response
+    """
+    if g.get('auth_token_invalid'):
+        response.delete_cookie('auth_token')
+    return response
 
 
 def set_auth_cookie(response, token: str, remember_me: bool = False):
@@ -0,0 +1,30 @@
+"""Кэши приложения.
+
+Применяемые паттерны:
+- Cache-Aside — сервисы читают через кэш и заполняют его при промахе
+- Observer — кэши сбрасываются по сигналам из app.signals
+- Strategy — TTLCache в памяти процесса или SharedCache в общем файле
+- Versioned Keys — QueryCache сбрасывает результаты запросов версиями таблиц
+- Event Log — InvalidationLog передаёт сбросы кэша страниц другим процессам
+
+Применяемые принципы:
+- Bounded memory — все кэши ограничены по размеру
+- Observability — каждый кэш отдаёт статистику через stats()
+"""
+
+from .bloom import BloomFilter
+from .count_min import CountMinSketch, WindowedCountMinSketch
+from .invalidation import InvalidationLog
+from .lru import TTLCache
+from .negative import NegativeCache
+from .page import CachedPage, PageCache
+from .query import QueryCache
+from .shared import SharedCache
+from .single_flight import SingleFlight
+from .sliding_window import SlidingWindowCounter
+
+__all__ = [
+    'BloomFilter', 'TTLCache', 'SlidingWindowCounter', 'CountMinSketch', 'WindowedCountMinSketch',
+    'CachedPage', 'PageCache', 'SingleFlight', 'NegativeCache', 'SharedCache',
+    'QueryCache', 'InvalidationLog',
+]
@@ -0,0 +1,97 @@
+"""Фильтр Блума для быстрых отрицательных ответов.
+
+Применяемые паттерны:
+- Probabilistic Data Structure — «точно нет» или «возможно да»
+- Double Hashing — k позиций из одного хэша (Kirsch–Mitzenmacher)
+
+Применяемые принципы:
+- Bounded memory — размер битового массива рассчитывается заранее
+- Observability — оценка ложноположительных срабатываний и памяти
+"""
+
+import hashlib
+import math
+from typing import Any, Hashable
+
+
+class BloomFilter:
+    """Фильтр Блума поверх bytearray.
+    
+    Размер и число хэш-функций подбираются по ожидаемому количеству
+    элементов и допустимой вероятности ложного срабатывания.
+    Удаление не поддерживается — фильтр перестраивается целиком.
+    """
+    
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        """Инициализирует пустой фильтр.
+        
+        Args:
+            capacity: Ожидаемое количество элементов
+            error_rate: Допустимая доля ложных срабатываний при capacity элементах
+        """
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        
+        # m = -n·ln(p) / ln(2)^2, k = m/n · ln(2)
+        bits = -self.capacity * math.log(error_rate) / (math.log(2) ** 2)
+        self.num_bits = max(8, int(math.ceil(bits)))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item: Hashable) -> list[int]:
+        """Вычисляет позиции битов для элемента."""
+        digest = hashlib.blake2b(repr(item).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+    
+    def add(self, item: Hashable) -> None:
+        """Добавляет элемент в фильтр.
+        
+        Args:
+            item: Элемент (ключ хэшируется по repr)
+        """
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+    
+    def __contains__(self, item: Hashable) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Размер битового массива в байтах."""
+        return len(self._bits)
+    
+    def false_positive_rate(self) -> float:
+        """Оценивает текущую вероятность ложного срабатывания.
+        
+        Returns:
+            (1 - e^(-k·n/m))^k для текущего числа элементов
+        """
+        if not self.count:
+            return 0.0
+        fill = 1.0 - math.exp(-self.num_hashes * self.count / self.num_bits)
+        return fill ** self.num_hashes
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает параметры и заполненность фильтра.
+        
+        Returns:
+            Словарь с размером, числом хэшей и оценкой ошибки
+        """
+        return {
+            'count': self.count,
+            'capacity': self.capacity,
+            'bits': self.num_bits,
+            'hashes': self.num_hashes,
+            'memory_bytes': self.memory_bytes,
+            'false_positive_rate': self.false_positive_rate(),
+        }
@@ -0,0 +1,200 @@
+"""Count-Min Sketch для приблизительного подсчёта событий по ключам.
+
+Применяемые паттерны:
+- Probabilistic Data Structure — оценка сверху без хранения ключей
+- Conservative Update — увеличиваются только минимальные счётчики
+- Time Buckets — скользящее окно из нескольких скетчей по времени
+
+Применяемые принципы:
+- Fixed memory — размер не зависит от количества различных ключей
+- Explicit error bounds — ширина и глубина выводятся из epsilon и delta
+- Thread safety — одна блокировка на операцию
+
+Оценка никогда не меньше настоящего значения и с вероятностью не ниже
+1 - delta превышает его не больше чем на epsilon·N, где N — сумма всех
+событий в скетче.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from array import array
+from typing import Any, Hashable, Optional
+
+
+class CountMinSketch:
+    """Матрица счётчиков depth × width."""
+    
+    def __init__(self, width: int, depth: int):
+        """Инициализирует пустой скетч.
+        
+        Args:
+            width: Количество счётчиков в строке
+            depth: Количество строк (хэш-функций)
+        """
+        self.width = max(1, int(width))
+        self.depth = max(1, int(depth))
+        self._rows = [array('I', bytes(4 * self.width)) for _ in range(self.depth)]
+        self.total = 0
+    
+    @classmethod
+    def from_error(cls, epsilon: float, delta: float) -> 'CountMinSketch':
+        """Создаёт скетч с заданными границами ошибки.
+        
+        Args:
+            epsilon: Допустимая ошибка как доля суммы всех событий
+            delta: Вероятность превысить эту ошибку
+        
+        Returns:
+            Скетч шириной ⌈e/epsilon⌉ и глубиной ⌈ln(1/delta)⌉
+        """
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)))
+    
+    def _columns(self, key: Hashable) -> list[int]:
+        """Вычисляет столбец ключа в каждой строке."""
+        digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+    
+    def add(self, key: Hashable, amount: int = 1) -> int:
+        """Учитывает событие ключа.
+        
+        Args:
+            key: Ключ (хэшируется по repr)
+            amount: Количество событий
+        
+        Returns:
+            Оценка количества событий ключа после добавления
+        """
+        columns = self._columns(key)
+        estimate = min(row[col] for row, col in zip(self._rows, columns)) + amount
+        for row, col in zip(self._rows, columns):
+            if row[col] < estimate:
+                row[col] = min(estimate, 0xFFFFFFFF)
+        self.total += amount
+        return estimate
+    
+    def estimate(self, key: Hashable) -> int:
+        """Оценивает количество событий ключа сверху.
+        
+        Args:
+            key: Ключ
+        
+        Returns:
+            Оценка количества событий
+        """
+        return min(row[col] for row, col in zip(self._rows, self._columns(key)))
+    
+    def clear(self) -> None:
+        """Обнуляет все счётчики."""
+        for row in self._rows:
+            row[:] = array('I', bytes(4 * self.width))
+        self.total = 0
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Размер счётчиков в байтах."""
+        return self.depth * self.width * 4
+
+
+class WindowedCountMinSketch:
+    """Скетчи по интервалам времени, покрывающие скользящее окно.
+    
+    Окно делится на buckets интервалов; хранится buckets + 1 скетч,
+    поэтому оценка учитывает события не меньше чем за всё окно.
+    """
+    
+    def __init__(
+        self,
+        window: float,
+        epsilon: float = 0.001,
+        delta: float = 0.01,
+        buckets: int = 6,
+        name: str = 'sketch'
+    ):
+        """Инициализирует скетч.
+        
+        Args:
+            window: Длина окна в секундах
+            epsilon: Допустимая ошибка как доля событий в скетче
+            delta: Вероятность превысить эту ошибку
+            buckets: Количество интервалов в окне
+            name: Имя скетча для статистики
+        """
+        self.window = float(window)
+        self.epsilon = epsilon
+        self.delta = delta
+        self.name = name
+        self.buckets = max(1, int(buckets))
+        self.bucket_seconds = self.window / self.buckets
+        self._sketches = [
+            CountMinSketch.from_error(epsilon, delta) for _ in range(self.buckets + 1)
+        ]
+        self._slot: Optional[int] = None
+        self._lock = threading.Lock()
+        self.rotations = 0
+    
+    def _rotate(self, now: float) -> CountMinSketch:
+        """Обнуляет устаревшие интервалы и возвращает скетч текущего."""
+        slot = int(now // self.bucket_seconds)
+        if self._slot is None:
+            self._slot = slot
+        elif slot > self._slot:
+            for expired in range(self._slot + 1, min(slot, self._slot + len(self._sketches)) + 1):
+                self._sketches[expired % len(self._sketches)].clear()
+            self.rotations += slot - self._slot
+            self._slot = slot
+        return self._sketches[slot % len(self._sketches)]
+    
+    def add(self, key: Hashable, now: Optional[float] = None) -> int:
+        """Учитывает событие ключа.
+        
+        Args:
+            key: Ключ
+            now: Время события (по умолчанию — сейчас)
+        
+        Returns:
+            Оценка сверху количества событий ключа в окне
+        """
+        with self._lock:
+            current = self._rotate(time.time() if now is None else now)
+            estimate = current.add(key)
+            return estimate + sum(
+                sketch.estimate(key) for sketch in self._sketches if sketch is not current
+            )
+    
+    def estimate(self, key: Hashable, now: Optional[float] = None) -> int:
+        """Оценивает сверху количество событий ключа в окне.
+        
+        Args:
+            key: Ключ
+            now: Текущее время (по умолчанию — сейчас)
+        
+        Returns:
+            Оценка количества событий
+        """
+        with self._lock:
+            self._rotate(time.time() if now is None else now)
+            return sum(sketch.estimate(key) for sketch in self._sketches)
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает параметры и память скетча.
+        
+        Returns:
+            Словарь с размерами, границами ошибки и количеством событий
+        """
+        sketch = self._sketches[0]
+        return {
+            'name': self.name,
+            'width': sketch.width,
+            'depth': sketch.depth,
+            'buckets': self.buckets,
+            'window': self.window,
+            'epsilon': self.epsilon,
+            'delta': self.delta,
+            'events': sum(s.total for s in self._sketches),
+            'memory_bytes': sum(s.memory_bytes for s in self._sketches),
+            'rotations': self.rotations,
+        }
@@ -0,0 +1,156 @@
+"""Журнал сбросов кэша, общий для процессов (воркеров) одного хоста.
+
+Применяемые паттерны:
+- Event Log — сброс тегов записывается строкой в таблицу SQLite, каждый
+  процесс читает строки после последней прочитанной
+- Observer — кэш процесса применяет чужие сбросы к своим записям
+
+Применяемые принципы:
+- Shared state — сброс в одном воркере виден всем воркерам хоста
+- Fail safe — если журнал не прочитался, вызывающий код считает свои
+  записи устаревшими
+- Bounded storage — строки старше retention секунд удаляются при записи
+
+Журнал нужен кэшам, которые живут в памяти процесса (страницы,
+оболочки, посты и пользователи без SHARED_CACHE_PATH): сигналы
+tags_invalidated доходят только до подписчиков своего процесса. Тег
+ALL_TAGS означает сброс всех записей. Строка старше retention никому не
+нужна: записи, сохранённые до неё, уже истекли.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+from .tags import ALL_TAGS
+
+logger = logging.getLogger(__name__)
+
+__all__ = ['ALL_TAGS', 'InvalidationLog']
+
+
+class InvalidationLog:
+    """Сбросы тегов одного кэша в общем файле SQLite."""
+    
+    def __init__(self, path: str, name: str, retention: float):
+        """Инициализирует журнал.
+        
+        Args:
+            path: Путь к файлу SQLite, общему для процессов
+            name: Имя кэша — пространство сбросов в файле
+            retention: Сколько секунд хранить строки (не меньше TTL кэша)
+        """
+        self.path = path
+        self.name = name
+        self.retention = retention
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._last_seq = 0
+        # Собственные строки, которые poll() должен пропустить
+        self._published: set[int] = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает соединение (заново после fork).
+        
+        Новый процесс начинает чтение с конца журнала: его кэш пуст.
+        Вызывается под self._lock.
+        """
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                ns TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )""")
+            self._last_seq = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM cache_invalidations"
+            ).fetchone()[0]
+            self._published.clear()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+    
+    def _failed(self, operation: str, error: Exception) -> None:
+        """Учитывает ошибку файла журнала и закрывает соединение."""
+        self.errors += 1
+        self._conn = None
+        logger.warning("Журнал сбросов %s: ошибка %s: %s", self.name, operation, error)
+    
+    def publish(self, tags: Iterable[str]) -> None:
+        """Записывает сброс тегов для остальных процессов.
+        
+        Args:
+            tags: Сброшенные теги (ALL_TAGS — все записи)
+        """
+        tags = sorted(set(tags))
+        if not tags:
+            return
+        
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                cursor = conn.execute(
+                    "INSERT INTO cache_invalidations (ns, tags, created_at) VALUES (?, ?, ?)",
+                    (self.name, ' '.join(tags), now)
+                )
+                self._published.add(cursor.lastrowid)
+                conn.execute(
+                    "DELETE FROM cache_invalidations WHERE ns = ? AND created_at < ?",
+                    (self.name, now - self.retention)
+                )
+            except sqlite3.Error as e:
+                self._failed('записи', e)
+                return
+        self.published += 1
+    
+    def poll(self) -> Optional[list[frozenset[str]]]:
+        """Возвращает сбросы других процессов, появившиеся с прошлого вызова.
+        
+        Returns:
+            Список множеств тегов (по одному на сброс) или None, если
+            журнал прочитать не удалось
+        """
+        with self._lock:
+            try:
+                rows = self._connect().execute(
+                    """SELECT seq, tags FROM cache_invalidations
+                       WHERE seq > ? AND ns = ? ORDER BY seq""",
+                    (self._last_seq, self.name)
+                ).fetchall()
+            except sqlite3.Error as e:
+                self._failed('чтения', e)
+                return None
+            
+            events = []
+            for seq, tags in rows:
+                self._last_seq = seq
+                if seq in self._published:
+                    self._published.discard(seq)
+                    continue
+                events.append(frozenset(tags.split(' ')))
+        self.received += len(events)
+        return events
+    
+    def stats(self) -> dict[str, int]:
+        """Возвращает счётчики журнала.
+        
+        Returns:
+            Количество записанных и полученных сбросов и ошибок файла
+        """
+        return {
+            'published': self.published,
+            'received': self.received,
+            'errors': self.errors,
+        }
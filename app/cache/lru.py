@@ -0,0 +1,178 @@
+"""LRU-кэш с ограничением времени жизни записей.
+
+Применяемые паттерны:
+- Cache-Aside — сервис сам решает, что класть в кэш
+- LRU (Least Recently Used) — вытеснение давно не использованных записей
+- Stale-While-Revalidate — истёкшая запись ещё stale_ttl секунд доступна
+  через get_stale(), пока значение пересчитывается
+
+Применяемые принципы:
+- Bounded memory — размер кэша ограничен сверху
+- Observability — счётчики попаданий, промахов и вытеснений
+- Thread safety — одна блокировка на операцию
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с TTL для записей.
+    
+    Размер 0 отключает кэш: get всегда промахивается, set ничего не делает.
+    """
+    
+    def __init__(self, maxsize: int, ttl: float, name: str = 'cache', stale_ttl: float = 0.0):
+        """Инициализирует кэш.
+        
+        Args:
+            maxsize: Максимальное количество записей (0 — кэш выключен)
+            ttl: Время жизни записи в секундах
+            name: Имя кэша для статистики
+            stale_ttl: Сколько секунд истёкшая запись доступна через get_stale()
+        """
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl)
+        self.stale_ttl = max(0.0, float(stale_ttl))
+        self.name = name
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Проверяет, включён ли кэш."""
+        return self.maxsize > 0
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение по ключу или default.
+        
+        Args:
+            key: Ключ записи
+            default: Значение при промахе
+        
+        Returns:
+            Закэшированное значение или default
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            
+            expires_at, value = entry
+            now = time.monotonic()
+            if expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    del self._data[key]
+                    self.expirations += 1
+                self.misses += 1
+                return default
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def get_stale(self, key: Hashable, default: Any = None) -> tuple[Any, bool]:
+        """Возвращает значение, в том числе истёкшее не более stale_ttl назад.
+        
+        Args:
+            key: Ключ записи
+            default: Значение при промахе
+        
+        Returns:
+            Пара (значение или default, True если запись истекла)
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default, False
+            
+            expires_at, value = entry
+            now = time.monotonic()
+            if expires_at + self.stale_ttl <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default, False
+            
+            self._data.move_to_end(key)
+            if expires_at <= now:
+                self.misses += 1
+                return value, True
+            self.hits += 1
+            return value, False
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение, вытесняя самую старую запись при переполнении.
+        
+        Args:
+            key: Ключ записи
+            value: Значение
+            ttl: Собственное время жизни записи (по умолчанию — ttl кэша)
+        """
+        if not self.enabled:
+            return
+        
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key: Hashable) -> bool:
+        """Удаляет запись по ключу.
+        
+        Args:
+            key: Ключ записи
+        
+        Returns:
+            True если запись была в кэше
+        """
+        with self._lock:
+            if self._data.pop(key, None) is None:
+                return False
+            self.invalidations += 1
+            return True
+    
+    def clear(self) -> None:
+        """Удаляет все записи, сохраняя счётчики."""
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику кэша.
+        
+        Returns:
+            Словарь с размером и счётчиками кэша
+        """
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
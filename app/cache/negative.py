@@ -0,0 +1,167 @@
+"""Кэш отсутствующих записей (negative caching).
+
+Применяемые паттерны:
+- Negative Cache — ID, которого нет в БД, запоминается на ttl секунд
+- Bloom Filter — ID не из фильтра существующих записей точно отсутствует
+- Lazy Rebuild — фильтр строится при первом обращении и по таймеру
+
+Применяемые принципы:
+- Bounded memory — отрицательные записи лежат в TTLCache с ограничением
+- Fail open — при ошибке загрузки ID фильтр не используется, запросы идут в БД
+- Observability — счётчики ответов из фильтра и из кэша
+
+ID в таблицах растут монотонно, поэтому с фильтром кэш отвечает только
+за ID не больше максимума на момент последней перестройки: записи,
+созданные после неё (и этим, и другими процессами), получают большие ID
+и проверяются в БД до следующей перестройки.
+Без фильтра отсутствующий ID может оказаться созданным в другом
+процессе, и такой ответ устаревает не дольше чем через ttl.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional
+
+from .bloom import BloomFilter
+from .lru import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class NegativeCache:
+    """Множество заведомо отсутствующих ID одной таблицы."""
+    
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        load_ids: Optional[Callable[[], Iterable[int]]] = None,
+        error_rate: float = 0.001,
+        rebuild_interval: float = 300.0
+    ):
+        """Инициализирует кэш.
+        
+        Args:
+            name: Имя кэша для статистики
+            maxsize: Максимальное количество отрицательных записей (0 — выключен)
+            ttl: Время жизни отрицательной записи в секундах
+            load_ids: Загрузка всех существующих ID для фильтра (None — без фильтра)
+            error_rate: Целевая доля ложных срабатываний фильтра
+            rebuild_interval: Интервал перестройки фильтра в секундах
+        """
+        self.missing = TTLCache(maxsize, ttl, name=name)
+        self.load_ids = load_ids if self.missing.enabled else None
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self._filter: Optional[BloomFilter] = None
+        self._max_id = 0
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.filter_negatives = 0
+        self.rebuilds = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Проверяет, включён ли кэш."""
+        return self.missing.enabled
+    
+    def rebuild(self) -> bool:
+        """Перестраивает фильтр из существующих ID.
+        
+        Returns:
+            True если фильтр построен, False при ошибке загрузки
+        """
+        if self.load_ids is None:
+            return False
+        
+        with self._lock:
+            try:
+                ids = list(self.load_ids())
+            except Exception as e:
+                logger.warning("Не удалось загрузить ID для фильтра %s: %s", self.missing.name, e)
+                self._filter = None
+                # Повторим после следующего интервала, а не на каждом запросе
+                self._built_at = time.monotonic()
+                return False
+            
+            bloom = BloomFilter(max(1024, 2 * len(ids)), self.error_rate)
+            for record_id in ids:
+                bloom.add(record_id)
+            self._filter = bloom
+            self._max_id = max(ids, default=0)
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+        return True
+    
+    def _ensure_fresh(self) -> None:
+        """Перестраивает фильтр по таймеру или при переполнении."""
+        if self.load_ids is None:
+            return
+        if (
+            self._built_at is None
+            or time.monotonic() - self._built_at > self.rebuild_interval
+            or (self._filter is not None and self._filter.count > self._filter.capacity)
+        ):
+            self.rebuild()
+    
+    def is_missing(self, record_id: int) -> bool:
+        """Проверяет, что записи с таким ID точно нет.
+        
+        Args:
+            record_id: ID записи
+        
+        Returns:
+            True если запрос к БД можно не делать
+        """
+        if not self.enabled:
+            return False
+        
+        self._ensure_fresh()
+        bloom = self._filter
+        if bloom is not None and record_id <= self._max_id and record_id not in bloom:
+            self.filter_negatives += 1
+            return True
+        return self.missing.get(record_id) is not None
+    
+    def mark_missing(self, record_id: int) -> None:
+        """Запоминает, что записи с таким ID нет в БД.
+        
+        Args:
+            record_id: ID записи
+        """
+        if self.load_ids is not None and record_id > self._max_id:
+            # Такой ID может появиться в другом процессе до перестройки фильтра
+            return
+        self.missing.set(record_id, True)
+    
+    def add(self, record_id: int) -> None:
+        """Отмечает ID как существующий (после вставки).
+        
+        Args:
+            record_id: ID записи
+        """
+        self.missing.invalidate(record_id)
+        with self._lock:
+            if self._filter is not None:
+                # Граница _max_id не сдвигается: ID между ней и record_id
+                # могли создать другие процессы, а в фильтре их нет
+                self._filter.add(record_id)
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику кэша и фильтра.
+        
+        Returns:
+            Статистика TTLCache, ответы фильтра и параметры фильтра
+        """
+        stats = self.missing.stats()
+        bloom = self._filter
+        stats.update(
+            filter_negatives=self.filter_negatives,
+            filter_ids=bloom.count if bloom is not None else 0,
+            filter_bytes=bloom.memory_bytes if bloom is not None else 0,
+            max_id=self._max_id,
+            rebuilds=self.rebuilds,
+        )
+        return stats
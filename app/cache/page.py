@@ -0,0 +1,326 @@
+"""Кэш отрендеренных страниц для анонимных посетителей.
+
+Применяемые паттерны:
+- Cache-Aside — обработчик страницы заполняет кэш при промахе
+- Precomputation — gzip-вариант и ETag вычисляются один раз при записи
+- Generation Counter — рендер, начатый до сброса кэша, не сохраняется
+- Hole Punching — рядом со страницами хранятся оболочки с метками
+  персональных фрагментов (см. app.holes)
+- Surrogate Key — записи помечены тегами сущностей и сбрасываются точечно
+- Single Flight — истёкшую страницу рендерит один запрос, остальные ждут
+  его или получают прежнюю версию (stale-while-revalidate)
+- Event Log — сбросы публикуются в общий журнал (InvalidationLog), и
+  каждый поиск сначала применяет сбросы других процессов
+
+Применяемые принципы:
+- Bounded memory — записи лежат в TTLCache с ограничением размера
+- Observability — статистика попаданий и ответов 304 через stats()
+- Fail safe — если журнал недоступен, записи процесса сбрасываются
+"""
+
+import gzip
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+from .invalidation import ALL_TAGS, InvalidationLog
+from .lru import TTLCache
+from .single_flight import SingleFlight
+from .tags import TagIndex
+
+
+@dataclass(frozen=True, slots=True)
+class CachedPage:
+    """Готовый к отдаче ответ."""
+    body: bytes
+    gzip_body: Optional[bytes]  # None — сжатие не выгодно
+    etag: str  # Сильный ETag несжатого варианта (без кавычек)
+    last_modified: int  # Unix timestamp рендеринга
+    mimetype: str
+    tags: frozenset[str] = frozenset()  # Суррогатные ключи страницы
+    
+    @property
+    def gzip_etag(self) -> str:
+        """Сильный ETag сжатого варианта (представления различаются побайтно)."""
+        return f"{self.etag}-gz"
+
+
+@dataclass(frozen=True, slots=True)
+class CachedShell:
+    """Оболочка страницы с метками персональных фрагментов."""
+    html: str
+    tags: frozenset[str] = frozenset()
+
+
+class PageCache:
+    """Кэш страниц по ключу запроса."""
+    
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        gzip_level: int = 6,
+        gzip_min_size: int = 512,
+        stale_ttl: float = 0.0,
+        flight: Optional[SingleFlight] = None,
+        invalidations: Optional[InvalidationLog] = None,
+        listener: Optional[Callable[[frozenset[str]], None]] = None
+    ):
+        """Инициализирует кэш.
+        
+        Args:
+            maxsize: Максимальное количество страниц (0 — кэш выключен)
+            ttl: Время жизни страницы в секундах
+            gzip_level: Уровень сжатия gzip (1-9)
+            gzip_min_size: Минимальный размер тела для сжатия в байтах
+            stale_ttl: Сколько секунд истёкшая страница отдаётся, пока её
+                перерисовывает другой запрос
+            flight: Группа объединения рендеров (по умолчанию — внутри процесса)
+            invalidations: Журнал сбросов, общий с другими процессами
+                (None — кэш сбрасывается только в своём процессе)
+            listener: Вызывается с тегами каждого сброса из другого
+                процесса, чтобы сбросить остальные кэши процесса
+        """
+        self.pages = TTLCache(maxsize, ttl, name='pages', stale_ttl=stale_ttl)
+        self.shells = TTLCache(maxsize, ttl, name='shells', stale_ttl=stale_ttl)
+        self.tags = TagIndex()
+        self.flight = flight if flight is not None else SingleFlight('pages')
+        self.invalidations = invalidations
+        self.listener = listener
+        self.gzip_level = gzip_level
+        self.gzip_min_size = gzip_min_size
+        self.generation = 0
+        self._lock = threading.Lock()
+        self.not_modified = 0
+        self.stale_renders = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Проверяет, включён ли кэш."""
+        return self.pages.enabled
+    
+    def sync(self) -> None:
+        """Применяет сбросы, сделанные другими процессами.
+        
+        Журнал читается и при выключенном кэше страниц: по нему listener
+        сбрасывает кэши объектов процесса.
+        """
+        if self.invalidations is None:
+            return
+        events = self.invalidations.poll()
+        if events is None:
+            # Без журнала нельзя убедиться, что записи не устарели
+            self._clear()
+            return
+        for tags in events:
+            if ALL_TAGS in tags:
+                self._clear()
+            else:
+                self._invalidate(tags)
+            if self.listener is not None:
+                self.listener(tags)
+    
+    def get(self, key: Hashable) -> Optional[CachedPage]:
+        """Возвращает страницу по ключу.
+        
+        Args:
+            key: Ключ запроса
+        
+        Returns:
+            Закэшированная страница или None
+        """
+        self.sync()
+        return self.pages.get(key)
+    
+    def lookup(self, key: Hashable) -> tuple[Optional[CachedPage], bool]:
+        """Возвращает страницу, в том числе истёкшую не более stale_ttl назад.
+        
+        Args:
+            key: Ключ запроса
+        
+        Returns:
+            Пара (страница или None, True если страница истекла)
+        """
+        self.sync()
+        return self.pages.get_stale(key)
+    
+    def lookup_shell(self, key: Hashable) -> tuple[Optional[CachedShell], bool]:
+        """Возвращает оболочку, в том числе истёкшую не более stale_ttl назад.
+        
+        Args:
+            key: Ключ запроса
+        
+        Returns:
+            Пара (оболочка или None, True если оболочка истекла)
+        """
+        self.sync()
+        return self.shells.get_stale(key)
+    
+    def get_shell(self, key: Hashable) -> Optional[CachedShell]:
+        """Возвращает оболочку страницы по ключу.
+        
+        Args:
+            key: Ключ запроса
+        
+        Returns:
+            Оболочка с метками персональных фрагментов или None
+        """
+        self.sync()
+        return self.shells.get(key)
+    
+    def store_shell(
+        self,
+        key: Hashable,
+        html: str,
+        generation: int,
+        tags: Iterable[str] = ()
+    ) -> CachedShell:
+        """Сохраняет оболочку страницы, если кэш не сбрасывался.
+        
+        Args:
+            key: Ключ запроса
+            html: HTML с метками персональных фрагментов
+            generation: Значение generation до начала рендеринга
+            tags: Теги сущностей, показанных на странице
+        
+        Returns:
+            Оболочка (возвращается даже если не сохранена)
+        """
+        shell = CachedShell(html, frozenset(tags))
+        self._set_if_current(self.shells, key, shell, generation)
+        return shell
+    
+    def _set_if_current(self, store: TTLCache, key: Hashable, value: Any, generation: int) -> None:
+        """Сохраняет запись, только если с начала рендеринга не было сброса."""
+        # Сброс в другом процессе во время рендеринга тоже меняет generation
+        self.sync()
+        with self._lock:
+            if generation != self.generation:
+                # Данные изменились во время рендеринга — запись может быть устаревшей
+                self.stale_renders += 1
+                return
+            store.set(key, value)
+            self.tags.add((store.name, key), value.tags)
+        
+        # Вытесненные и истёкшие записи остаются в индексе до чистки
+        if len(self.tags) > 4 * store.maxsize:
+            self.tags.prune(self._alive)
+    
+    def _alive(self, entry: tuple[str, Hashable]) -> bool:
+        """Проверяет, что запись индекса ещё лежит в своём кэше."""
+        name, key = entry
+        return key in (self.pages if name == self.pages.name else self.shells)
+    
+    def store(
+        self,
+        key: Hashable,
+        body: bytes,
+        mimetype: str,
+        generation: int,
+        tags: Iterable[str] = ()
+    ) -> CachedPage:
+        """Строит запись страницы и сохраняет её, если кэш не сбрасывался.
+        
+        Args:
+            key: Ключ запроса
+            body: Отрендеренное тело ответа
+            mimetype: MIME-тип ответа
+            generation: Значение generation до начала рендеринга
+            tags: Теги сущностей, показанных на странице
+        
+        Returns:
+            Запись страницы (возвращается даже если не сохранена)
+        """
+        gzip_body = None
+        if len(body) >= self.gzip_min_size:
+            compressed = gzip.compress(body, self.gzip_level, mtime=0)
+            if len(compressed) < len(body):
+                gzip_body = compressed
+        
+        page = CachedPage(
+            body=body,
+            gzip_body=gzip_body,
+            etag=hashlib.blake2b(body, digest_size=16).hexdigest(),
+            last_modified=int(time.time()),
+            mimetype=mimetype,
+            tags=frozenset(tags)
+        )
+        
+        self._set_if_current(self.pages, key, page, generation)
+        return page
+    
+    def _clear(self) -> None:
+        """Удаляет все записи процесса."""
+        with self._lock:
+            self.generation += 1
+            self.pages.clear()
+            self.shells.clear()
+            self.tags.clear()
+    
+    def _invalidate(self, tags: Iterable[str]) -> int:
+        """Удаляет записи процесса, помеченные любым из тегов."""
+        with self._lock:
+            self.generation += 1
+            entries = self.tags.pop(tags)
+            for name, key in entries:
+                (self.pages if name == self.pages.name else self.shells).invalidate(key)
+        return len(entries)
+    
+    def _publish(self, tags: Iterable[str]) -> None:
+        """Передаёт сброс другим процессам через журнал."""
+        if self.invalidations is not None:
+            self.invalidations.publish(tags)
+    
+    def clear(self, sender: Any = None, **extra: Any) -> None:
+        """Удаляет все страницы во всех процессах (подписчик сигналов)."""
+        self._clear()
+        self._publish([ALL_TAGS])
+    
+    def invalidate_tags(self, sender: Any = None, tags: Iterable[str] = (), **extra: Any) -> int:
+        """Удаляет страницы и оболочки, помеченные любым из тегов.
+        
+        Подписчик сигнала tags_invalidated. Рендеры, начатые до вызова,
+        не сохраняются: данные могли измениться у них под ногами. Другие
+        процессы получают сброс через журнал при следующем поиске.
+        
+        Args:
+            sender: Отправитель сигнала
+            tags: Изменившиеся теги
+        
+        Returns:
+            Количество удалённых записей в этом процессе
+        """
+        tags = list(tags)
+        removed = self._invalidate(tags)
+        self._publish(tags)
+        return removed
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику кэша.
+        
+        Returns:
+            Статистика TTLCache, оболочек, ответы 304, отброшенные рендеры
+            и объединение одновременных рендеров
+        """
+        stats = self.pages.stats()
+        shells = self.shells.stats()
+        flight = self.flight.stats()
+        stats.update({
+            'shells': shells['size'],
+            'shell_hits': shells['hits'],
+            'shell_misses': shells['misses'],
+            'tagged': len(self.tags),
+            'tag_invalidations': self.tags.invalidated,
+            'generation': self.generation,
+            'not_modified': self.not_modified,
+            'stale_renders': self.stale_renders,
+            'external_invalidations': (
+                self.invalidations.stats()['received'] if self.invalidations else 0
+            ),
+            'renders': flight['leaders'],
+            'coalesced': flight['shared'],
+            'stale_served': flight['stale_served'],
+        })
+        return stats
@@ -0,0 +1,236 @@
+"""Кэш результатов SQL запросов с версиями таблиц.
+
+Применяемые паттерны:
+- Query Cache — результат читающего запроса хранится по отпечатку
+  запроса, параметрам и версиям таблиц, которые он читает
+- Versioned Keys — запись в таблицу увеличивает её версию, и старые
+  ключи больше не совпадают (сбрасывать записи по одной не нужно)
+- Change Detection — PRAGMA data_version на отдельном подключении
+  показывает записи в файл БД в обход хелперов db.py и из других процессов
+
+Применяемые принципы:
+- Opt-in — кэшируются только запросы, вызванные с cache=True
+- Bounded memory — результаты лежат в TTLCache с ограничением
+- Fail open — при ошибке проверки версии БД запрос идёт в БД
+
+Записи через execute_insert/execute_update/execute_batch увеличивают
+версии своих таблиц сразу. Неизвестная запись (чужой процесс, прямой
+get_db()) увеличивает общую эпоху, и промахиваются все запросы. Запись
+другого процесса, совпавшая по времени с локальной, может остаться
+незамеченной — такой результат устаревает не дольше чем через ttl.
+"""
+
+import logging
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Hashable, Optional
+
+try:
+    import sqlite3
+except ImportError:
+    import pysqlite3 as sqlite3
+
+from .lru import TTLCache
+from .single_flight import MISSING
+
+logger = logging.getLogger(__name__)
+
+_READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+_WRITE_TABLE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)'
+    r'\s+([A-Za-z_][A-Za-z0-9_]*)',
+    re.IGNORECASE
+)
+_WHITESPACE = re.compile(r'\s+')
+
+# Удаление строки затрагивает таблицы со ссылками на неё (ON DELETE CASCADE)
+CASCADES: dict[str, tuple[str, ...]] = {
+    'users': ('posts', 'comments', 'user_roles'),
+    'posts': ('comments',),
+    'roles': ('user_roles',),
+}
+
+
+@lru_cache(maxsize=512)
+def statement_info(query: str) -> tuple[str, tuple[str, ...]]:
+    """Разбирает читающий запрос.
+    
+    Args:
+        query: SQL запрос
+    
+    Returns:
+        Пара (отпечаток — запрос без лишних пробелов, читаемые таблицы)
+    """
+    fingerprint = _WHITESPACE.sub(' ', query).strip()
+    tables = tuple(sorted({name.lower() for name in _READ_TABLES.findall(fingerprint)}))
+    return fingerprint, tables
+
+
+@lru_cache(maxsize=512)
+def written_tables(query: str) -> Optional[tuple[str, ...]]:
+    """Определяет таблицы, которые меняет запрос, вместе с каскадными.
+    
+    Args:
+        query: SQL запрос INSERT/UPDATE/DELETE/REPLACE
+    
+    Returns:
+        Кортеж таблиц или None, если таблицу определить не удалось
+    """
+    match = _WRITE_TABLE.match(query)
+    if match is None:
+        return None
+    table = match.group(1).lower()
+    return (table,) + CASCADES.get(table, ())
+
+
+def _copy(result: Any) -> Any:
+    """Копирует строки результата, чтобы вызывающий код не менял кэш."""
+    if isinstance(result, list):
+        return [dict(row) for row in result]
+    if isinstance(result, dict):
+        return dict(result)
+    return result
+
+
+class QueryCache:
+    """Кэш результатов читающих запросов к одному файлу SQLite."""
+    
+    def __init__(self, db_path: str, maxsize: int, ttl: float):
+        """Инициализирует кэш.
+        
+        Args:
+            db_path: Путь к файлу БД (для ':memory:' кэш выключен: у каждого
+                подключения своя база)
+            maxsize: Максимальное количество результатов (0 — кэш выключен)
+            ttl: Время жизни результата в секундах
+        """
+        self.db_path = db_path
+        self.results = TTLCache(
+            maxsize if db_path and db_path != ':memory:' else 0, ttl, name='queries'
+        )
+        self._versions: dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        self._data_version: Optional[int] = None
+        self.local_writes = 0
+        self.external_writes = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Проверяет, включён ли кэш."""
+        return self.results.enabled
+    
+    def _read_data_version(self) -> int:
+        """Читает PRAGMA data_version на собственном подключении процесса.
+        
+        Значение меняется после каждого коммита других подключений, поэтому
+        подключение должно жить долго; после fork открывается новое.
+        Вызывается под self._lock.
+        """
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn_pid = os.getpid()
+            self._data_version = None
+        return self._conn.execute('PRAGMA data_version').fetchone()[0]
+    
+    def _check_external_writes(self) -> bool:
+        """Увеличивает эпоху, если файл БД изменился без ведома кэша.
+        
+        Returns:
+            False если версию БД прочитать не удалось
+        """
+        with self._lock:
+            try:
+                current = self._read_data_version()
+            except sqlite3.Error as e:
+                logger.warning("Не удалось прочитать data_version: %s", e)
+                self._conn = None
+                return False
+            if self._data_version is not None and current != self._data_version:
+                self._epoch += 1
+                self.external_writes += 1
+            self._data_version = current
+        return True
+    
+    def _key(self, query: str, params: tuple, mode: str) -> Optional[Hashable]:
+        """Ключ результата с текущими версиями читаемых таблиц."""
+        fingerprint, tables = statement_info(query)
+        if not tables:
+            return None
+        versions = tuple(self._versions.get(table, 0) for table in tables)
+        return fingerprint, params, mode, versions, self._epoch
+    
+    def get(self, query: str, params: tuple, mode: str) -> tuple[Optional[Hashable], Any]:
+        """Ищет результат запроса.
+        
+        Args:
+            query: SQL запрос
+            params: Параметры запроса
+            mode: 'one' или 'all' (fetch_one/fetch_all)
+        
+        Returns:
+            Пара (ключ для store или None, если запрос не кэшируется;
+            копия результата или MISSING при промахе)
+        """
+        if not self.enabled or not self._check_external_writes():
+            return None, MISSING
+        key = self._key(query, params, mode)
+        if key is None:
+            return None, MISSING
+        # Результат хранится в кортеже: None — допустимый ответ fetch_one
+        entry = self.results.get(key)
+        return key, _copy(entry[0]) if entry is not None else MISSING
+    
+    def store(self, key: Hashable, result: Any) -> None:
+        """Сохраняет результат, полученный по ключу из get().
+        
+        Args:
+            key: Ключ из get()
+            result: Строки результата
+        """
+        self.results.set(key, (_copy(result),))
+    
+    def notify_write(self, query: str) -> None:
+        """Отмечает запись, выполненную через хелперы db.py.
+        
+        Вызывается после коммита: версии таблиц запроса увеличиваются, а
+        изменение data_version от этого коммита не считается чужой записью.
+        
+        Args:
+            query: Выполненный SQL запрос
+        """
+        if not self.enabled:
+            return
+        tables = written_tables(query)
+        with self._lock:
+            if tables is None:
+                self._epoch += 1
+            else:
+                for table in tables:
+                    self._versions[table] = self._versions.get(table, 0) + 1
+            self.local_writes += 1
+            try:
+                self._data_version = self._read_data_version()
+            except sqlite3.Error:
+                self._conn = None
+                self._data_version = None
+                self._epoch += 1
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику кэша.
+        
+        Returns:
+            Статистика TTLCache, количество локальных и внешних записей
+        """
+        stats = self.results.stats()
+        stats.update(
+            local_writes=self.local_writes,
+            external_writes=self.external_writes,
+            epoch=self._epoch,
+            tables=dict(self._versions),
+        )
+        return stats
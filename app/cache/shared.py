@@ -0,0 +1,406 @@
+"""Кэш, общий для процессов (воркеров) одного хоста.
+
+Применяемые паттерны:
+- Strategy — тот же интерфейс, что у TTLCache, поэтому сервисы и тег
+  {% cache %} не знают, где лежат записи
+- Cache-Aside — сервисы сами кладут записи при промахе
+- Generation Counter — clear() увеличивает общий счётчик поколения,
+  записи прежних поколений невидимы для всех процессов сразу
+- LRU по размеру — при превышении бюджета в байтах удаляются давно
+  не читавшиеся записи
+
+Применяемые принципы:
+- Shared state — записи видят все воркеры, в том числе после перезапуска
+- Fail open — ошибка файла кэша превращается в промах, а не в ошибку запроса
+- Bounded memory — ограничены и количество записей, и их размер в байтах
+
+Записи лежат в таблице SQLite в режиме WAL; файл стоит держать в tmpfs
+(например, /dev/shm), тогда чтение идёт из памяти через mmap. Значения
+сериализуются переданной парой dumps/loads (см. app.models.codec).
+Время последнего чтения обновляется не чаще раза в touch_interval
+секунд, чтобы чтения не превращались в записи.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Доля бюджета, до которой освобождается место при вытеснении
+_EVICT_TO = 0.9
+
+
+class SharedCache:
+    """Кэш с TTL и вытеснением по размеру в общем файле SQLite."""
+    
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        max_bytes: int,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[bytes], Any],
+        touch_interval: float = 1.0
+    ):
+        """Инициализирует кэш.
+        
+        Args:
+            path: Путь к файлу SQLite (общий для всех кэшей хоста)
+            name: Имя кэша — пространство ключей в файле
+            maxsize: Максимальное количество записей (0 — кэш выключен)
+            ttl: Время жизни записи в секундах
+            max_bytes: Бюджет кэша в байтах (ключи и сериализованные значения)
+            dumps: Сериализация значения в байты
+            loads: Восстановление значения из байтов
+            touch_interval: Минимальный интервал обновления времени чтения записи
+        """
+        self.path = path
+        self.name = name
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = float(ttl)
+        self.max_bytes = max(0, int(max_bytes))
+        self.touch_interval = touch_interval
+        self._dumps = dumps
+        self._loads = loads
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.skipped = 0
+        self.errors = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Проверяет, включён ли кэш."""
+        return self.maxsize > 0 and self.max_bytes > 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает соединение (заново после fork)."""
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # В кэше лежат и хэши паролей: файл доступен только владельцу
+            os.close(os.open(self.path, os.O_CREAT | os.O_RDWR, 0o600))
+            conn = sqlite3.connect(
+                self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Кэш можно потерять целиком, поэтому fsync не нужен
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(f"PRAGMA mmap_size={max(self.max_bytes * 2, 1 << 24)}")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                generation INTEGER NOT NULL,
+                PRIMARY KEY (ns, key)
+            ) WITHOUT ROWID""")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries(ns, accessed_at)"
+            )
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                ns TEXT PRIMARY KEY,
+                generation INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                entries INTEGER NOT NULL DEFAULT 0
+            )""")
+            conn.execute("INSERT OR IGNORE INTO cache_meta (ns) VALUES (?)", (self.name,))
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+    
+    def _failed(self, operation: str, error: Exception) -> None:
+        """Учитывает ошибку файла кэша (запрос продолжается без кэша)."""
+        self.errors += 1
+        logger.warning("Общий кэш %s: ошибка %s: %s", self.name, operation, error)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Возвращает значение по ключу или default.
+        
+        Args:
+            key: Ключ записи
+            default: Значение при промахе
+        
+        Returns:
+            Закэшированное значение или default
+        """
+        if not self.enabled:
+            self.misses += 1
+            return default
+        
+        skey = repr(key)
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    """SELECT e.value, e.expires_at, e.accessed_at
+                       FROM cache_entries e JOIN cache_meta m ON m.ns = e.ns
+                       WHERE e.ns = ? AND e.key = ? AND e.generation = m.generation""",
+                    (self.name, skey)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    if row is not None:
+                        self.expirations += 1
+                    self.misses += 1
+                    return default
+                
+                if now - row[2] >= self.touch_interval:
+                    conn.execute(
+                        "UPDATE cache_entries SET accessed_at = ? WHERE ns = ? AND key = ?",
+                        (now, self.name, skey)
+                    )
+            except sqlite3.Error as e:
+                self._failed('чтения', e)
+                self.misses += 1
+                return default
+        
+        try:
+            value = self._loads(row[0])
+        except ValueError:
+            # Запись другого формата (например, после обновления кода)
+            self.invalidate(key)
+            self.misses += 1
+            return default
+        
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение, вытесняя давно не читавшиеся записи при переполнении.
+        
+        Args:
+            key: Ключ записи
+            value: Значение
+            ttl: Собственное время жизни записи (по умолчанию — ttl кэша)
+        """
+        if not self.enabled:
+            return
+        
+        skey = repr(key)
+        try:
+            data = self._dumps(value)
+        except TypeError:
+            self.skipped += 1
+            return
+        size = len(data) + len(skey)
+        if size > self.max_bytes:
+            self.skipped += 1
+            return
+        
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    old = conn.execute(
+                        "SELECT size FROM cache_entries WHERE ns = ? AND key = ?",
+                        (self.name, skey)
+                    ).fetchone()
+                    conn.execute(
+                        """INSERT OR REPLACE INTO cache_entries
+                           (ns, key, value, size, expires_at, accessed_at, generation)
+                           SELECT ?, ?, ?, ?, ?, ?, generation FROM cache_meta WHERE ns = ?""",
+                        (self.name, skey, data, size, expires_at, now, self.name)
+                    )
+                    used, entries = conn.execute(
+                        """UPDATE cache_meta SET bytes = bytes + ?, entries = entries + ?
+                           WHERE ns = ? RETURNING bytes, entries""",
+                        (size - (old[0] if old else 0), 0 if old else 1, self.name)
+                    ).fetchone()
+                    if used > self.max_bytes or entries > self.maxsize:
+                        self._evict(conn, now)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                self._failed('записи', e)
+    
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Освобождает место до _EVICT_TO бюджета (вызывается в транзакции)."""
+        # Сначала записи прежних поколений и истёкшие
+        removed = conn.execute(
+            """DELETE FROM cache_entries WHERE ns = ? AND (expires_at <= ?
+               OR generation != (SELECT generation FROM cache_meta WHERE ns = ?))""",
+            (self.name, now, self.name)
+        ).rowcount
+        self.expirations += removed
+        
+        used, entries = conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM cache_entries WHERE ns = ?",
+            (self.name,)
+        ).fetchone()
+        target_bytes = int(self.max_bytes * _EVICT_TO)
+        target_entries = int(self.maxsize * _EVICT_TO)
+        if used > target_bytes or entries > target_entries:
+            # Самые старые по времени чтения, пока не уложимся в оба бюджета
+            rows = conn.execute(
+                "SELECT key, size FROM cache_entries WHERE ns = ? ORDER BY accessed_at",
+                (self.name,)
+            ).fetchall()
+            victims = []
+            for key, size in rows:
+                if used <= target_bytes and entries <= target_entries:
+                    break
+                victims.append((self.name, key))
+                used -= size
+                entries -= 1
+            conn.executemany("DELETE FROM cache_entries WHERE ns = ? AND key = ?", victims)
+            self.evictions += len(victims)
+        
+        conn.execute(
+            "UPDATE cache_meta SET bytes = ?, entries = ? WHERE ns = ?",
+            (used, entries, self.name)
+        )
+    
+    def invalidate(self, key: Hashable) -> bool:
+        """Удаляет запись по ключу во всех процессах.
+        
+        Args:
+            key: Ключ записи
+        
+        Returns:
+            True если запись была в кэше
+        """
+        if not self.enabled:
+            return False
+        
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute(
+                        "DELETE FROM cache_entries WHERE ns = ? AND key = ? RETURNING size",
+                        (self.name, repr(key))
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute(
+                            "UPDATE cache_meta SET bytes = bytes - ?, entries = entries - 1 WHERE ns = ?",
+                            (row[0], self.name)
+                        )
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+            except sqlite3.Error as e:
+                self._failed('удаления', e)
+                return False
+        
+        if row is None:
+            return False
+        self.invalidations += 1
+        return True
+    
+    def clear(self) -> None:
+        """Делает все записи невидимыми, увеличивая общий счётчик поколения.
+        
+        Строки прежних поколений удаляются при следующем вытеснении.
+        """
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    """UPDATE cache_meta SET generation = generation + 1
+                       WHERE ns = ? RETURNING entries""",
+                    (self.name,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._failed('сброса', e)
+                return
+        self.invalidations += row[0] if row else 0
+    
+    @property
+    def generation(self) -> int:
+        """Текущее поколение записей (общее для всех процессов)."""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT generation FROM cache_meta WHERE ns = ?", (self.name,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._failed('чтения', e)
+                return 0
+        return row[0] if row else 0
+    
+    def _count(self) -> tuple[int, int]:
+        """Количество и размер видимых записей."""
+        if not self.enabled:
+            return 0, 0
+        with self._lock:
+            try:
+                return self._connect().execute(
+                    """SELECT COUNT(*), COALESCE(SUM(e.size), 0)
+                       FROM cache_entries e JOIN cache_meta m ON m.ns = e.ns
+                       WHERE e.ns = ? AND e.generation = m.generation AND e.expires_at > ?""",
+                    (self.name, time.time())
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._failed('подсчёта', e)
+                return 0, 0
+    
+    def __len__(self) -> int:
+        return self._count()[0]
+    
+    def __contains__(self, key: Hashable) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    """SELECT 1 FROM cache_entries e JOIN cache_meta m ON m.ns = e.ns
+                       WHERE e.ns = ? AND e.key = ? AND e.generation = m.generation
+                       AND e.expires_at > ?""",
+                    (self.name, repr(key), time.time())
+                ).fetchone()
+            except sqlite3.Error as e:
+                self._failed('чтения', e)
+                return False
+        return row is not None
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику кэша.
+        
+        Returns:
+            Словарь с полями TTLCache.stats() и размером в байтах
+        """
+        size, used = self._count()
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'size': size,
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            'bytes': used,
+            'max_bytes': self.max_bytes,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'path': self.path,
+        }
@@ -0,0 +1,209 @@
+"""Объединение одновременных вычислений одного значения (single-flight).
+
+Применяемые паттерны:
+- Single Flight — пока значение вычисляется, остальные вызовы с тем же
+  ключом ждут результат первого, а не считают его заново
+- Stale-While-Revalidate — при наличии прежнего значения ожидающие
+  получают его сразу, пока первый вызов обновляет запись
+- File Lock — опционально вычисление сериализуется и между процессами
+  (воркерами) через flock на локальном файле; блокировка опрашивается
+  (LOCK_NB) не дольше timeout, а с прежним значением не ожидается вовсе
+
+Применяемые принципы:
+- Fail fast — ошибка вычисления передаётся всем ожидающим
+- Graceful degradation — без fcntl (Windows) блокировка работает
+  только внутри процесса
+- Observability — счётчики вычислений, ожиданий и отданных устаревших значений
+
+Блокировка между процессами имеет смысл, только если recheck читает
+хранилище, общее для процессов (например, SharedCache): иначе процесс,
+дождавшийся блокировки, не увидит результат другого и посчитает заново.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Маркер отсутствия значения (None — допустимый результат вычисления)
+MISSING = object()
+
+# Пауза между попытками взять занятую блокировку между процессами, в секундах
+LOCK_POLL_INTERVAL = 0.005
+LOCK_POLL_MAX_INTERVAL = 0.05
+
+
+class _Call:
+    """Вычисление, которое сейчас выполняется."""
+    
+    __slots__ = ('done', 'result', 'error')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Группа вычислений, объединяемых по ключу."""
+    
+    def __init__(self, name: str = 'flight', lock_dir: Optional[str] = None, timeout: float = 10.0):
+        """Инициализирует группу.
+        
+        Args:
+            name: Имя группы для статистики и имён файлов блокировок
+            lock_dir: Каталог файлов блокировок между процессами (None — только потоки);
+                нужен только вместе с recheck по общему для процессов хранилищу
+            timeout: Сколько секунд ждать чужое вычисление (в том же или другом
+                процессе), прежде чем считать самому
+        """
+        self.name = name
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.timeout = timeout
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+        self.stale_served = 0
+        self.timeouts = 0
+        self.lock_wait_seconds = 0.0
+        
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+    
+    @contextmanager
+    def _process_lock(self, key: Hashable, timeout: float) -> Iterator[bool]:
+        """Эксклюзивная блокировка ключа между процессами (если включена).
+        
+        Занятая блокировка опрашивается не дольше timeout секунд.
+        
+        Yields:
+            True если блокировка получена (или не нужна), False если её
+            держит другой процесс
+        """
+        if not self.lock_dir:
+            yield True
+            return
+        
+        digest = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=8).hexdigest()
+        path = os.path.join(self.lock_dir, f'{self.name}-{digest}.lock')
+        with open(path, 'a') as lock_file:
+            started = time.perf_counter()
+            deadline = time.monotonic() + timeout
+            interval = LOCK_POLL_INTERVAL
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        locked = False
+                        break
+                    time.sleep(min(interval, remaining))
+                    interval = min(interval * 2, LOCK_POLL_MAX_INTERVAL)
+            self.lock_wait_seconds += time.perf_counter() - started
+            try:
+                yield locked
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def do(
+        self,
+        key: Hashable,
+        compute: Callable[[], Any],
+        stale: Any = MISSING,
+        recheck: Optional[Callable[[], Any]] = None
+    ) -> Any:
+        """Вычисляет значение или присоединяется к уже идущему вычислению.
+        
+        Args:
+            key: Ключ значения
+            compute: Вычисление (выполняется одним вызовом из группы)
+            stale: Прежнее значение; если вычисление уже идёт (в этом или
+                другом процессе), оно возвращается сразу, без ожидания
+            recheck: Проверка после получения блокировки между процессами:
+                если вернула не MISSING, значение уже вычислил другой процесс
+        
+        Returns:
+            Результат вычисления (общий для всех ожидавших) или stale
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+            else:
+                leader = False
+                if stale is not MISSING:
+                    self.stale_served += 1
+                    return stale
+                self.shared += 1
+        
+        if not leader:
+            if call.done.wait(self.timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # Вычисление зависло — не держим запрос дольше timeout
+            self.timeouts += 1
+            return compute()
+        
+        try:
+            with self._process_lock(key, self.timeout if stale is MISSING else 0.0) as locked:
+                if not locked and stale is not MISSING:
+                    # Значение обновляет другой процесс
+                    self.stale_served += 1
+                    call.result = stale
+                else:
+                    if not locked:
+                        # Вычисление в другом процессе зависло — считаем сами
+                        self.timeouts += 1
+                    value = recheck() if recheck is not None else MISSING
+                    call.result = compute() if value is MISSING else value
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+    
+    def in_flight(self, key: Hashable) -> bool:
+        """Проверяет, вычисляется ли значение сейчас.
+        
+        Args:
+            key: Ключ значения
+        
+        Returns:
+            True если вычисление идёт в этом процессе
+        """
+        return key in self._calls
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику группы.
+        
+        Returns:
+            Словарь с количеством вычислений, ожиданий и устаревших ответов
+        """
+        return {
+            'name': self.name,
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'shared': self.shared,
+            'stale_served': self.stale_served,
+            'timeouts': self.timeouts,
+            'process_lock': bool(self.lock_dir),
+            'lock_wait_seconds': self.lock_wait_seconds,
+        }
@@ -0,0 +1,186 @@
+"""Счётчик событий в скользящем окне.
+
+Применяемые паттерны:
+- Sliding Window Log — для ключа хранятся времена последних событий
+- Ring Buffer — deque(maxlen=limit) хранит не больше limit отметок
+- LRU (Least Recently Used) — вытеснение давно не использованных ключей
+
+Применяемые принципы:
+- Bounded memory — не больше max_keys ключей по limit отметок
+- Constant time — проверка лимита смотрит только на старейшую отметку
+- Thread safety — одна блокировка на операцию
+
+Для решения «лимит исчерпан» достаточно limit последних событий:
+если буфер полон и самое старое из них попадает в окно, то в окне
+не меньше limit событий. Более старые отметки не нужны и вытесняются
+кольцевым буфером.
+
+Отметки одного ключа из разных источников (например, из памяти процесса
+и общей таблицы) объединяются merge(): совпадающие отметки считаются
+одним событием.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Hashable, Iterable, Optional
+
+
+class SlidingWindowCounter:
+    """Счётчики событий по ключам в скользящем окне."""
+    
+    def __init__(self, limit: int, window: float, max_keys: int = 10000, name: str = 'window'):
+        """Инициализирует счётчик.
+        
+        Args:
+            limit: Количество событий в окне, при котором лимит исчерпан
+            window: Длина окна в секундах
+            max_keys: Максимальное количество отслеживаемых ключей
+            name: Имя счётчика для статистики
+        """
+        self.limit = max(1, int(limit))
+        self.window = float(window)
+        self.max_keys = max(1, int(max_keys))
+        self.name = name
+        self._events: OrderedDict[Hashable, deque] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+    
+    def _prune(self, events: deque, now: float) -> None:
+        cutoff = now - self.window
+        while events and events[0] <= cutoff:
+            events.popleft()
+    
+    def _events_for(self, key: Hashable) -> deque:
+        """Возвращает буфер ключа, создавая его. Вызывается под self._lock."""
+        events = self._events.get(key)
+        if events is None:
+            events = self._events[key] = deque(maxlen=self.limit)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._events.move_to_end(key)
+        return events
+    
+    def add(self, key: Hashable, timestamp: Optional[float] = None) -> int:
+        """Регистрирует событие.
+        
+        Args:
+            key: Ключ счётчика
+            timestamp: Время события (Unix timestamp, по умолчанию — сейчас)
+        
+        Returns:
+            Количество событий ключа в окне (не больше limit)
+        """
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            events = self._events_for(key)
+            events.append(now)
+            self._prune(events, now)
+            return len(events)
+    
+    def merge(self, key: Hashable, timestamps: Iterable[float]) -> int:
+        """Объединяет события ключа с отметками из другого источника.
+        
+        Отметка, которая уже есть в буфере, не добавляется повторно.
+        
+        Args:
+            key: Ключ счётчика
+            timestamps: Времена событий
+        
+        Returns:
+            Количество событий ключа в окне (не больше limit)
+        """
+        now = time.time()
+        with self._lock:
+            events = self._events_for(key)
+            merged = sorted(set(events).union(timestamps))
+            events.clear()
+            events.extend(merged)
+            self._prune(events, now)
+            return len(events)
+    
+    def count(self, key: Hashable) -> int:
+        """Возвращает количество событий ключа в окне (не больше limit).
+        
+        Args:
+            key: Ключ счётчика
+        
+        Returns:
+            Количество событий
+        """
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                return 0
+            self._prune(events, time.time())
+            if not events:
+                del self._events[key]
+                return 0
+            return len(events)
+    
+    def exceeded(self, key: Hashable) -> bool:
+        """Проверяет, исчерпан ли лимит, за O(1).
+        
+        Args:
+            key: Ключ счётчика
+        
+        Returns:
+            True если в окне не меньше limit событий
+        """
+        events = self._events.get(key)
+        try:
+            return len(events) == self.limit and events[0] > time.time() - self.window
+        except (TypeError, IndexError):
+            # Ключа нет или буфер очищен другим потоком
+            return False
+    
+    def load(self, key: Hashable, timestamps: Iterable[float]) -> None:
+        """Восстанавливает события ключа (например, из БД после перезапуска).
+        
+        Args:
+            key: Ключ счётчика
+            timestamps: Времена событий по возрастанию
+        """
+        for timestamp in timestamps:
+            self.add(key, timestamp)
+    
+    def reset(self, key: Hashable) -> None:
+        """Удаляет события ключа.
+        
+        Args:
+            key: Ключ счётчика
+        """
+        with self._lock:
+            self._events.pop(key, None)
+    
+    def clear(self) -> None:
+        """Удаляет все события."""
+        with self._lock:
+            self._events.clear()
+    
+    def __len__(self) -> int:
+        return len(self._events)
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику счётчика.
+        
+        Returns:
+            Словарь с количеством ключей, ограничениями и вытеснениями
+        """
+        now = time.time()
+        with self._lock:
+            exceeded = sum(
+                1 for events in self._events.values()
+                if len(events) == self.limit and events[0] > now - self.window
+            )
+            return {
+                'name': self.name,
+                'keys': len(self._events),
+                'max_keys': self.max_keys,
+                'limit': self.limit,
+                'window': self.window,
+                'exceeded': exceeded,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,155 @@
+"""Индекс суррогатных ключей (тегов) для точечной инвалидации кэшей.
+
+Применяемые паттерны:
+- Inverted Index — для каждого тега хранится множество зависящих записей
+- Surrogate Key — запись кэша помечается сущностями, из которых она собрана
+
+Применяемые принципы:
+- Exact invalidation — изменение сущности сбрасывает только записи с её тегом
+- Bounded memory — записи, которых уже нет в кэше, вычищаются prune()
+- Thread safety — одна блокировка на операцию
+
+Теги имеют вид 'post:42', 'user:7', 'listing:posts'. Их собирают
+обработчики при чтении данных, а сервисы отправляют при записи
+(сигнал tags_invalidated из app.signals).
+"""
+
+import threading
+from typing import Any, Callable, Hashable, Iterable
+
+# Списки постов (главная, /posts): зависят от любого поста и счётчиков комментариев
+POSTS_LISTING = 'listing:posts'
+
+# Сброс всех записей (PageCache.clear)
+ALL_TAGS = '*'
+
+
+def post_tag(post_id: int) -> str:
+    """Возвращает тег поста.
+    
+    Args:
+        post_id: ID поста
+    
+    Returns:
+        Тег 'post:<id>'
+    """
+    return f'post:{post_id}'
+
+
+def user_tag(user_id: int) -> str:
+    """Возвращает тег пользователя.
+    
+    Args:
+        user_id: ID пользователя
+    
+    Returns:
+        Тег 'user:<id>'
+    """
+    return f'user:{user_id}'
+
+
+def tag_ids(tags: Iterable[str], kind: str) -> list[int]:
+    """Извлекает ID сущностей одного вида из тегов.
+    
+    Args:
+        tags: Теги вида 'post:42'
+        kind: Вид сущности ('post', 'user')
+    
+    Returns:
+        ID сущностей с тегами этого вида
+    """
+    prefix = f'{kind}:'
+    return [
+        int(tag[len(prefix):]) for tag in tags
+        if tag.startswith(prefix) and tag[len(prefix):].isdigit()
+    ]
+
+
+class TagIndex:
+    """Связи «тег → ключи записей» и обратно."""
+    
+    def __init__(self):
+        """Инициализирует пустой индекс."""
+        self._keys_by_tag: dict[str, set[Hashable]] = {}
+        self._tags_by_key: dict[Hashable, frozenset[str]] = {}
+        self._lock = threading.Lock()
+        self.invalidated = 0
+    
+    def _remove(self, key: Hashable) -> None:
+        """Удаляет ключ из индекса (вызывается под блокировкой)."""
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+    
+    def add(self, key: Hashable, tags: Iterable[str]) -> None:
+        """Запоминает теги записи (заменяя прежние).
+        
+        Args:
+            key: Ключ записи
+            tags: Теги сущностей, из которых собрана запись
+        """
+        tags = frozenset(tags)
+        with self._lock:
+            self._remove(key)
+            if not tags:
+                return
+            self._tags_by_key[key] = tags
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+    
+    def pop(self, tags: Iterable[str]) -> set[Hashable]:
+        """Возвращает и удаляет из индекса все записи с любым из тегов.
+        
+        Args:
+            tags: Изменившиеся теги
+        
+        Returns:
+            Ключи записей, которые нужно удалить из кэша
+        """
+        with self._lock:
+            keys: set[Hashable] = set()
+            for tag in tags:
+                keys |= self._keys_by_tag.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidated += len(keys)
+            return keys
+    
+    def prune(self, alive: Callable[[Hashable], bool]) -> int:
+        """Удаляет записи, которых уже нет в кэше (вытеснены или истекли).
+        
+        Args:
+            alive: Проверка, что запись ещё в кэше
+        
+        Returns:
+            Количество удалённых записей
+        """
+        with self._lock:
+            dead = [key for key in self._tags_by_key if not alive(key)]
+            for key in dead:
+                self._remove(key)
+            return len(dead)
+    
+    def clear(self) -> None:
+        """Удаляет все связи."""
+        with self._lock:
+            self._keys_by_tag.clear()
+            self._tags_by_key.clear()
+    
+    def __len__(self) -> int:
+        return len(self._tags_by_key)
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику индекса.
+        
+        Returns:
+            Словарь с количеством записей, тегов и сброшенных записей
+        """
+        return {
+            'keys': len(self._tags_by_key),
+            'tags': len(self._keys_by_tag),
+            'invalidated': self.invalidated,
+        }
@@ -23,7 +23,9 @@ def register_cli_commands(app):
         
         try:
             # Создаем пользователя
-            password_hash = generate_password_hash(password)
+            password_hash = generate_password_hash(
+                password, method=app.config['PASSWORD_HASH_METHOD']
+            )
             user_id = execute_insert("""
                 INSERT INTO users (login, discriminator, password_hash)
                 VALUES (?, ?, ?)
@@ -105,7 +107,9 @@ def register_cli_commands(app):
                 return
             
             # Создаем тестового пользователя
-            password_hash = generate_password_hash("test123")
+            password_hash = generate_password_hash(
+                "test123", method=app.config['PASSWORD_HASH_METHOD']
+            )
             user_id = execute_insert("""
                 INSERT INTO users (login, discriminator, password_hash)
                 VALUES (?, ?, ?)
@@ -158,4 +162,153 @@ def register_cli_commands(app):
         
         # Наполняем тестовыми данными
         ctx = click.get_current_context()
-        ctx.invoke(seed)
\ No newline at end of file
+        ctx.invoke(seed)
+    
+    @app.cli.command()
+    def cache_stats():
+        """Показать статистику кэшей приложения"""
+        for name, cache in app.caches.items():
+            stats = cache.stats()
+            click.echo(
+                f"📦 {name}: {stats['size']}/{stats['maxsize']} записей, "
+                f"попадания {stats['hits']}, промахи {stats['misses']} "
+                f"({stats['hit_ratio']:.1%}), вытеснения {stats['evictions']}, "
+                f"сбросы {stats['invalidations']}"
+                + (f", {stats['bytes'] / 1024:.0f}/{stats['max_bytes'] / 1024:.0f} КБ в общем файле"
+                   if 'max_bytes' in stats else '')
+            )
+        
+        stats = app.query_cache.stats()
+        click.echo(
+            f"🗃  queries: {stats['size']}/{stats['maxsize']} результатов, "
+            f"попадания {stats['hits']}, промахи {stats['misses']} "
+            f"({stats['hit_ratio']:.1%}), записи {stats['local_writes']}, "
+            f"чужие записи {stats['external_writes']}"
+        )
+        
+        stats = app.page_cache.stats()
+        click.echo(
+            f"📄 pages: {stats['size']}/{stats['maxsize']} страниц, "
+            f"попадания {stats['hits']}, промахи {stats['misses']} "
+            f"({stats['hit_ratio']:.1%}), ответы 304 {stats['not_modified']}, "
+            f"сбросы {stats['generation']}, устаревшие рендеры {stats['stale_renders']}"
+        )
+        click.echo(
+            f"   рендеры {stats['renders']}, объединено {stats['coalesced']}, "
+            f"отдано устаревших {stats['stale_served']}, "
+            f"сбросы других процессов {stats['external_invalidations']}"
+        )
+        
+        for negative in (app.post_service.missing_posts, app.comment_service.missing_comments):
+            stats = negative.stats()
+            click.echo(
+                f"🚫 {stats['name']}: {stats['size']}/{stats['maxsize']} ID, "
+                f"ответы из кэша {stats['hits']}, из фильтра {stats['filter_negatives']} "
+                f"(фильтр: {stats['filter_ids']} ID до {stats['max_id']}, "
+                f"{stats['filter_bytes'] / 1024:.1f} КБ)"
+            )
+    
+    @app.cli.command()
+    def revocation_stats():
+        """Удалить истёкшие отзывы токенов и показать статистику фильтра"""
+        if not app.revocations.rebuild():
+            click.echo("❌ Не удалось прочитать таблицу revoked_tokens")
+            return
+        
+        stats = app.revocations.stats()
+        click.echo(
+            f"🔒 Отозвано токенов: {stats['count']} (ёмкость {stats['capacity']}), "
+            f"удалено истёкших: {stats['collected']}"
+        )
+        click.echo(
+            f"   Фильтр: {stats['bits']} бит, {stats['hashes']} хэшей, "
+            f"{stats['memory_bytes'] / 1024:.1f} КБ, "
+            f"оценка ложных срабатываний {stats['false_positive_rate']:.4%}"
+        )
+    
+    @app.cli.command()
+    def login_stats():
+        """Сохранить накопленные попытки входа и показать статистику счётчиков"""
+        written = app.login_attempt_service.flush()
+        stats = app.login_attempt_service.stats()
+        click.echo(
+            f"🛡  Пар IP + логин: {stats['keys']}/{stats['max_keys']}, "
+            f"превысили лимит: {stats['exceeded']}, вытеснено: {stats['evictions']}"
+        )
+        click.echo(
+            f"   Заблокировано аккаунтов: {stats['locked_accounts']}, "
+            f"записано в БД: {written}, в очереди: {stats['pending']}, "
+            f"потеряно: {stats['dropped']}"
+        )
+    
+    @app.cli.command()
+    def login_retention():
+        """Свернуть старые дни попыток входа в сводку (для cron)"""
+        result = app.login_attempt_service.apply_retention()
+        if result is None:
+            click.echo("❌ Не удалось очистить попытки входа")
+            return
+        
+        days = app.login_attempt_repo.list_partitions()
+        click.echo(
+            f"🗂  Свёрнуто дней: {result['partitions']} ({result['rolled_up']} строк сводки), "
+            f"удалено строк сводки: {result['expired_totals']}, "
+            f"истёкших блокировок: {result['expired_locks']}"
+        )
+        click.echo(f"   Дневные таблицы: {', '.join(days) or 'нет'}")
+    
+    @app.cli.command()
+    def limiter_stats():
+        """Показать параметры приблизительных лимитов запросов"""
+        if not app.approximate_limiters:
+            click.echo("ℹ️  Приблизительные лимиты выключены (RATELIMIT_APPROXIMATE)")
+            return
+        
+        for endpoint, approximate in app.approximate_limiters.items():
+            stats = approximate.stats()
+            click.echo(
+                f"📉 {endpoint}: {stats['limit']} за {stats['window']:.0f} с, "
+                f"скетч {stats['depth']}×{stats['width']}×{stats['buckets'] + 1} "
+                f"({stats['memory_bytes'] / 1024:.0f} КБ, ε={stats['epsilon']}, δ={stats['delta']})"
+            )
+            click.echo(
+                f"   Без точной проверки: {stats['fast_path']}, точных проверок: "
+                f"{stats['exact_checks']} ({stats['exact_keys']} ключей), отказов: {stats['rejected']}"
+            )
+    
+    @app.cli.command()
+    @click.option('--algorithm', type=click.Choice(['scrypt', 'pbkdf2']), default='scrypt')
+    @click.option('--target-ms', type=float, default=250.0, help='Целевое время проверки пароля')
+    def hash_calibrate(algorithm, target_ms):
+        """Подобрать параметры хэширования паролей под это железо"""
+        from app.services.password_hasher import calibrate_method
+        
+        current = app.config['PASSWORD_HASH_METHOD']
+        click.echo(f"⏱  Калибруем {algorithm} на {target_ms:.0f} мс (сейчас: {current})...")
+        method, elapsed = calibrate_method(algorithm, target_ms)
+        
+        click.echo(f"✅ {method}: {elapsed:.0f} мс на проверку")
+        click.echo(f"   ≈ {1000 / elapsed:.1f} входов в секунду на ядро")
+        click.echo(f"   Установите PASSWORD_HASH_METHOD={method}")
+        if method != current:
+            click.echo("   Хэши пользователей обновятся при их следующем входе")
+    
+    @app.cli.command()
+    @click.option('--posts', 'recent_posts', type=int, default=None, help='Сколько последних постов загрузить')
+    @click.option('--pages', 'listing_pages', type=int, default=None, help='Сколько страниц списка отрендерить')
+    def warm(recent_posts, listing_pages):
+        """Прогреть кэши: шаблоны, последние посты, главную и список постов"""
+        from app.warmup import warm_up
+        
+        report = warm_up(
+            app,
+            app.config['WARMUP_RECENT_POSTS'] if recent_posts is None else recent_posts,
+            app.config['WARMUP_LISTING_PAGES'] if listing_pages is None else listing_pages
+        )
+        click.echo(f"🔥 {report.summary()}")
+        click.echo(f"   Страницы: {', '.join(report.pages) or 'нет'}")
+        for error in report.errors:
+            click.echo(f"⚠️  {error}")
+        if not app.config['SHARED_CACHE_PATH']:
+            click.echo("ℹ️  Кэши в памяти этого процесса; воркерам прогрев передаётся "
+                       "только через SHARED_CACHE_PATH и кэш страниц ОС для файла БД")
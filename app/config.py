@@ -32,9 +32,130 @@ class Config:
     SESSION_COOKIE_HTTPONLY: bool = True
     SESSION_COOKIE_SAMESITE: str = 'lax'
     
+    # CSRF: подписанный токен, привязанный к nonce в cookie (без записи в сессию)
+    WTF_CSRF_ENABLED: bool = True
+    CSRF_TOKEN_MAX_AGE: int = int(os.getenv('CSRF_TOKEN_MAX_AGE', str(24 * 60 * 60)))
+    CSRF_COOKIE_NAME: str = 'csrf_nonce'
+    
     # Приложение
     PORT: int = int(os.getenv('PORT', '5000'))
     
+    # Кэш постов по ID (0 — кэш выключен)
+    POST_CACHE_SIZE: int = int(os.getenv('POST_CACHE_SIZE', '1024'))
+    POST_CACHE_TTL: int = int(os.getenv('POST_CACHE_TTL', '300'))  # 5 минут
+    
+    # Кэш пользователей для авторизации по токену (короткий TTL)
+    USER_CACHE_SIZE: int = int(os.getenv('USER_CACHE_SIZE', '4096'))
+    USER_CACHE_TTL: int = int(os.getenv('USER_CACHE_TTL', '60'))
+    
+    # Кэш страниц для анонимных посетителей (0 — кэш выключен).
+    # Записи сбрасываются по тегам изменённых постов, комментариев и пользователей
+    PAGE_CACHE_SIZE: int = int(os.getenv('PAGE_CACHE_SIZE', '256'))
+    PAGE_CACHE_TTL: int = int(os.getenv('PAGE_CACHE_TTL', '600'))  # 10 минут
+    # Истёкшая страница ещё столько секунд отдаётся, пока другой запрос её перерисовывает
+    PAGE_CACHE_STALE_TTL: int = int(os.getenv('PAGE_CACHE_STALE_TTL', '60'))
+    PAGE_CACHE_GZIP_LEVEL: int = 6
+    PAGE_CACHE_GZIP_MIN_SIZE: int = 512  # Меньшие ответы не сжимаются
+    
+    # Кэш отсутствующих постов и комментариев (0 — выключен): перебор ID сканерами
+    # получает 404 из памяти. Фильтр Блума существующих ID строится при первом
+    # обращении, пополняется при вставке и перестраивается по таймеру
+    NEGATIVE_CACHE_SIZE: int = int(os.getenv('NEGATIVE_CACHE_SIZE', '10000'))
+    NEGATIVE_CACHE_TTL: int = int(os.getenv('NEGATIVE_CACHE_TTL', '300'))
+    NEGATIVE_CACHE_BLOOM: bool = os.getenv('NEGATIVE_CACHE_BLOOM', 'true').lower() == 'true'
+    NEGATIVE_CACHE_REBUILD_SECONDS: int = int(os.getenv('NEGATIVE_CACHE_REBUILD_SECONDS', '300'))
+    
+    # Одновременные рендеры одной страницы объединяются в потоках воркера.
+    # С каталогом блокировок (лучше в tmpfs) и общим кэшем (SHARED_CACHE_PATH)
+    # загрузки поста объединяются ещё и между воркерами на одной машине
+    SINGLE_FLIGHT_LOCK_DIR: str = os.getenv('SINGLE_FLIGHT_LOCK_DIR', '')
+    SINGLE_FLIGHT_TIMEOUT: float = float(os.getenv('SINGLE_FLIGHT_TIMEOUT', '10'))
+    
+    # Кэш результатов запросов, вызванных с cache=True (0 — выключен). Записи
+    # через хелперы db.py сбрасывают результаты своих таблиц, остальные
+    # (другие процессы) обнаруживаются по PRAGMA data_version
+    QUERY_CACHE_SIZE: int = int(os.getenv('QUERY_CACHE_SIZE', '1024'))
+    QUERY_CACHE_TTL: int = int(os.getenv('QUERY_CACHE_TTL', '60'))
+    
+    # Кэш фрагментов шаблонов ({% cache %}); ключи содержат версии сущностей,
+    # поэтому TTL только ограничивает время жизни неиспользуемых записей
+    FRAGMENT_CACHE_SIZE: int = int(os.getenv('FRAGMENT_CACHE_SIZE', '4096'))
+    FRAGMENT_CACHE_TTL: int = int(os.getenv('FRAGMENT_CACHE_TTL', '3600'))
+    
+    # Общий для воркеров хоста файл кэша постов, пользователей и фрагментов
+    # (SQLite в режиме WAL, лучше в tmpfs: /dev/shm/flask-blog/cache.db).
+    # Пусто — каждый процесс держит свои кэши в памяти
+    SHARED_CACHE_PATH: str = os.getenv('SHARED_CACHE_PATH', '')
+    # Бюджет каждого из кэшей в файле в байтах
+    SHARED_CACHE_MAX_BYTES: int = int(os.getenv('SHARED_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    
+    # Прогрев при старте: create_app загружает последние посты и их авторов,
+    # компилирует шаблоны и рендерит главную и первые страницы списка.
+    # Вручную (и для общего файла кэша) — `flask warm`
+    WARMUP_ON_STARTUP: bool = os.getenv('WARMUP_ON_STARTUP', 'false').lower() == 'true'
+    WARMUP_RECENT_POSTS: int = int(os.getenv('WARMUP_RECENT_POSTS', '50'))
+    WARMUP_LISTING_PAGES: int = int(os.getenv('WARMUP_LISTING_PAGES', '3'))
+    
+    # Кэш проверенных JWT токенов (подпись не пересчитывается)
+    JWT_VERIFY_CACHE_SIZE: int = int(os.getenv('JWT_VERIFY_CACHE_SIZE', '2048'))
+    JWT_VERIFY_CACHE_TTL: int = int(os.getenv('JWT_VERIFY_CACHE_TTL', '300'))
+    
+    # Формат новых токенов: 'json' (payload.signature) или 'binary' (компактный).
+    # Проверяются оба формата, поэтому переключение не разлогинивает пользователей.
+    # Двоичный токен короче (64 символа против 180), скорость проверки та же
+    JWT_TOKEN_FORMAT: str = os.getenv('JWT_TOKEN_FORMAT', 'json')
+    JWT_SIGNATURE_BYTES: int = int(os.getenv('JWT_SIGNATURE_BYTES', '16'))  # 16..32 для HS256
+    
+    # Метод хэширования паролей werkzeug с параметрами (подбирается `flask hash-calibrate`).
+    # Хэши с другими параметрами пересчитываются после успешного входа
+    PASSWORD_HASH_METHOD: str = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    
+    # Максимум аккаунтов с одним логином, для которых проверяется пароль при входе
+    LOGIN_MAX_CANDIDATES: int = int(os.getenv('LOGIN_MAX_CANDIDATES', '8'))
+    # Счётчики неудачных входов в памяти: число пар IP + логин и запись в БД пачками;
+    # общие счётчики других процессов перечитываются не чаще раза в LOGIN_ATTEMPTS_FLUSH_SECONDS
+    LOGIN_ATTEMPTS_MAX_KEYS: int = int(os.getenv('LOGIN_ATTEMPTS_MAX_KEYS', '10000'))
+    LOGIN_ATTEMPTS_FLUSH_SECONDS: float = float(os.getenv('LOGIN_ATTEMPTS_FLUSH_SECONDS', '5'))
+    LOGIN_ATTEMPTS_BATCH_SIZE: int = int(os.getenv('LOGIN_ATTEMPTS_BATCH_SIZE', '100'))
+    # Отдельные попытки хранятся по дням, старые дни сворачиваются в сводку
+    LOGIN_ATTEMPTS_RAW_DAYS: int = int(os.getenv('LOGIN_ATTEMPTS_RAW_DAYS', '7'))
+    LOGIN_ATTEMPTS_TOTALS_DAYS: int = int(os.getenv('LOGIN_ATTEMPTS_TOTALS_DAYS', '90'))
+    
+    # Пул процессов для хэширования паролей (0 — в потоке запроса)
+    PASSWORD_POOL_WORKERS: int = int(os.getenv('PASSWORD_POOL_WORKERS', '0'))
+    PASSWORD_POOL_MAX_PENDING: int = int(os.getenv('PASSWORD_POOL_MAX_PENDING', '0'))  # 0 — workers * 4
+    PASSWORD_POOL_TIMEOUT: float = float(os.getenv('PASSWORD_POOL_TIMEOUT', '10'))
+    
+    # Подписывать логин и роли в JWT, чтобы не читать пользователя из БД
+    JWT_EMBED_CLAIMS: bool = os.getenv('JWT_EMBED_CLAIMS', 'true').lower() == 'true'
+    # Как часто перечитывать таблицу версий токенов (изменения других процессов)
+    TOKEN_VERSION_REFRESH_SECONDS: int = int(os.getenv('TOKEN_VERSION_REFRESH_SECONDS', '30'))
+    
+    # Фильтр Блума отозванных токенов (выход из системы)
+    REVOCATION_BLOOM_CAPACITY: int = int(os.getenv('REVOCATION_BLOOM_CAPACITY', '10000'))
+    REVOCATION_BLOOM_ERROR_RATE: float = float(os.getenv('REVOCATION_BLOOM_ERROR_RATE', '0.001'))
+    REVOCATION_REBUILD_SECONDS: int = int(os.getenv('REVOCATION_REBUILD_SECONDS', '60'))
+    
+    # Flask-Limiter: sqlite:///path — общий файл счётчиков для всех воркеров хоста
+    RATELIMIT_STORAGE_URI: str = os.getenv('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_STORAGE_OPTIONS: dict = {
+        'flush_interval': float(os.getenv('RATELIMIT_FLUSH_SECONDS', '1')),
+        'batch_size': int(os.getenv('RATELIMIT_BATCH_SIZE', '100')),
+        'max_keys': int(os.getenv('RATELIMIT_MAX_KEYS', '10000')),
+    }
+    RATELIMIT_DEFAULT: str = os.getenv('RATELIMIT_DEFAULT', '200 per day;50 per hour')
+    RATELIMIT_HEADERS_ENABLED: bool = True
+    RATELIMIT_LOGIN: str = os.getenv('RATELIMIT_LOGIN', '10 per minute')
+    RATELIMIT_REGISTER: str = os.getenv('RATELIMIT_REGISTER', '5 per hour')
+    # Приблизительные лимиты входа и регистрации (Count-Min Sketch, память не зависит от числа IP).
+    # Ошибка оценки не больше EPSILON·(запросов в окне) с вероятностью 1 - DELTA
+    RATELIMIT_APPROXIMATE: bool = os.getenv('RATELIMIT_APPROXIMATE', 'false').lower() == 'true'
+    RATELIMIT_SKETCH_EPSILON: float = float(os.getenv('RATELIMIT_SKETCH_EPSILON', '0.001'))
+    RATELIMIT_SKETCH_DELTA: float = float(os.getenv('RATELIMIT_SKETCH_DELTA', '0.01'))
+    RATELIMIT_SKETCH_BUCKETS: int = int(os.getenv('RATELIMIT_SKETCH_BUCKETS', '6'))
+    # С какой доли лимита IP получает точный счётчик
+    RATELIMIT_SKETCH_NEAR_RATIO: float = float(os.getenv('RATELIMIT_SKETCH_NEAR_RATIO', '0.5'))
+    
     @staticmethod
     def init_app(app: Any) -> None:
         """Инициализация приложения с конфигурацией."""
@@ -50,6 +171,11 @@ class ProductionConfig(Config):
     """Конфигурация для производства."""
     DEBUG: bool = False
     SESSION_COOKIE_SECURE: bool = True  # В production только HTTPS
+    POST_CACHE_SIZE: int = int(os.getenv('POST_CACHE_SIZE', '10000'))
+    # По процессу хэширования на ядро
+    PASSWORD_POOL_WORKERS: int = int(os.getenv('PASSWORD_POOL_WORKERS', str(os.cpu_count() or 1)))
+    # Воркеры одного хоста делят счётчики лимитов
+    RATELIMIT_STORAGE_URI: str = os.getenv('RATELIMIT_STORAGE_URI', 'sqlite:///instance/ratelimit.db')
     
     @classmethod
     def init_app(cls, app: Any) -> None:
@@ -84,6 +210,11 @@ class TestingConfig(Config):
     TESTING: bool = True
     DATABASE_URL: str = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED: bool = False
+    POST_CACHE_SIZE: int = 0  # Тесты должны видеть БД напрямую
+    PAGE_CACHE_SIZE: int = 0
+    USER_CACHE_SIZE: int = 0
+    NEGATIVE_CACHE_SIZE: int = 0
+    QUERY_CACHE_SIZE: int = 0
 
 
 # Словарь конфигураций
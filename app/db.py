@@ -4,6 +4,8 @@
 - Repository (Хранилище) — инкапсулирует логику доступа к данным
 - Connection Manager — управление подключениями к БД
 - Data Mapper — преобразование строк БД в объекты
+- Query Cache — результаты запросов с cache=True хранятся в
+  app.query_cache, записи через хелперы увеличивают версии таблиц
 
 Применяемые принципы:
 - Single Responsibility — только работа с БД
@@ -22,10 +24,17 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 import flask
 from werkzeug.local import LocalProxy
 
+from .cache.single_flight import MISSING
 
-def get_db_path() -> str:
-    """Получает путь к файлу базы данных из конфигурации."""
-    database_url = flask.current_app.config.get('DATABASE_URL', 'sqlite:///blog.db')
+
+def get_db_path(database_url: Optional[str] = None) -> str:
+    """Получает путь к файлу базы данных из конфигурации.
+    
+    Args:
+        database_url: URL базы (по умолчанию DATABASE_URL текущего приложения)
+    """
+    if database_url is None:
+        database_url = flask.current_app.config.get('DATABASE_URL', 'sqlite:///blog.db')
     
     # Преобразуем sqlite:///path в путь к файлу
     if database_url.startswith('sqlite:///'):
@@ -64,11 +73,25 @@ def get_db():
         conn.close()
 
 
+def _query_cache():
+    """Кэш запросов текущего приложения или None."""
+    query_cache = getattr(flask.current_app, 'query_cache', None)
+    return query_cache if query_cache is not None and query_cache.enabled else None
+
+
+def _notify_write(query: str) -> None:
+    """Сообщает кэшу запросов о выполненной записи."""
+    query_cache = _query_cache()
+    if query_cache is not None:
+        query_cache.notify_write(query)
+
+
 def execute_query(
     query: str, 
     params: Optional[Tuple[Any, ...]] = None,
     fetch_one: bool = False,
-    fetch_all: bool = False
+    fetch_all: bool = False,
+    cache: bool = False
 ) -> Optional[Union[Dict[str, Any], List[Dict[str, Any]]]]:
     """Выполняет SQL запрос и возвращает результат.
     
@@ -77,6 +100,8 @@ def execute_query(
         params: Параметры для запроса
         fetch_one: Вернуть одну запись
         fetch_all: Вернуть все записи
+        cache: Взять результат из кэша запросов (только для чтения;
+            результат сбрасывается записью в любую из читаемых таблиц)
         
     Returns:
         Результат запроса в зависимости от флагов
@@ -85,19 +110,30 @@ def execute_query(
     - Explicit parameters — явная передача параметров
     - Type safety — строгие типы возвращаемых значений
     """
+    query_cache = _query_cache() if cache and (fetch_one or fetch_all) else None
+    if query_cache is not None:
+        key, result = query_cache.get(query, tuple(params or ()), 'one' if fetch_one else 'all')
+        if result is not MISSING:
+            return result
+    
     with get_db() as conn:
         cursor = conn.execute(query, params or ())
         
         if fetch_one:
             row = cursor.fetchone()
-            return dict(row) if row else None
+            result = dict(row) if row else None
         elif fetch_all:
             rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            result = [dict(row) for row in rows]
         else:
             # Для INSERT/UPDATE/DELETE запросов
             conn.commit()
+            _notify_write(query)
             return None
+    
+    if query_cache is not None and key is not None:
+        query_cache.store(key, result)
+    return result
 
 
 def execute_insert(query: str, params: Optional[Tuple[Any, ...]] = None) -> int:
@@ -117,6 +153,7 @@ def execute_insert(query: str, params: Optional[Tuple[Any, ...]] = None) -> int:
     with get_db() as conn:
         cursor = conn.execute(query, params or ())
         conn.commit()
+        _notify_write(query)
         return cursor.lastrowid
 
 
@@ -137,6 +174,7 @@ def execute_update(query: str, params: Optional[Tuple[Any, ...]] = None) -> int:
     with get_db() as conn:
         cursor = conn.execute(query, params or ())
         conn.commit()
+        _notify_write(query)
         return cursor.rowcount
 
 
@@ -160,6 +198,7 @@ def execute_batch(
     with get_db() as conn:
         cursor = conn.executemany(query, params_list)
         conn.commit()
+        _notify_write(query)
         return cursor.rowcount
 
 
@@ -0,0 +1,78 @@
+"""Кэш фрагментов шаблонов.
+
+Применяемые паттерны:
+- Extension — тег {% cache %} добавляется в окружение Jinja
+- Cache-Aside — фрагмент рендерится только при промахе
+- Versioned Key — ключ содержит версии сущностей, поэтому запись
+  не нужно сбрасывать: изменённая сущность просто получает новый ключ
+
+Применяемые принципы:
+- Bounded memory — фрагменты лежат в TTLCache с ограничением размера
+- Explicit is better than implicit — версии перечисляются в шаблоне
+
+Использование:
+
+    {% cache 'post-card', post.id, post.updated_at or post.created_at %}
+        ...разметка, одинаковая для всех пользователей...
+    {% endcache %}
+
+Внутри блока нельзя обращаться к current_user и csrf_token():
+персональные части остаются снаружи и рендерятся каждый раз.
+"""
+
+from typing import Any, Callable
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCacheExtension(Extension):
+    """Тег {% cache key, version... %} ... {% endcache %}."""
+    
+    tags = {'cache'}
+    
+    def __init__(self, environment):
+        super().__init__(environment)
+        # Хранилище задаётся приложением (см. create_app); None — без кэширования
+        environment.extend(fragment_cache=None)
+    
+    def parse(self, parser) -> nodes.Node:
+        """Разбирает тег: ключ и версии через запятую, затем тело до endcache."""
+        lineno = next(parser.stream).lineno
+        
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(key_parts)]),
+            [], [], body
+        ).set_lineno(lineno)
+    
+    def _render_cached(self, key_parts: list[Any], caller: Callable[[], str]) -> str:
+        """Возвращает фрагмент из кэша или рендерит и сохраняет его.
+        
+        Args:
+            key_parts: Имя фрагмента и версии сущностей
+            caller: Рендерит тело блока
+        
+        Returns:
+            HTML фрагмента
+        """
+        cache = self.environment.fragment_cache
+        if cache is None or not cache.enabled:
+            return caller()
+        
+        key = tuple(key_parts)
+        try:
+            fragment = cache.get(key)
+        except TypeError:
+            # Нехэшируемая часть ключа — фрагмент не кэшируется
+            return caller()
+        
+        if fragment is None:
+            fragment = caller()
+            # При автоэкранировании caller() возвращает Markup, он и сохраняется
+            cache.set(key, fragment)
+        return fragment
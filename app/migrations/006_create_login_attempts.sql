@@ -1,3 +1,8 @@
+-- Migration: 006_create_login_attempts
+-- Description: Попытки входа и блокировки аккаунтов (защита от перебора паролей)
+
+-- UP
+BEGIN;
 -- Создание таблицы для отслеживания неудачных попыток входа
 CREATE TABLE IF NOT EXISTS login_attempts (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -25,3 +30,15 @@ CREATE TABLE IF NOT EXISTS locked_accounts (
 -- Создание индекса для быстрого поиска заблокированных аккаунтов
 CREATE INDEX IF NOT EXISTS idx_locked_accounts_user_id ON locked_accounts(user_id);
 CREATE INDEX IF NOT EXISTS idx_locked_accounts_until ON locked_accounts(locked_until);
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP INDEX IF EXISTS idx_locked_accounts_until;
+DROP INDEX IF EXISTS idx_locked_accounts_user_id;
+DROP TABLE IF EXISTS locked_accounts;
+DROP INDEX IF EXISTS idx_login_attempts_time;
+DROP INDEX IF EXISTS idx_login_attempts_login;
+DROP INDEX IF EXISTS idx_login_attempts_ip;
+DROP TABLE IF EXISTS login_attempts;
+COMMIT;
@@ -0,0 +1,12 @@
+-- Migration: 007_add_token_version
+-- Description: Версия токенов пользователя для отзыва JWT без запросов к БД
+
+-- UP
+BEGIN;
+ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0;
+COMMIT;
+
+-- DOWN
+BEGIN;
+ALTER TABLE users DROP COLUMN token_version;
+COMMIT;
@@ -0,0 +1,21 @@
+-- Migration: 008_create_revoked_tokens
+-- Description: Отозванные JWT токены (выход из системы до истечения срока)
+
+-- UP
+BEGIN;
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    user_id INTEGER NOT NULL,
+    iat INTEGER NOT NULL,  -- время выпуска токена (Unix timestamp)
+    expires_at INTEGER NOT NULL,  -- после этого момента запись не нужна
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, iat),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires ON revoked_tokens(expires_at);
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP INDEX IF EXISTS idx_revoked_tokens_expires;
+DROP TABLE IF EXISTS revoked_tokens;
+COMMIT;
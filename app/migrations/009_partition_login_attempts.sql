@@ -0,0 +1,49 @@
+-- Migration: 009_partition_login_attempts
+-- Description: Попытки входа по дневным таблицам login_attempts_YYYYMMDD и агрегаты по (ip, login)
+
+-- UP
+BEGIN;
+-- Сводка неудачных и успешных попыток за день; заменяет удалённые дневные таблицы
+CREATE TABLE IF NOT EXISTS login_attempt_totals (
+    day TEXT NOT NULL,  -- 'YYYY-MM-DD' (UTC)
+    ip_address TEXT NOT NULL,
+    login TEXT NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    first_attempt TIMESTAMP NOT NULL,
+    last_attempt TIMESTAMP NOT NULL,
+    PRIMARY KEY (day, ip_address, login)
+);
+
+-- Попытки до вчерашнего дня переносим в сводку, дневные таблицы создаются при записи
+INSERT INTO login_attempt_totals
+    (day, ip_address, login, failures, successes, first_attempt, last_attempt)
+SELECT date(attempt_time), ip_address, login,
+       SUM(success = 0), SUM(success != 0), MIN(attempt_time), MAX(attempt_time)
+FROM login_attempts
+WHERE date(attempt_time) < date('now', '-1 day')
+GROUP BY date(attempt_time), ip_address, login;
+
+-- Попытки за вчера и сегодня остаются отдельными записями: по ним считаются
+-- действующие окна неудачных попыток. Приложение переносит их в дневные
+-- таблицы и удаляет login_attempts (LoginAttemptRepository.adopt_legacy_attempts)
+DELETE FROM login_attempts WHERE date(attempt_time) < date('now', '-1 day');
+DROP INDEX IF EXISTS idx_login_attempts_login;
+DROP INDEX IF EXISTS idx_login_attempts_ip;
+COMMIT;
+
+-- DOWN
+BEGIN;
+-- Отдельные попытки из сводки не восстанавливаются, дневные таблицы остаются
+CREATE TABLE IF NOT EXISTS login_attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ip_address TEXT NOT NULL,
+    login TEXT NOT NULL,
+    attempt_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    success BOOLEAN DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_login_attempts_ip ON login_attempts(ip_address);
+CREATE INDEX IF NOT EXISTS idx_login_attempts_login ON login_attempts(login);
+CREATE INDEX IF NOT EXISTS idx_login_attempts_time ON login_attempts(attempt_time);
+DROP TABLE IF EXISTS login_attempt_totals;
+COMMIT;
@@ -0,0 +1,20 @@
+-- Migration: 010_create_login_failure_windows
+-- Description: Последние неудачные попытки входа по (ip, login) — счётчик, общий для процессов
+
+-- UP
+BEGIN;
+CREATE TABLE IF NOT EXISTS login_failure_windows (
+    ip_address TEXT NOT NULL,
+    login TEXT NOT NULL,
+    failures TEXT NOT NULL,  -- Unix timestamp последних неудачных попыток через пробел
+    expires_at REAL NOT NULL,  -- после этого момента попытки вне окна
+    PRIMARY KEY (ip_address, login)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_login_failure_windows_expires ON login_failure_windows(expires_at);
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP INDEX IF EXISTS idx_login_failure_windows_expires;
+DROP TABLE IF EXISTS login_failure_windows;
+COMMIT;
@@ -25,9 +25,11 @@ class MigrationRunner:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 # Извлекаем DDL всех таблиц из sqlite_master
+                # (дневные таблицы попыток входа создаются приложением)
                 cursor = conn.execute("""
                     SELECT sql FROM sqlite_master
                     WHERE type='table' AND name NOT LIKE 'sqlite_%'
+                    AND name NOT GLOB 'login_attempts_[0-9]*'
                     ORDER BY name
                 """)
                 
@@ -1,5 +1,5 @@
 -- Schema SQL
--- Автоматически сгенерировано: 2026-05-24 12:33:22
+-- Автоматически сгенерировано: 2026-10-19 10:08:06
 -- Содержит актуальную структуру всех таблиц БД
 
 CREATE TABLE comments (
@@ -14,6 +14,42 @@ CREATE TABLE comments (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+CREATE TABLE locked_accounts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    locked_until TIMESTAMP NOT NULL,
+    lock_reason TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE login_attempt_totals (
+    day TEXT NOT NULL,  -- 'YYYY-MM-DD' (UTC)
+    ip_address TEXT NOT NULL,
+    login TEXT NOT NULL,
+    failures INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    first_attempt TIMESTAMP NOT NULL,
+    last_attempt TIMESTAMP NOT NULL,
+    PRIMARY KEY (day, ip_address, login)
+);
+
+CREATE TABLE login_attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ip_address TEXT NOT NULL,
+    login TEXT NOT NULL,
+    attempt_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    success BOOLEAN DEFAULT 0
+);
+
+CREATE TABLE login_failure_windows (
+    ip_address TEXT NOT NULL,
+    login TEXT NOT NULL,
+    failures TEXT NOT NULL,  -- Unix timestamp последних неудачных попыток через пробел
+    expires_at REAL NOT NULL,  -- после этого момента попытки вне окна
+    PRIMARY KEY (ip_address, login)
+) WITHOUT ROWID;
+
 CREATE TABLE migrations (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT UNIQUE NOT NULL,
@@ -31,6 +67,15 @@ CREATE TABLE posts (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+CREATE TABLE revoked_tokens (
+    user_id INTEGER NOT NULL,
+    iat INTEGER NOT NULL,  -- время выпуска токена (Unix timestamp)
+    expires_at INTEGER NOT NULL,  -- после этого момента запись не нужна
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, iat),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
 CREATE TABLE roles (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT UNIQUE NOT NULL,  -- 'admin', 'moderator', 'editor', 'user'
@@ -53,7 +98,7 @@ CREATE TABLE users (
         discriminator TEXT NOT NULL,  -- "0000" для admin, 4 цифры для обычных пользователей
         password_hash TEXT NOT NULL,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, token_version INTEGER NOT NULL DEFAULT 0,
 
         -- Композитный уникальный constraint
         CONSTRAINT unique_login_discriminator UNIQUE (login, discriminator)
@@ -3,14 +3,20 @@
 Применяемые паттерны:
 - Data Transfer Object (DTO) — контейнеры для данных
 - Factory Method — создание объектов из БД данных
+- Flyweight — общие объекты авторов и кортежи ролей
 
 Применяемые принципы:
 - Type safety — строгие типы данных
 - Explicit is better than implicit — явные поля
 """
 
-from .comments import Comment
-from .posts import Post
+from .authors import Author, intern_roles, shared_author
+from .comments import Comment, CompactComment
+from .posts import CompactPost, Post
 from .users import User
 
-__all__ = ['User', 'Post', 'Comment']
\ No newline at end of file
+__all__ = [
+    'User', 'Post', 'Comment',
+    'Author', 'CompactPost', 'CompactComment',
+    'intern_roles', 'shared_author',
+]
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Общие компактные объекты для авторов постов и комментариев.
+
+Применяемые паттерны:
+- Flyweight (Приспособленец) — один объект автора на все его посты
+- Interning — один кортеж ролей на каждую комбинацию ролей
+- Value Object — неизменяемый объект автора
+
+Применяемые принципы:
+- Memory efficiency — списки и листинги держат тысячи моделей
+- Explicit is better than implicit — явные фабрики вместо конструкторов
+"""
+
+import sys
+import weakref
+from dataclasses import dataclass
+from typing import Iterable, Optional, Union
+
+from app.constants.roles import SystemRole
+
+# Кэш кортежей ролей: комбинаций ролей в системе единицы,
+# поэтому словарь не требует ограничения размера
+_ROLE_TUPLES: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+# Реестр авторов: живёт, пока на автора ссылается хотя бы одна модель
+_AUTHORS: 'weakref.WeakValueDictionary[tuple, Author]' = weakref.WeakValueDictionary()
+
+
+def intern_roles(roles: Optional[Union[str, Iterable[str]]]) -> tuple[str, ...]:
+    """Возвращает общий (интернированный) кортеж ролей.
+    
+    Args:
+        roles: Строка из GROUP_CONCAT ("admin,common") или набор ролей
+    
+    Returns:
+        Отсортированный кортеж ролей, общий для всех равных наборов
+    """
+    if not roles:
+        return ()
+    if isinstance(roles, str):
+        roles = roles.split(',')
+    key = tuple(sorted(sys.intern(str(role)) for role in roles))
+    return _ROLE_TUPLES.setdefault(key, key)
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class Author:
+    """Автор поста или комментария.
+    
+    Неизменяемый объект, разделяемый всеми моделями одного автора.
+    """
+    login: Optional[str]
+    discriminator: Optional[str]
+    roles: tuple[str, ...] = ()
+    
+    @property
+    def display_name(self) -> str:
+        """Возвращает отображаемое имя автора."""
+        if self.login == 'admin':
+            return 'admin'
+        return f"{self.login}#{self.discriminator}"
+    
+    @property
+    def is_admin(self) -> bool:
+        """Проверяет, является ли автор администратором."""
+        return SystemRole.ADMIN in self.roles
+
+
+def shared_author(
+    login: Optional[str],
+    discriminator: Optional[str],
+    roles: Optional[Union[str, Iterable[str]]] = None
+) -> Author:
+    """Возвращает общий объект автора для указанных данных.
+    
+    Args:
+        login: Логин автора
+        discriminator: Дискриминатор автора
+        roles: Роли автора в любом виде, принимаемом intern_roles
+    
+    Returns:
+        Объект Author, общий для всех моделей с теми же данными
+    """
+    role_tuple = intern_roles(roles)
+    key = (login, discriminator, role_tuple)
+    author = _AUTHORS.get(key)
+    if author is None:
+        author = Author(login, discriminator, role_tuple)
+        author = _AUTHORS.setdefault(key, author)
+    return author
@@ -0,0 +1,239 @@
+"""Компактная двоичная сериализация моделей для общих кэшей.
+
+Применяемые паттерны:
+- Serializer — модели и простые значения переводятся в байты и обратно
+- Type Tag — каждое значение начинается с байта типа
+- Registry — модели кодируются номером в реестре и значениями полей
+
+Применяемые принципы:
+- Compactness — целые числа и длины записываются varint, имена полей
+  не сохраняются (порядок полей задаёт dataclass)
+- Safety — в отличие от pickle, декодер создаёт только типы из реестра
+- Flyweight — авторы и кортежи ролей при чтении снова становятся общими
+
+Формат: байт версии, затем одно значение. При изменении полей моделей
+версия увеличивается, и записи старого формата считаются промахом.
+"""
+
+import struct
+from dataclasses import fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from markupsafe import Markup
+
+from .authors import Author, intern_roles, shared_author
+from .comments import Comment, CompactComment
+from .posts import CompactPost, Post
+from .users import User
+
+FORMAT_VERSION = 1
+
+# Порядок определяет номера моделей в данных: новые модели добавляются в конец
+_MODELS: tuple[type, ...] = (Author, Post, CompactPost, Comment, CompactComment, User)
+_MODEL_INDEX = {model: index for index, model in enumerate(_MODELS)}
+_MODEL_FIELDS = {model: tuple(f.name for f in fields(model)) for model in _MODELS}
+
+# Поля-кортежи ролей, которые при чтении интернируются
+_ROLE_FIELDS = frozenset({'roles', 'author_roles', '_roles'})
+
+_DOUBLE = struct.Struct('<d')
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _write_uint(out: bytearray, value: int) -> None:
+    """Записывает неотрицательное целое в формате varint (LEB128)."""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _write_int(out: bytearray, value: int) -> None:
+    """Записывает целое со знаком (zigzag + varint)."""
+    _write_uint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _write_str(out: bytearray, value: str) -> None:
+    """Записывает строку UTF-8 с длиной."""
+    data = value.encode('utf-8')
+    _write_uint(out, len(data))
+    out += data
+
+
+def _micros(value: datetime) -> int:
+    """Микросекунды от эпохи без учёта часового пояса."""
+    delta = value.replace(tzinfo=None) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _encode(out: bytearray, value: Any) -> None:
+    """Записывает одно значение с тегом типа."""
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif type(value) is int:
+        out += b'i'
+        _write_int(out, value)
+    elif type(value) is float:
+        out += b'f'
+        out += _DOUBLE.pack(value)
+    elif type(value) is str:
+        out += b's'
+        _write_str(out, value)
+    elif type(value) is Markup:
+        out += b'm'
+        _write_str(out, str(value))
+    elif type(value) is bytes:
+        out += b'b'
+        _write_uint(out, len(value))
+        out += value
+    elif type(value) is datetime:
+        offset = value.utcoffset()
+        if offset is None:
+            out += b'd'
+        else:
+            out += b'D'
+            _write_int(out, int(offset.total_seconds()) // 60)
+        _write_int(out, _micros(value))
+    elif type(value) in (tuple, list):
+        out += b't' if type(value) is tuple else b'l'
+        _write_uint(out, len(value))
+        for item in value:
+            _encode(out, item)
+    elif type(value) is dict:
+        out += b'k'
+        _write_uint(out, len(value))
+        for key, item in value.items():
+            _encode(out, key)
+            _encode(out, item)
+    elif type(value) in _MODEL_INDEX:
+        model = type(value)
+        out += b'o'
+        _write_uint(out, _MODEL_INDEX[model])
+        for name in _MODEL_FIELDS[model]:
+            _encode(out, getattr(value, name))
+    else:
+        raise TypeError(f"Тип {type(value).__name__} не поддерживается сериализацией")
+
+
+class _Reader:
+    """Последовательное чтение значений из буфера."""
+    
+    __slots__ = ('data', 'pos')
+    
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+    
+    def read_uint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self.data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+    
+    def read_int(self) -> int:
+        value = self.read_uint()
+        return value >> 1 if not value & 1 else -((value + 1) >> 1)
+    
+    def read_raw(self, size: int) -> bytes:
+        chunk = self.data[self.pos:self.pos + size]
+        if len(chunk) != size:
+            raise ValueError("Данные обрезаны")
+        self.pos += size
+        return chunk
+    
+    def read_str(self) -> str:
+        return self.read_raw(self.read_uint()).decode('utf-8')
+    
+    def read_value(self) -> Any:
+        tag = self.data[self.pos:self.pos + 1]
+        self.pos += 1
+        decoder = _DECODERS.get(tag)
+        if decoder is None:
+            raise ValueError(f"Неизвестный тег {tag!r}")
+        return decoder(self)
+
+
+def _read_datetime(reader: _Reader, tz: Any = None) -> datetime:
+    """Читает дату (микросекунды от эпохи) с часовым поясом tz."""
+    return (_EPOCH + timedelta(microseconds=reader.read_int())).replace(tzinfo=tz)
+
+
+def _read_model(reader: _Reader) -> Any:
+    """Читает модель: номер в реестре и значения полей по порядку."""
+    model = _MODELS[reader.read_uint()]
+    values = {}
+    for name in _MODEL_FIELDS[model]:
+        value = reader.read_value()
+        values[name] = intern_roles(value) if name in _ROLE_FIELDS and value else value
+    if model is Author:
+        return shared_author(values['login'], values['discriminator'], values['roles'])
+    return model(**values)
+
+
+_DECODERS: dict[bytes, Callable[[_Reader], Any]] = {
+    b'N': lambda r: None,
+    b'T': lambda r: True,
+    b'F': lambda r: False,
+    b'i': lambda r: r.read_int(),
+    b'f': lambda r: _DOUBLE.unpack(r.read_raw(8))[0],
+    b's': lambda r: r.read_str(),
+    b'm': lambda r: Markup(r.read_str()),
+    b'b': lambda r: r.read_raw(r.read_uint()),
+    b'd': lambda r: _read_datetime(r),
+    b'D': lambda r: _read_datetime(r, timezone(timedelta(minutes=r.read_int()))),
+    b't': lambda r: tuple(r.read_value() for _ in range(r.read_uint())),
+    b'l': lambda r: [r.read_value() for _ in range(r.read_uint())],
+    b'k': lambda r: {r.read_value(): r.read_value() for _ in range(r.read_uint())},
+    b'o': _read_model,
+}
+
+
+def dumps(value: Any) -> bytes:
+    """Сериализует значение.
+    
+    Args:
+        value: Модель из реестра или простое значение (None, bool, int,
+            float, str, Markup, bytes, datetime, tuple, list, dict)
+    
+    Returns:
+        Байты с версией формата
+    
+    Raises:
+        TypeError: Значение содержит неподдерживаемый тип
+    """
+    out = bytearray((FORMAT_VERSION,))
+    _encode(out, value)
+    return bytes(out)
+
+
+def loads(data: bytes) -> Any:
+    """Восстанавливает значение из байтов.
+    
+    Args:
+        data: Результат dumps()
+    
+    Returns:
+        Значение
+    
+    Raises:
+        ValueError: Другая версия формата или повреждённые данные
+    """
+    if not data or data[0] != FORMAT_VERSION:
+        raise ValueError("Неподдерживаемая версия формата")
+    reader = _Reader(data, 1)
+    try:
+        value = reader.read_value()
+    except (IndexError, KeyError, TypeError, UnicodeDecodeError) as e:
+        raise ValueError(f"Повреждённые данные: {e}") from e
+    if reader.pos != len(data):
+        raise ValueError("Лишние данные после значения")
+    return value
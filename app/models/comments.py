@@ -3,6 +3,7 @@
 Применяемые паттерны:
 - Data Transfer Object (DTO) — контейнер для данных комментария
 - Immutable Object — объект не изменяется после создания
+- Flyweight — компактный вариант разделяет объект автора
 
 Применяемые принципы:
 - Type safety — строгие типы данных
@@ -13,26 +14,14 @@ from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Optional
 
+from .authors import Author, shared_author
 
-@dataclass
-class Comment:
-    """Модель комментария к посту.
+
+class _CommentProperties:
+    """Общие вычисляемые свойства для всех вариантов модели комментария."""
     
-    Содержит информацию о комментарии включая автора и пост.
-    """
-    id: int
-    post_id: int
-    user_id: int
-    body: str
-    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: Optional[datetime] = None
+    __slots__ = ()
     
-    # Дополнительные поля из JOIN запросов
-    author_login: Optional[str] = None
-    author_discriminator: Optional[str] = None
-    author_roles: Optional[list[str]] = None
-    post_title: Optional[str] = None
-
     @property
     def author_display_name(self) -> str:
         """Возвращает отображаемое имя автора."""
@@ -43,7 +32,7 @@ class Comment:
     @property
     def author_is_admin(self) -> bool:
         """Проверяет, является ли автор администратором."""
-        return self.author_roles and 'admin' in self.author_roles
+        return bool(self.author_roles) and 'admin' in self.author_roles
     
     @property
     def created_date_formatted(self) -> str:
@@ -55,4 +44,80 @@ class Comment:
         """Проверяет, был ли комментарий отредактирован."""
         if not self.updated_at:
             return False
-        return abs((self.updated_at - self.created_at).total_seconds()) > 1
\ No newline at end of file
+        return abs((self.updated_at - self.created_at).total_seconds()) > 1
+
+
+@dataclass(slots=True)
+class Comment(_CommentProperties):
+    """Модель комментария к посту.
+    
+    Содержит информацию о комментарии включая автора и пост.
+    """
+    id: int
+    post_id: int
+    user_id: int
+    body: str
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    
+    # Дополнительные поля из JOIN запросов
+    author_login: Optional[str] = None
+    author_discriminator: Optional[str] = None
+    author_roles: Optional[tuple[str, ...]] = None
+    post_title: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class CompactComment(_CommentProperties):
+    """Неизменяемый компактный вариант комментария для кэшей.
+    
+    Данные автора хранятся в общем объекте Author.
+    """
+    id: int
+    post_id: int
+    user_id: int
+    body: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    author: Optional[Author] = None
+    post_title: Optional[str] = None
+    
+    @property
+    def author_login(self) -> Optional[str]:
+        """Возвращает логин автора."""
+        return self.author.login if self.author else None
+    
+    @property
+    def author_discriminator(self) -> Optional[str]:
+        """Возвращает дискриминатор автора."""
+        return self.author.discriminator if self.author else None
+    
+    @property
+    def author_roles(self) -> tuple[str, ...]:
+        """Возвращает роли автора."""
+        return self.author.roles if self.author else ()
+    
+    @classmethod
+    def from_comment(cls, comment: Comment) -> 'CompactComment':
+        """Создаёт компактный комментарий из обычной модели.
+        
+        Args:
+            comment: Исходный комментарий
+        
+        Returns:
+            Неизменяемый комментарий с общим объектом автора
+        """
+        return cls(
+            id=comment.id,
+            post_id=comment.post_id,
+            user_id=comment.user_id,
+            body=comment.body,
+            created_at=comment.created_at,
+            updated_at=comment.updated_at,
+            author=shared_author(
+                comment.author_login,
+                comment.author_discriminator,
+                comment.author_roles
+            ),
+            post_title=comment.post_title
+        )
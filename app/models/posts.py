@@ -3,6 +3,7 @@
 Применяемые паттерны:
 - Data Transfer Object (DTO) — контейнер для данных поста
 - Immutable Object — объект не изменяется после создания
+- Flyweight — компактный вариант разделяет объект автора
 
 Применяемые принципы:
 - Type safety — строгие типы данных
@@ -13,25 +14,14 @@ from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Optional
 
+from .authors import Author, shared_author
 
-@dataclass
-class Post:
-    """Модель поста блога.
+
+class _PostProperties:
+    """Общие вычисляемые свойства для всех вариантов модели поста."""
     
-    Содержит основную информацию о посте включая автора.
-    """
-    id: int
-    user_id: int
-    title: str
-    body: str
-    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
-    updated_at: Optional[datetime] = None
+    __slots__ = ()
     
-    # Дополнительные поля из JOIN запросов
-    author_login: Optional[str] = None
-    author_discriminator: Optional[str] = None
-    author_roles: Optional[list[str]] = None
-
     @property
     def author_display_name(self) -> str:
         """Возвращает отображаемое имя автора."""
@@ -42,7 +32,7 @@ class Post:
     @property
     def author_is_admin(self) -> bool:
         """Проверяет, является ли автор администратором."""
-        return self.author_roles and 'admin' in self.author_roles
+        return bool(self.author_roles) and 'admin' in self.author_roles
     
     @property
     def excerpt(self, max_length: int = 200) -> str:
@@ -50,7 +40,7 @@ class Post:
         
         Args:
             max_length: Максимальная длина excerpt
-            
+        
         Returns:
             Краткое содержание поста
         """
@@ -68,4 +58,76 @@ class Post:
         """Проверяет, был ли пост отредактирован."""
         if not self.updated_at:
             return False
-        return abs((self.updated_at - self.created_at).total_seconds()) > 1
\ No newline at end of file
+        return abs((self.updated_at - self.created_at).total_seconds()) > 1
+
+
+@dataclass(slots=True)
+class Post(_PostProperties):
+    """Модель поста блога.
+    
+    Содержит основную информацию о посте включая автора.
+    """
+    id: int
+    user_id: int
+    title: str
+    body: str
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    
+    # Дополнительные поля из JOIN запросов
+    author_login: Optional[str] = None
+    author_discriminator: Optional[str] = None
+    author_roles: Optional[tuple[str, ...]] = None
+
+
+@dataclass(frozen=True, slots=True)
+class CompactPost(_PostProperties):
+    """Неизменяемый компактный вариант поста для кэшей и листингов.
+    
+    Данные автора хранятся в общем объекте Author, поэтому тысячи
+    постов одного автора не дублируют логин и список ролей.
+    """
+    id: int
+    user_id: int
+    title: str
+    body: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    author: Optional[Author] = None
+    
+    @property
+    def author_login(self) -> Optional[str]:
+        """Возвращает логин автора."""
+        return self.author.login if self.author else None
+    
+    @property
+    def author_discriminator(self) -> Optional[str]:
+        """Возвращает дискриминатор автора."""
+        return self.author.discriminator if self.author else None
+    
+    @property
+    def author_roles(self) -> tuple[str, ...]:
+        """Возвращает роли автора."""
+        return self.author.roles if self.author else ()
+    
+    @classmethod
+    def from_post(cls, post: Post) -> 'CompactPost':
+        """Создаёт компактный пост из обычной модели.
+        
+        Args:
+            post: Исходный пост
+        
+        Returns:
+            Неизменяемый пост с общим объектом автора
+        """
+        return cls(
+            id=post.id,
+            user_id=post.user_id,
+            title=post.title,
+            body=post.body,
+            created_at=post.created_at,
+            updated_at=post.updated_at,
+            author=shared_author(
+                post.author_login, post.author_discriminator, post.author_roles
+            )
+        )
@@ -3,6 +3,7 @@
 Применяемые паттерны:
 - Data Transfer Object (DTO) — контейнер для данных пользователя
 - Immutable Object — объект не изменяется после создания
+- Interning — общий кортеж ролей для пользователей с одинаковыми ролями
 
 Применяемые принципы:
 - Type safety — строгие типы данных
@@ -15,8 +16,10 @@ from typing import Optional
 
 from app.constants.roles import SystemRole
 
+from .authors import intern_roles
 
-@dataclass
+
+@dataclass(slots=True)
 class User:
     """Модель пользователя блога.
     
@@ -29,9 +32,10 @@ class User:
     password_hash: str
     created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: Optional[datetime] = None
+    token_version: int = 0  # Увеличивается при смене пароля или ролей
     
     # Дополнительные поля из JOIN запросов
-    _roles: Optional[list[str]] = None  # Список ролей пользователя
+    _roles: Optional[tuple[str, ...]] = None  # Кортеж ролей пользователя
 
     @property
     def login_full(self) -> str:
@@ -46,9 +50,9 @@ class User:
         return not (self.login == 'admin' and self.discriminator == '0000')
     
     @property
-    def roles(self) -> list[str]:
-        """Возвращает список ролей пользователя."""
-        return self._roles or []
+    def roles(self) -> tuple[str, ...]:
+        """Возвращает роли пользователя."""
+        return self._roles or ()
     
     @property
     def is_admin(self) -> bool:
@@ -99,5 +103,27 @@ class User:
             password_hash=password_hash
         )
         # Устанавливаем роль по умолчанию или переданные роли
-        user._roles = initial_roles or ['user']
-        return user
\ No newline at end of file
+        user._roles = intern_roles(initial_roles or ['user'])
+        return user
+    
+    @classmethod
+    def from_token_claims(cls, claims: dict) -> 'User':
+        """Восстанавливает пользователя из подписанных claims JWT токена.
+        
+        Такой объект не содержит хэша пароля и используется только
+        для идентификации текущего пользователя без запроса к БД.
+        
+        Args:
+            claims: Payload проверенного токена с полями login, disc, roles
+            
+        Returns:
+            Пользователь без хэша пароля
+        """
+        return cls(
+            id=claims['user_id'],
+            login=claims['login'],
+            discriminator=claims.get('disc'),
+            password_hash='',
+            token_version=claims.get('ver', 0),
+            _roles=intern_roles(claims.get('roles'))
+        )
\ No newline at end of file
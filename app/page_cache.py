@@ -0,0 +1,373 @@
+"""Кэширование публичных страниц для анонимных посетителей.
+
+Применяемые паттерны:
+- Decorator — обработчик помечается @cache_page
+- Cache-Aside — страница рендерится только при промахе
+- Conditional GET — ETag и Last-Modified, ответ 304 без рендеринга
+- Observer — записи сбрасываются по сигналу tags_invalidated от сервисов,
+  другие процессы узнают о сбросе из общего журнала (InvalidationLog)
+- Surrogate Key — обработчик отмечает показанные сущности тегами, теги
+  попадают в индекс кэша и в заголовок Surrogate-Key для прокси
+- Hole Punching — общая оболочка страницы с метками персональных фрагментов
+- Single Flight — одновременные промахи по одному ключу в потоках воркера
+  рендерят страницу один раз; пока она рендерится, истёкшая версия
+  отдаётся остальным
+- Precomputation — страницы ошибок рендерятся один раз и отдаются
+  из оболочки (error_page)
+
+Применяемые принципы:
+- Explicit is better than implicit — кэшируются только помеченные страницы
+- Secure by default — запросы с flash-сообщениями кэш обходят, а страница
+  с CSRF токеном вне персональных фрагментов не попадает в общий кэш
+
+Ключ кэша — путь с query string. Обработчик страницы выполняется один
+раз в режиме оболочки (app.holes): вместо частей, зависящих от
+пользователя, остаются метки. Авторизованный пользователь получает
+оболочку с заполненными для него метками. Для анонимного посетителя
+страница одинакова, поэтому её тело и gzip-вариант хранятся готовыми
+и отдаются без запросов к БД и Jinja.
+
+Страницы и оболочки хранятся в памяти процесса, поэтому рендеры не
+объединяются между воркерами: блокировка между процессами заставила бы
+воркер ждать рендер, результат которого он не увидит. Между воркерами
+объединяются загрузки постов из общего кэша (PostService).
+"""
+
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from flask import Flask, current_app, g, render_template, request, session
+from werkzeug.http import http_date
+
+from .cache.invalidation import InvalidationLog
+from .cache.page import CachedPage, PageCache
+from .cache.single_flight import MISSING, SingleFlight
+from .holes import fill_holes, shell_mode
+from .services.csrf_service import CSRF_PLACEHOLDER, deferred_tokens
+from .signals import remote_tags_invalidated, tags_invalidated
+
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+
+# Файл журнала сбросов рядом с БД, если общий кэш не настроен
+INVALIDATION_LOG_SUFFIX = '-invalidations'
+
+
+def init_page_cache(app: Flask) -> PageCache:
+    """Создаёт кэш страниц и подписывает его на изменения данных.
+    
+    Args:
+        app: Flask приложение
+    
+    Сбросы других процессов применяются в начале каждого запроса: к
+    страницам и, через сигнал remote_tags_invalidated, к кэшам постов и
+    пользователей процесса, из которых страница будет перерисована.
+    Журнал сбросов лежит в файле общего кэша, а если он не настроен —
+    в файле рядом с БД приложения (запись в саму БД сбрасывала бы
+    QueryCache через data_version). Для БД в памяти (один процесс)
+    журнал не нужен.
+    
+    Returns:
+        Кэш страниц (доступен как app.page_cache)
+    """
+    from .db import get_db_path
+    
+    path = app.config['SHARED_CACHE_PATH']
+    db_path = get_db_path(app.config['DATABASE_URL'])
+    if not path and db_path and db_path != ':memory:':
+        path = db_path + INVALIDATION_LOG_SUFFIX
+    invalidations = None
+    if path:
+        invalidations = InvalidationLog(
+            path, 'pages', app.config['PAGE_CACHE_TTL'] + app.config['PAGE_CACHE_STALE_TTL']
+        )
+    
+    app.page_cache = PageCache(
+        app.config['PAGE_CACHE_SIZE'],
+        app.config['PAGE_CACHE_TTL'],
+        app.config['PAGE_CACHE_GZIP_LEVEL'],
+        app.config['PAGE_CACHE_GZIP_MIN_SIZE'],
+        app.config['PAGE_CACHE_STALE_TTL'],
+        SingleFlight('pages', timeout=app.config['SINGLE_FLIGHT_TIMEOUT']),
+        invalidations,
+        lambda tags: remote_tags_invalidated.send(app.page_cache, tags=tags)
+    )
+    tags_invalidated.connect(app.page_cache.invalidate_tags)
+    app.before_request(app.page_cache.sync)
+    app.after_request(set_surrogate_key_header)
+    return app.page_cache
+
+
+def add_surrogate_keys(*tags: str) -> None:
+    """Отмечает сущности, показанные в ответе на текущий запрос.
+    
+    Args:
+        *tags: Теги вида 'post:42', 'user:7', 'listing:posts'
+    """
+    g.setdefault('surrogate_keys', set()).update(tags)
+
+
+def set_surrogate_key_header(response):
+    """Добавляет заголовок Surrogate-Key с тегами ответа.
+    
+    Args:
+        response: Flask response объект
+    
+    Returns:
+        Тот же response
+    """
+    tags = g.get('surrogate_keys')
+    if tags and SURROGATE_KEY_HEADER not in response.headers:
+        response.headers[SURROGATE_KEY_HEADER] = ' '.join(sorted(tags))
+    return response
+
+
+def is_cacheable_request() -> bool:
+    """Проверяет, можно ли отдать запрос из общего кэша.
+    
+    Returns:
+        True для GET/HEAD без flash-сообщений
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # Flash-сообщение попало бы в общую страницу
+    if session.get('_flashes'):
+        return False
+    return True
+
+
+def is_anonymous_request() -> bool:
+    """Проверяет, что запрос без cookie авторизации.
+    
+    Returns:
+        True если у посетителя нет auth_token
+    """
+    return 'auth_token' not in request.cookies
+
+
+def _personalize(html: str) -> str:
+    """Заполняет метки оболочки и CSRF токен для текущего пользователя."""
+    return current_app.csrf_service.fill_placeholder(fill_holes(html))
+
+
+def _or_missing(value: Any) -> Any:
+    """Переводит промах кэша (None) в маркер MISSING для SingleFlight."""
+    return MISSING if value is None else value
+
+
+def _render_shell(cache: PageCache, key: str, view: Callable, args, kwargs) -> tuple:
+    """Рендерит оболочку страницы и сохраняет её.
+    
+    Args:
+        cache: Кэш страниц
+        key: Ключ запроса
+        view: Обработчик страницы
+        args: Позиционные аргументы обработчика
+        kwargs: Именованные аргументы обработчика
+    
+    Returns:
+        Пара (CachedShell, None) или (None, готовый ответ), если ответ не
+        подходит для кэширования (ошибка, редирект, не HTML)
+    """
+    generation = cache.generation
+    with shell_mode(), deferred_tokens():
+        response = current_app.make_response(view(*args, **kwargs))
+    
+    if response.direct_passthrough or response.mimetype != 'text/html':
+        return None, response
+    if response.status_code != 200:
+        response.set_data(_personalize(response.get_data(as_text=True)))
+        return None, response
+    
+    shell = cache.store_shell(
+        key, response.get_data(as_text=True), generation, g.get('surrogate_keys', ())
+    )
+    return shell, None
+
+
+def _get_shell(cache: PageCache, key: str, view: Callable, args, kwargs) -> tuple:
+    """Возвращает оболочку страницы, рендеря её при промахе.
+    
+    Одновременные промахи ждут один рендер; если есть истёкшая оболочка,
+    они получают её сразу.
+    
+    Args:
+        cache: Кэш страниц
+        key: Ключ запроса
+        view: Обработчик страницы
+        args: Позиционные аргументы обработчика
+        kwargs: Именованные аргументы обработчика
+    
+    Returns:
+        Пара (CachedShell, None) или (None, готовый ответ), см. _render_shell
+    """
+    shell, stale = cache.lookup_shell(key)
+    if shell is None or stale:
+        rendered: dict[str, Any] = {}
+        
+        def render():
+            new_shell, rendered['response'] = _render_shell(cache, key, view, args, kwargs)
+            return new_shell
+        
+        shell = cache.flight.do(('shell', key), render, stale=_or_missing(shell))
+        if shell is None:
+            # Ответ не кэшируется: лидер отдаёт свой, ожидавшие рендерят сами
+            if 'response' in rendered:
+                return None, rendered['response']
+            return _render_shell(cache, key, view, args, kwargs)
+    
+    add_surrogate_keys(*shell.tags)
+    return shell, None
+
+
+def error_page(status: int):
+    """Ответ со страницей ошибки из заранее отрендеренной оболочки.
+    
+    Страница ошибки не зависит от запроса, кроме персональных фрагментов,
+    поэтому шаблон рендерится один раз, а в ответе заполняются только метки.
+    
+    Args:
+        status: HTTP статус (шаблон errors/<status>.html)
+    
+    Returns:
+        Ответ с кодом status
+    """
+    cache = current_app.page_cache
+    if not cache.enabled or session.get('_flashes'):
+        return render_template(f'errors/{status}.html'), status
+    
+    key = f'error:{status}'
+    shell = cache.get_shell(key)
+    if shell is None:
+        with shell_mode(), deferred_tokens():
+            html = render_template(f'errors/{status}.html')
+        shell = cache.store_shell(key, html, cache.generation)
+    
+    return current_app.response_class(_personalize(shell.html), status=status, mimetype='text/html')
+
+
+def _render_page(cache: PageCache, key: str, view: Callable, args, kwargs, rendered: dict):
+    """Строит страницу для анонимного посетителя и сохраняет её.
+    
+    Args:
+        cache: Кэш страниц
+        key: Ключ запроса
+        view: Обработчик страницы
+        args: Позиционные аргументы обработчика
+        kwargs: Именованные аргументы обработчика
+        rendered: Сюда кладётся готовый ответ, если страница не кэшируется
+    
+    Returns:
+        Запись страницы или None
+    """
+    generation = cache.generation
+    shell, response = _get_shell(cache, key, view, args, kwargs)
+    if shell is None:
+        rendered['response'] = response
+        return None
+    
+    with deferred_tokens():
+        body = fill_holes(shell.html).encode('utf-8')
+    if CSRF_PLACEHOLDER.encode('ascii') in body:
+        # Страница с формой не общая: отдаём с токеном посетителя без кэширования
+        rendered['response'] = current_app.response_class(
+            current_app.csrf_service.fill_placeholder(body), mimetype='text/html'
+        )
+        return None
+    
+    return cache.store(key, body, 'text/html', generation, shell.tags)
+
+
+def _not_modified(page: CachedPage, etag: str) -> bool:
+    """Проверяет условные заголовки запроса."""
+    # If-Modified-Since учитывается только без If-None-Match (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is not None:
+        modified = datetime.fromtimestamp(page.last_modified, timezone.utc)
+        return modified <= since
+    return False
+
+
+def _page_response(page: CachedPage, status: str):
+    """Формирует ответ из закэшированной страницы.
+    
+    Args:
+        page: Закэшированная страница
+        status: Значение заголовка X-Page-Cache (HIT, STALE или MISS)
+    
+    Returns:
+        Ответ 200 с подходящим вариантом тела или 304
+    """
+    use_gzip = page.gzip_body is not None and request.accept_encodings['gzip'] > 0
+    etag = page.gzip_etag if use_gzip else page.etag
+    
+    if _not_modified(page, etag):
+        current_app.page_cache.not_modified += 1
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(
+            page.gzip_body if use_gzip else page.body, mimetype=page.mimetype
+        )
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    
+    response.set_etag(etag)
+    response.headers['Last-Modified'] = http_date(page.last_modified)
+    # Браузер всегда переспрашивает страницу, но получает 304 без тела
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding, Cookie'
+    response.headers['X-Page-Cache'] = status
+    return response
+
+
+def cache_page(view: Callable) -> Callable:
+    """Декоратор кэширования страницы для анонимных посетителей.
+    
+    Args:
+        view: Обработчик страницы
+    
+    Returns:
+        Обёрнутый обработчик
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        cache = current_app.page_cache
+        if not cache.enabled or not is_cacheable_request():
+            return view(*args, **kwargs)
+        
+        key = request.full_path
+        if not is_anonymous_request():
+            shell_hit = key in cache.shells
+            shell, response = _get_shell(cache, key, view, args, kwargs)
+            if shell is None:
+                return response
+            
+            response = current_app.response_class(_personalize(shell.html), mimetype='text/html')
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.headers['X-Page-Cache'] = 'SHELL-HIT' if shell_hit else 'SHELL-MISS'
+            return response
+        
+        stale_page, stale = cache.lookup(key)
+        if stale_page is not None and not stale:
+            add_surrogate_keys(*stale_page.tags)
+            return _page_response(stale_page, 'HIT')
+        
+        rendered: dict[str, Any] = {}
+        page: Optional[CachedPage] = cache.flight.do(
+            ('page', key),
+            lambda: _render_page(cache, key, view, args, kwargs, rendered),
+            stale=_or_missing(stale_page)
+        )
+        if page is None:
+            # Ответ не кэшируется: лидер отдаёт свой, ожидавшие рендерят сами
+            if 'response' not in rendered:
+                page = _render_page(cache, key, view, args, kwargs, rendered)
+            if page is None:
+                return rendered['response']
+        
+        add_surrogate_keys(*page.tags)
+        return _page_response(page, 'STALE' if page is stale_page else 'MISS')
+    
+    return decorated_function
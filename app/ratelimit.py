@@ -0,0 +1,400 @@
+"""Ограничение частоты запросов.
+
+Применяемые паттерны:
+- Extension — один объект Limiter, подключаемый к приложению в create_app
+- Strategy — хранилище счётчиков выбирается RATELIMIT_STORAGE_URI
+- Write-Behind — приращения счётчиков копятся в процессе и пишутся пачками
+- Two-Tier Filter — скетч отсекает ключи далеко от порога, точные
+  счётчики заводятся только для близких к нему
+
+Применяемые принципы:
+- Shared state — все процессы приложения на хосте видят одни счётчики
+- Bounded memory — локальный кэш счётчиков ограничен, истёкшие строки удаляются
+- Explicit is better than implicit — задержка записи задаётся конфигурацией
+
+Хранилище `sqlite:///path/to/limits.db` — файл SQLite в режиме WAL,
+общий для воркеров одного хоста. Каждый процесс прибавляет приращения
+к последнему прочитанному значению и записывает их раз в flush_interval
+секунд или при накоплении batch_size приращений, поэтому лимит может
+быть превышен не больше чем на несбросившиеся приращения других процессов.
+
+Приблизительный режим (RATELIMIT_APPROXIMATE) заменяет точные лимиты
+входа и регистрации: память скетча фиксирована при любом числе адресов.
+Ключ с оценкой не выше near_ratio·limit пропускается без точного
+счёта. Точный счёт ведёт стратегия Flask-Limiter на хранилище
+RATELIMIT_STORAGE_URI, общем для воркеров, поэтому лимит не растёт с их
+числом; в памяти процесса остаются только скетч и список ключей,
+переведённых на точный счёт. При переводе ключ получает в хранилище
+оценку скетча, которая не меньше числа его запросов в этом процессе:
+ключ может получить отказ раньше, но в одном процессе не пройдёт больше
+limit запросов за окно. Запросы, пропущенные скетчем до перевода, уже
+отвечены, поэтому с N воркерами ключ пройдёт не больше
+limit + (N - 1)·near_ratio·limit запросов (плюс задержка записи
+хранилища) вместо N·limit у счётчиков в памяти каждого воркера.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from flask import abort, current_app, request
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits import parse
+from limits.storage import MemoryStorage, Storage
+from limits.strategies import FixedWindowRateLimiter, RateLimiter
+
+from .cache.count_min import WindowedCountMinSketch
+
+# Лимиты для view задаются декораторами, настройки — RATELIMIT_* в конфигурации
+limiter = Limiter(key_func=get_remote_address)
+
+
+class SQLiteLimiterStorage(Storage):
+    """Хранилище счётчиков Flask-Limiter в файле SQLite (стратегия fixed-window)."""
+    
+    STORAGE_SCHEME = ['sqlite']
+    
+    def __init__(
+        self,
+        uri: Optional[str] = None,
+        wrap_exceptions: bool = False,
+        flush_interval: float = 1.0,
+        batch_size: int = 100,
+        max_keys: int = 10000,
+        **options: Any
+    ):
+        """Инициализирует хранилище.
+        
+        Args:
+            uri: Адрес вида sqlite:///path/to/limits.db
+            wrap_exceptions: Оборачивать ошибки SQLite в limits.errors.StorageError
+            flush_interval: Максимальная задержка записи приращений в секундах
+            batch_size: Количество несохранённых ключей, при котором запись выполняется сразу
+            max_keys: Максимум ключей в локальном кэше значений
+        """
+        self.path = (uri or 'sqlite:///ratelimit.db')[len('sqlite:///'):]
+        self.flush_interval = float(flush_interval)
+        self.batch_size = max(1, int(batch_size))
+        self.max_keys = max(1, int(max_keys))
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.RLock()
+        # key -> [приращение, expiry в секундах]
+        self._pending: dict[str, list] = {}
+        # key -> (значение, expires_at, время чтения) из последнего чтения или записи
+        self._known: OrderedDict[str, tuple[int, float, float]] = OrderedDict()
+        self._flushed_at = time.monotonic()
+        self.flushes = 0
+        self.collected = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+    
+    @property
+    def base_exceptions(self) -> type[Exception]:
+        return sqlite3.Error
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открывает соединение (заново после fork)."""
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(
+                self.path, timeout=5.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID""")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rate_limits_expires ON rate_limits(expires_at)"
+            )
+            # Приращения родительского процесса принадлежат ему
+            self._pending.clear()
+            self._known.clear()
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+    
+    def _remember(self, key: str, value: int, expires_at: float) -> None:
+        self._known[key] = (value, expires_at, time.monotonic())
+        self._known.move_to_end(key)
+        while len(self._known) > self.max_keys:
+            self._known.popitem(last=False)
+    
+    def _stored(self, key: str, now: float) -> tuple[int, float]:
+        """Возвращает сохранённое значение и срок окна (0, 0 если окна нет).
+        
+        Значение перечитывается из файла не чаще раза в flush_interval.
+        """
+        known = self._known.get(key)
+        if known is None or time.monotonic() - known[2] >= self.flush_interval:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM rate_limits WHERE key = ?", (key,)
+            ).fetchone()
+            self._remember(key, *(row if row else (0, 0.0)))
+            known = self._known[key]
+        return known[:2] if known[1] > now else (0, 0.0)
+    
+    def flush(self) -> int:
+        """Записывает накопленные приращения одной транзакцией.
+        
+        Returns:
+            Количество записанных ключей
+        """
+        with self._lock:
+            conn = self._connect()
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+            if not pending:
+                return 0
+            
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    """INSERT INTO rate_limits (key, value, expires_at) VALUES (?, ?, ?)
+                       ON CONFLICT (key) DO UPDATE SET
+                           value = CASE WHEN expires_at <= ? THEN excluded.value
+                                        ELSE value + excluded.value END,
+                           expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at
+                                             ELSE expires_at END""",
+                    [
+                        (key, amount, now + expiry, now, now)
+                        for key, (amount, expiry) in pending.items()
+                    ]
+                )
+                placeholders = ','.join('?' * len(pending))
+                rows = conn.execute(
+                    f"SELECT key, value, expires_at FROM rate_limits WHERE key IN ({placeholders})",
+                    tuple(pending)
+                ).fetchall()
+                self.collected += conn.execute(
+                    "DELETE FROM rate_limits WHERE expires_at <= ?", (now,)
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            
+            for key, value, expires_at in rows:
+                self._remember(key, value, expires_at)
+            self.flushes += 1
+            return len(pending)
+    
+    def _maybe_flush(self) -> None:
+        if (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._flushed_at >= self.flush_interval
+        ):
+            self.flush()
+    
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        """Увеличивает счётчик ключа.
+        
+        Args:
+            key: Ключ лимита
+            expiry: Длина окна в секундах
+            amount: Приращение
+        
+        Returns:
+            Значение счётчика с учётом несохранённых приращений
+        """
+        with self._lock:
+            self._connect()
+            value, expires_at = self._stored(key, time.time())
+            pending = self._pending.setdefault(key, [0, expiry])
+            pending[0] += amount
+            total = value + pending[0]
+            self._maybe_flush()
+            return total
+    
+    def get(self, key: str) -> int:
+        """Возвращает значение счётчика ключа.
+        
+        Args:
+            key: Ключ лимита
+        
+        Returns:
+            Значение счётчика с учётом несохранённых приращений
+        """
+        with self._lock:
+            self._connect()
+            value, _ = self._stored(key, time.time())
+            pending = self._pending.get(key)
+            return value + (pending[0] if pending else 0)
+    
+    def get_expiry(self, key: str) -> float:
+        """Возвращает момент окончания окна ключа.
+        
+        Args:
+            key: Ключ лимита
+        
+        Returns:
+            Unix timestamp окончания окна
+        """
+        with self._lock:
+            self._connect()
+            now = time.time()
+            _, expires_at = self._stored(key, now)
+            if expires_at:
+                return expires_at
+            pending = self._pending.get(key)
+            return now + (pending[1] if pending else 0)
+    
+    def check(self) -> bool:
+        """Проверяет доступность файла счётчиков."""
+        try:
+            with self._lock:
+                self._connect().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+    
+    def reset(self) -> Optional[int]:
+        """Удаляет все счётчики.
+        
+        Returns:
+            Количество удалённых ключей
+        """
+        with self._lock:
+            conn = self._connect()
+            self._pending.clear()
+            self._known.clear()
+            return conn.execute("DELETE FROM rate_limits").rowcount
+    
+    def clear(self, key: str) -> None:
+        """Сбрасывает счётчик ключа.
+        
+        Args:
+            key: Ключ лимита
+        """
+        with self._lock:
+            conn = self._connect()
+            self._pending.pop(key, None)
+            self._known.pop(key, None)
+            conn.execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику хранилища.
+        
+        Returns:
+            Словарь с размером локального кэша, очередью и числом записей
+        """
+        return {
+            'path': self.path,
+            'known_keys': len(self._known),
+            'max_keys': self.max_keys,
+            'pending': len(self._pending),
+            'flushes': self.flushes,
+            'collected': self.collected,
+        }
+
+
+class ApproximateLimiter:
+    """Лимит запросов по ключу: скетч для всех ключей, точный счёт у порога."""
+    
+    def __init__(
+        self,
+        limit: str,
+        epsilon: float = 0.001,
+        delta: float = 0.01,
+        buckets: int = 6,
+        near_ratio: float = 0.5,
+        max_exact_keys: int = 10000,
+        name: str = 'approximate',
+        strategy: Optional[RateLimiter] = None
+    ):
+        """Инициализирует лимит.
+        
+        Args:
+            limit: Лимит в нотации limits, например '10 per minute'
+            epsilon: Допустимая ошибка скетча как доля запросов в окне
+            delta: Вероятность превысить эту ошибку
+            buckets: Количество интервалов окна в скетче
+            near_ratio: Доля лимита, с которой ключ считается точно
+            max_exact_keys: Максимум ключей, запоминаемых как переведённые на точный счёт
+            name: Имя лимита для статистики и ключей хранилища
+            strategy: Стратегия Flask-Limiter с общим хранилищем для точного
+                счёта (по умолчанию — fixed-window в памяти процесса)
+        """
+        self.item = parse(limit)
+        self.name = name
+        self.limit = self.item.amount
+        self.window = self.item.get_expiry()
+        self.threshold = max(1, int(self.limit * near_ratio))
+        self.max_exact_keys = max(1, max_exact_keys)
+        self._sketch = WindowedCountMinSketch(self.window, epsilon, delta, buckets, name=name)
+        self._strategy = strategy or FixedWindowRateLimiter(MemoryStorage())
+        self._exact_keys: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.exact_checks = 0
+        self.rejected = 0
+    
+    def hit(self, key: str) -> bool:
+        """Учитывает запрос и проверяет лимит.
+        
+        Args:
+            key: Ключ клиента (IP адрес)
+        
+        Returns:
+            True если запрос разрешён
+        """
+        estimate = self._sketch.add(key)
+        with self._lock:
+            exact = key in self._exact_keys
+            if exact:
+                self._exact_keys.move_to_end(key)
+            elif estimate > self.threshold:
+                self._exact_keys[key] = None
+                while len(self._exact_keys) > self.max_exact_keys:
+                    self._exact_keys.popitem(last=False)
+        
+        # Оценка не меньше настоящего счёта: ниже порога ключ точно не превысил лимит
+        if not exact and estimate <= self.threshold:
+            self.fast_path += 1
+            return True
+        
+        self.exact_checks += 1
+        # Запросы, пропущенные без точного счёта, учитываются по оценке
+        cost = 1 if exact else min(estimate, self.limit + 1)
+        if not self._strategy.hit(self.item, self.name, key, cost=cost):
+            self.rejected += 1
+            return False
+        return True
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику скетча и точных счётчиков.
+        
+        Returns:
+            Словарь с параметрами скетча, числом точных ключей и отказов
+        """
+        stats = self._sketch.stats()
+        stats.update(
+            limit=self.limit,
+            threshold=self.threshold,
+            exact_keys=len(self._exact_keys),
+            fast_path=self.fast_path,
+            exact_checks=self.exact_checks,
+            rejected=self.rejected,
+        )
+        return stats
+
+
+def approximate_mode() -> bool:
+    """Проверяет, заменены ли точные лимиты view приблизительными (exempt_when)."""
+    return bool(getattr(current_app, 'approximate_limiters', None))
+
+
+def check_approximate_limit() -> None:
+    """Первый фильтр запросов к view с приблизительным лимитом (before_request)."""
+    limiters = getattr(current_app, 'approximate_limiters', None)
+    approximate = limiters.get(request.endpoint) if limiters else None
+    if approximate is not None and not approximate.hit(get_remote_address()):
+        abort(429, description=f"{approximate.limit} per {int(approximate.window)} second")
@@ -6,7 +6,12 @@
 """
 
 from .comment_repo import CommentRepository
+from .login_attempt_repo import LoginAttemptRepository
 from .post_repo import PostRepository
+from .token_repo import RevokedTokenRepository
 from .user_repo import UserRepository
 
-__all__ = ['UserRepository', 'PostRepository', 'CommentRepository']
\ No newline at end of file
+__all__ = [
+    'UserRepository', 'PostRepository', 'CommentRepository', 'RevokedTokenRepository',
+    'LoginAttemptRepository'
+]
\ No newline at end of file
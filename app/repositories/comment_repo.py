@@ -14,7 +14,9 @@ from datetime import datetime
 from typing import List, Optional
 
 from ..db import execute_insert, execute_query, execute_update
+from ..models.authors import intern_roles
 from ..models.comments import Comment
+from ..signals import comment_changed
 
 
 class CommentRepository:
@@ -49,7 +51,7 @@ class CommentRepository:
         result = execute_query(query, (comment_id,), fetch_one=True)
         
         if result:
-            roles = result['author_roles'].split(',') if result['author_roles'] else []
+            roles = intern_roles(result['author_roles'])
             return Comment(
                 id=result['id'],
                 post_id=result['post_id'],
@@ -93,7 +95,7 @@ class CommentRepository:
         
         comments = []
         for result in results:
-            roles = result['author_roles'].split(',') if result['author_roles'] else []
+            roles = intern_roles(result['author_roles'])
             comments.append(Comment(
                 id=result['id'],
                 post_id=result['post_id'],
@@ -138,7 +140,7 @@ class CommentRepository:
         
         comments = []
         for result in results:
-            roles = result['author_roles'].split(',') if result['author_roles'] else []
+            roles = intern_roles(result['author_roles'])
             comments.append(Comment(
                 id=result['id'],
                 post_id=result['post_id'],
@@ -169,10 +171,12 @@ class CommentRepository:
         VALUES (?, ?, ?, ?, ?)
         """
         now = datetime.utcnow()
-        return execute_insert(
+        comment_id = execute_insert(
             query,
             (post_id, user_id, body, now, now)
         )
+        comment_changed.send(self, post_id=post_id, comment_id=comment_id)
+        return comment_id
     
     def update_comment(self, comment_id: int, body: str) -> bool:
         """Обновляет комментарий.
@@ -192,6 +196,8 @@ class CommentRepository:
             query,
             (body, datetime.utcnow(), comment_id)
         )
+        if affected_rows > 0:
+            self._notify_changed(comment_id)
         return affected_rows > 0
     
     def delete_comment(self, comment_id: int) -> bool:
@@ -203,10 +209,41 @@ class CommentRepository:
         Returns:
             True если комментарий удален
         """
+        # Запоминаем пост до удаления, чтобы сбросить его кэши
+        post_id = self._find_post_id(comment_id)
+        
         query = "DELETE FROM comments WHERE id = ?"
         affected_rows = execute_update(query, (comment_id,))
+        if affected_rows > 0:
+            comment_changed.send(self, post_id=post_id, comment_id=comment_id)
         return affected_rows > 0
     
+    def _find_post_id(self, comment_id: int) -> Optional[int]:
+        """Возвращает ID поста, к которому относится комментарий."""
+        result = execute_query(
+            "SELECT post_id FROM comments WHERE id = ?",
+            (comment_id,),
+            fetch_one=True
+        )
+        return result['post_id'] if result else None
+    
+    def _notify_changed(self, comment_id: int) -> None:
+        """Отправляет сигнал об изменении комментария."""
+        comment_changed.send(
+            self,
+            post_id=self._find_post_id(comment_id),
+            comment_id=comment_id
+        )
+    
+    def find_all_ids(self) -> List[int]:
+        """Возвращает ID всех комментариев (для фильтра существующих комментариев).
+        
+        Returns:
+            Список ID
+        """
+        results = execute_query("SELECT id FROM comments", fetch_all=True)
+        return [row['id'] for row in results]
+    
     def count_comments(self, post_id: Optional[int] = None, user_id: Optional[int] = None) -> int:
         """Подсчитывает количество комментариев.
         
@@ -219,12 +256,12 @@ class CommentRepository:
         """
         if post_id:
             query = "SELECT COUNT(*) as count FROM comments WHERE post_id = ?"
-            result = execute_query(query, (post_id,), fetch_one=True)
+            result = execute_query(query, (post_id,), fetch_one=True, cache=True)
         elif user_id:
             query = "SELECT COUNT(*) as count FROM comments WHERE user_id = ?"
-            result = execute_query(query, (user_id,), fetch_one=True)
+            result = execute_query(query, (user_id,), fetch_one=True, cache=True)
         else:
             query = "SELECT COUNT(*) as count FROM comments"
-            result = execute_query(query, fetch_one=True)
+            result = execute_query(query, fetch_one=True, cache=True)
         
         return result['count'] if result else 0
\ No newline at end of file
@@ -0,0 +1,454 @@
+"""Репозиторий попыток входа и блокировок аккаунтов.
+
+Применяемые паттерны:
+- Repository (Хранилище) — инкапсулирует логику доступа к данным
+- Unit of Work — попытки и блокировки пишутся пачкой в одной транзакции
+- Partitioning — попытки хранятся в отдельной таблице на каждый день (UTC)
+- Rollup — старые дни сворачиваются в агрегаты по (ip, login)
+- Sliding Window Log — последние неудачные попытки пары (ip, login)
+  хранятся одной строкой login_failure_windows
+
+Применяемые принципы:
+- Single Responsibility — только попытки входа и блокировки аккаунтов
+- Explicit is better than implicit — явные SQL запросы
+- Bounded storage — старый день удаляется DROP TABLE, а не построчно
+
+Таблицы — общее для всех процессов состояние защиты от перебора
+(см. LoginAttemptService). Счётчик пары (ip, login) читается одним
+поиском по первичному ключу login_failure_windows, а не подсчётом
+строк дневных таблиц; дневные таблицы читаются только при загрузке
+состояния процесса и при свёртке.
+
+Миграция 009 оставляет попытки последних суток в прежней таблице
+login_attempts, чтобы обновление не обнулило счётчики неудачных
+попыток; adopt_legacy_attempts переносит их в дневные таблицы и окна.
+"""
+
+import calendar
+import re
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from ..db import execute_query, execute_update, get_db
+
+# Дневные таблицы login_attempts_YYYYMMDD
+PARTITION_PREFIX = 'login_attempts_'
+_DAY_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+# Таблица попыток до разбиения по дням (см. миграцию 009)
+LEGACY_TABLE = 'login_attempts'
+
+
+def parse_failures(failures: Optional[str]) -> List[float]:
+    """Разбирает отметки login_failure_windows.failures."""
+    return [float(value) for value in failures.split()] if failures else []
+
+
+def _merge_failures(stored: Optional[str], new: str, keep: int) -> str:
+    """Объединяет отметки строки окна с новыми (SQL функция merge_failures).
+    
+    Отметки записываются через repr(), поэтому отметка, уже сохранённая
+    этим или другим процессом, не дублируется.
+    """
+    merged = sorted(set(parse_failures(stored)).union(parse_failures(new)))
+    return ' '.join(repr(value) for value in merged[-keep:])
+
+
+class LoginAttemptRepository:
+    """Репозиторий для доступа к дневным таблицам попыток и locked_accounts."""
+    
+    def __init__(self):
+        """Инициализирует репозиторий."""
+        # Уже созданные в этом процессе дневные таблицы
+        self._partitions: set[str] = set()
+        # (день UTC, дни с таблицами) — список из sqlite_master за этот день
+        self._listed: Optional[Tuple[str, List[str]]] = None
+    
+    @staticmethod
+    def partition_name(day: str) -> str:
+        """Возвращает имя дневной таблицы.
+        
+        Args:
+            day: День в формате 'YYYY-MM-DD'
+        
+        Returns:
+            Имя таблицы login_attempts_YYYYMMDD
+        """
+        if not _DAY_RE.match(day):
+            raise ValueError(f"Некорректный день: {day!r}")
+        return PARTITION_PREFIX + day.replace('-', '')
+    
+    def _ensure_partition(self, conn, day: str) -> str:
+        """Создаёт дневную таблицу, если её ещё нет."""
+        table = self.partition_name(day)
+        if table not in self._partitions:
+            conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                ip_address TEXT NOT NULL,
+                login TEXT NOT NULL,
+                attempt_time TIMESTAMP NOT NULL,
+                success BOOLEAN NOT NULL DEFAULT 0
+            )""")
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_time ON {table}(attempt_time)"
+            )
+            self._partitions.add(table)
+            self._update_listed(add=day)
+        return table
+    
+    def _update_listed(self, add: Optional[str] = None, remove: Optional[str] = None) -> None:
+        """Учитывает в списке дней таблицу, созданную или удалённую процессом."""
+        listed = self._listed
+        if listed is None:
+            return
+        days = set(listed[1])
+        if add:
+            days.add(add)
+        if remove:
+            days.discard(remove)
+        self._listed = (listed[0], sorted(days))
+    
+    def list_partitions(self) -> List[str]:
+        """Возвращает дни, для которых есть таблицы попыток.
+        
+        sqlite_master читается раз в сутки (UTC) и, пока таблицы текущего
+        дня нет, при каждом вызове: другие процессы создают таблицы только
+        за текущий день. Таблицы, созданные и удалённые этим процессом,
+        попадают в список сразу.
+        
+        Returns:
+            Дни в формате 'YYYY-MM-DD' по возрастанию
+        """
+        today = time.strftime('%Y-%m-%d', time.gmtime())
+        listed = self._listed
+        if listed is None or listed[0] != today or today not in listed[1]:
+            results = execute_query(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                (PARTITION_PREFIX + '[0-9]*',),
+                fetch_all=True
+            )
+            days = []
+            for row in results:
+                digits = row['name'][len(PARTITION_PREFIX):]
+                days.append(f"{digits[:4]}-{digits[4:6]}-{digits[6:8]}")
+            listed = (today, sorted(days))
+            self._listed = listed
+        return list(listed[1])
+    
+    def _insert_attempts(self, conn, attempts: List[Tuple[str, str, bool, str]]) -> None:
+        """Раскладывает попытки по дневным таблицам (без commit)."""
+        by_day: dict[str, list] = {}
+        for attempt in attempts:
+            by_day.setdefault(attempt[3][:10], []).append(attempt)
+        
+        for day, rows in by_day.items():
+            table = self._ensure_partition(conn, day)
+            conn.executemany(
+                f"""INSERT INTO {table} (ip_address, login, success, attempt_time)
+                   VALUES (?, ?, ?, ?)""",
+                rows
+            )
+    
+    @staticmethod
+    def _merge_windows(
+        conn,
+        failures: dict[Tuple[str, str], List[float]],
+        window: float,
+        keep: int
+    ) -> None:
+        """Добавляет неудачные попытки к окнам и удаляет истёкшие окна (без commit)."""
+        conn.create_function('merge_failures', 3, _merge_failures, deterministic=True)
+        conn.executemany(
+            """INSERT INTO login_failure_windows (ip_address, login, failures, expires_at)
+               VALUES (?, ?, merge_failures(NULL, ?, ?), ?)
+               ON CONFLICT (ip_address, login) DO UPDATE SET
+                   failures = merge_failures(failures, excluded.failures, ?),
+                   expires_at = MAX(expires_at, excluded.expires_at)""",
+            [
+                (ip_address, login, ' '.join(map(repr, timestamps)), keep,
+                 max(timestamps) + window, keep)
+                for (ip_address, login), timestamps in failures.items()
+            ]
+        )
+        conn.execute(
+            "DELETE FROM login_failure_windows WHERE expires_at <= ?", (time.time(),)
+        )
+    
+    def save_batch(
+        self,
+        attempts: List[Tuple[str, str, bool, str]],
+        locks: List[Tuple[int, str, str]],
+        failures: Optional[dict[Tuple[str, str], List[float]]] = None,
+        window: float = 0.0,
+        keep: int = 0
+    ) -> int:
+        """Сохраняет накопленные попытки и блокировки одной транзакцией.
+        
+        Новые неудачные попытки добавляются к окнам пар (ip, login), в окне
+        остаются keep последних отметок; истёкшие окна удаляются.
+        
+        Args:
+            attempts: Кортежи (ip_address, login, success, attempt_time)
+            locks: Кортежи (user_id, locked_until, lock_reason)
+            failures: Новые неудачные попытки {(ip_address, login): [Unix timestamp]}
+            window: Длина окна подсчёта попыток в секундах
+            keep: Сколько последних отметок хранить в окне
+        
+        Returns:
+            Количество сохранённых записей
+        """
+        with get_db() as conn:
+            self._insert_attempts(conn, attempts)
+            if locks:
+                conn.executemany(
+                    """INSERT INTO locked_accounts (user_id, locked_until, lock_reason)
+                       VALUES (?, ?, ?)""",
+                    locks
+                )
+            if failures:
+                self._merge_windows(conn, failures, window, keep)
+            conn.commit()
+        return len(attempts) + len(locks)
+    
+    def adopt_legacy_attempts(self, window: float, keep: int) -> int:
+        """Переносит попытки, оставленные миграцией 009 в login_attempts.
+        
+        Попытки раскладываются по дневным таблицам, неудачные попытки
+        последних window секунд добавляются к окнам пар (ip, login), а
+        прежняя таблица удаляется — всё одной транзакцией. Процессы,
+        запущенные одновременно, переносят попытки ровно один раз.
+        
+        Args:
+            window: Длина окна подсчёта попыток в секундах
+            keep: Сколько последних отметок хранить в окне
+        
+        Returns:
+            Количество перенесённых попыток (0, если таблицы уже нет)
+        """
+        with get_db() as conn:
+            # Проверка и перенос под одной блокировкой записи
+            conn.execute("BEGIN IMMEDIATE")
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (LEGACY_TABLE,)
+            ).fetchone()
+            if not exists:
+                conn.rollback()
+                return 0
+            
+            attempts = [
+                (row['ip_address'], row['login'], bool(row['success']), row['attempt_time'])
+                for row in conn.execute(
+                    f"""SELECT ip_address, login, success, attempt_time FROM {LEGACY_TABLE}
+                       WHERE attempt_time IS NOT NULL ORDER BY attempt_time"""
+                )
+            ]
+            failures: dict[Tuple[str, str], List[float]] = {}
+            since = time.time() - window
+            for ip_address, login, success, attempt_time in attempts:
+                # attempt_time — CURRENT_TIMESTAMP, то есть UTC
+                timestamp = float(calendar.timegm(
+                    time.strptime(attempt_time[:19], '%Y-%m-%d %H:%M:%S')
+                ))
+                if not success and timestamp > since:
+                    timestamps = failures.setdefault((ip_address, login), [])
+                    # Отметки окна уникальны, а attempt_time хранит только секунды
+                    if timestamps and timestamp <= timestamps[-1]:
+                        timestamp = timestamps[-1] + 0.001
+                    timestamps.append(timestamp)
+            
+            self._insert_attempts(conn, attempts)
+            if failures:
+                self._merge_windows(conn, failures, window, keep)
+            conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+            conn.commit()
+        return len(attempts)
+    
+    def find_failure_window(self, ip_address: str, login: str, now: float) -> List[float]:
+        """Возвращает последние неудачные попытки пары IP + логин.
+        
+        Один поиск по первичному ключу; учитываются попытки всех процессов,
+        уже записанные в БД.
+        
+        Args:
+            ip_address: IP адрес клиента
+            login: Логин
+            now: Текущее время (Unix timestamp)
+        
+        Returns:
+            Времена попыток (Unix timestamp) по возрастанию
+        """
+        result = execute_query(
+            """SELECT failures FROM login_failure_windows
+               WHERE ip_address = ? AND login = ? AND expires_at > ?""",
+            (ip_address, login, now),
+            fetch_one=True
+        )
+        return parse_failures(result['failures']) if result else []
+    
+    def find_failure_windows(self, now: float) -> List[Tuple[str, str, List[float]]]:
+        """Возвращает все действующие окна неудачных попыток.
+        
+        Args:
+            now: Текущее время (Unix timestamp)
+        
+        Returns:
+            Список кортежей (ip_address, login, времена попыток по возрастанию)
+        """
+        results = execute_query(
+            "SELECT ip_address, login, failures FROM login_failure_windows WHERE expires_at > ?",
+            (now,),
+            fetch_all=True
+        )
+        return [
+            (row['ip_address'], row['login'], parse_failures(row['failures']))
+            for row in results
+        ]
+    
+    def find_failures_since(self, since: str) -> List[Tuple[str, str, str]]:
+        """Возвращает неудачные попытки входа начиная с момента since.
+        
+        Читаются только дневные таблицы, пересекающиеся с окном.
+        
+        Args:
+            since: Начало окна (формат CURRENT_TIMESTAMP)
+        
+        Returns:
+            Список кортежей (ip_address, login, attempt_time) по возрастанию времени
+        """
+        try:
+            results = self._query_failures_since(since)
+        except sqlite3.OperationalError:
+            # Таблицу из списка удалила свёртка другого процесса
+            self._listed = None
+            results = self._query_failures_since(since)
+        return [(row['ip_address'], row['login'], row['attempt_time']) for row in results]
+    
+    def _query_failures_since(self, since: str) -> List[dict]:
+        """Читает неудачные попытки из дневных таблиц, пересекающихся с окном."""
+        days = [day for day in self.list_partitions() if day >= since[:10]]
+        if not days:
+            return []
+        
+        query = " UNION ALL ".join(
+            f"""SELECT ip_address, login, attempt_time FROM {self.partition_name(day)}
+               WHERE success = 0 AND attempt_time > ?"""
+            for day in days
+        )
+        return execute_query(
+            query + " ORDER BY attempt_time", (since,) * len(days), fetch_all=True
+        )
+    
+    def compact_before(self, day: str) -> Tuple[int, int]:
+        """Сворачивает дневные таблицы старше day в login_attempt_totals и удаляет их.
+        
+        Каждый день переносится отдельной транзакцией, поэтому прерванная
+        операция не теряет и не дублирует данные.
+        
+        Args:
+            day: Первый день, который остаётся в дневных таблицах ('YYYY-MM-DD')
+        
+        Returns:
+            Кортеж (удалено дневных таблиц, добавлено или обновлено строк сводки)
+        """
+        partitions = [d for d in self.list_partitions() if d < day]
+        rolled_up = 0
+        for old_day in partitions:
+            table = self.partition_name(old_day)
+            try:
+                rolled_up += self._roll_up(table, old_day)
+            except sqlite3.OperationalError:
+                # Таблицу уже свернул другой процесс — список дней устарел
+                self._listed = None
+                raise
+            self._partitions.discard(table)
+            self._update_listed(remove=old_day)
+        return len(partitions), rolled_up
+    
+    @staticmethod
+    def _roll_up(table: str, day: str) -> int:
+        """Переносит дневную таблицу в сводку и удаляет её одной транзакцией."""
+        with get_db() as conn:
+            cursor = conn.execute(f"""
+            INSERT INTO login_attempt_totals
+                (day, ip_address, login, failures, successes, first_attempt, last_attempt)
+            SELECT ?, ip_address, login, SUM(success = 0), SUM(success != 0),
+                   MIN(attempt_time), MAX(attempt_time)
+            FROM {table}
+            WHERE 1  -- без WHERE SQLite не отличит ON CONFLICT от JOIN ... ON
+            GROUP BY ip_address, login
+            ON CONFLICT (day, ip_address, login) DO UPDATE SET
+                failures = failures + excluded.failures,
+                successes = successes + excluded.successes,
+                first_attempt = MIN(first_attempt, excluded.first_attempt),
+                last_attempt = MAX(last_attempt, excluded.last_attempt)
+            """, (day,))
+            conn.execute(f"DROP TABLE {table}")
+            conn.commit()
+        return cursor.rowcount
+    
+    def delete_totals_before(self, day: str) -> int:
+        """Удаляет сводку попыток за дни раньше day.
+        
+        Args:
+            day: Первый день, который остаётся в сводке ('YYYY-MM-DD')
+        
+        Returns:
+            Количество удалённых строк
+        """
+        return execute_update("DELETE FROM login_attempt_totals WHERE day < ?", (day,))
+    
+    def find_active_locks(
+        self,
+        now: str,
+        user_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[int, str]]:
+        """Возвращает действующие блокировки аккаунтов.
+        
+        Args:
+            now: Текущее время в формате locked_until
+            user_ids: Только эти аккаунты (None — все)
+        
+        Returns:
+            Список пар (user_id, locked_until)
+        """
+        params: tuple = (now,)
+        user_filter = ''
+        if user_ids is not None:
+            params += tuple(user_ids)
+            if len(params) == 1:
+                return []
+            user_filter = f"AND user_id IN ({', '.join('?' * (len(params) - 1))})"
+        
+        results = execute_query(
+            f"""SELECT user_id, MAX(locked_until) as locked_until FROM locked_accounts
+               WHERE locked_until > ? {user_filter}
+               GROUP BY user_id""",
+            params,
+            fetch_all=True
+        )
+        return [(row['user_id'], row['locked_until']) for row in results]
+    
+    def delete_locks(self, user_id: int) -> int:
+        """Снимает все блокировки аккаунта.
+        
+        Args:
+            user_id: ID пользователя
+        
+        Returns:
+            Количество удалённых записей
+        """
+        return execute_update("DELETE FROM locked_accounts WHERE user_id = ?", (user_id,))
+    
+    def delete_expired_locks(self, now: str) -> int:
+        """Удаляет истёкшие блокировки аккаунтов.
+        
+        Args:
+            now: Текущее время в формате locked_until
+        
+        Returns:
+            Количество удалённых записей
+        """
+        return execute_update("DELETE FROM locked_accounts WHERE locked_until <= ?", (now,))
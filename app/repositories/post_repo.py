@@ -14,7 +14,9 @@ from datetime import datetime
 from typing import List, Optional
 
 from ..db import execute_insert, execute_query, execute_update
+from ..models.authors import intern_roles
 from ..models.posts import Post
+from ..signals import post_changed
 
 
 def parse_datetime(dt_str: Optional[str]) -> Optional[datetime]:
@@ -55,7 +57,7 @@ class PostRepository:
         result = execute_query(query, (post_id,), fetch_one=True)
         
         if result:
-            roles = result['author_roles'].split(',') if result['author_roles'] else []
+            roles = intern_roles(result['author_roles'])
             return Post(
                 id=result['id'],
                 user_id=result['user_id'],
@@ -89,6 +91,7 @@ class PostRepository:
         JOIN users u ON p.user_id = u.id
         LEFT JOIN user_roles ur ON u.id = ur.user_id
         LEFT JOIN roles r ON ur.role_id = r.id
+        GROUP BY p.id
         ORDER BY p.created_at DESC
         {limit_clause}
         OFFSET ?
@@ -97,7 +100,7 @@ class PostRepository:
         
         posts = []
         for result in results:
-            roles = result['author_roles'].split(',') if result['author_roles'] else []
+            roles = intern_roles(result['author_roles'])
             posts.append(Post(
                 id=result['id'],
                 user_id=result['user_id'],
@@ -139,7 +142,7 @@ class PostRepository:
         
         posts = []
         for result in results:
-            roles = result['author_roles'].split(',') if result['author_roles'] else []
+            roles = intern_roles(result['author_roles'])
             posts.append(Post(
                 id=result['id'],
                 user_id=result['user_id'],
@@ -185,7 +188,7 @@ class PostRepository:
         
         posts = []
         for result in results:
-            roles = result['author_roles'].split(',') if result['author_roles'] else []
+            roles = intern_roles(result['author_roles'])
             posts.append(Post(
                 id=result['id'],
                 user_id=result['user_id'],
@@ -215,10 +218,12 @@ class PostRepository:
         VALUES (?, ?, ?, ?, ?)
         """
         now = datetime.utcnow()
-        return execute_insert(
+        post_id = execute_insert(
             query,
             (user_id, title, body, now, now)
         )
+        post_changed.send(self, post_id=post_id)
+        return post_id
     
     def update_post(self, post_id: int, title: str, body: str) -> bool:
         """Обновляет пост.
@@ -239,6 +244,8 @@ class PostRepository:
             query,
             (title, body, datetime.utcnow(), post_id)
         )
+        if affected_rows > 0:
+            post_changed.send(self, post_id=post_id)
         return affected_rows > 0
     
     def delete_post(self, post_id: int) -> bool:
@@ -256,8 +263,19 @@ class PostRepository:
         # Затем удаляем пост
         query = "DELETE FROM posts WHERE id = ?"
         affected_rows = execute_update(query, (post_id,))
+        if affected_rows > 0:
+            post_changed.send(self, post_id=post_id)
         return affected_rows > 0
     
+    def find_all_ids(self) -> List[int]:
+        """Возвращает ID всех постов (для фильтра существующих постов).
+        
+        Returns:
+            Список ID
+        """
+        results = execute_query("SELECT id FROM posts", fetch_all=True)
+        return [row['id'] for row in results]
+    
     def count_posts(self, user_id: Optional[int] = None) -> int:
         """Подсчитывает количество постов.
         
@@ -269,9 +287,9 @@ class PostRepository:
         """
         if user_id:
             query = "SELECT COUNT(*) as count FROM posts WHERE user_id = ?"
-            result = execute_query(query, (user_id,), fetch_one=True)
+            result = execute_query(query, (user_id,), fetch_one=True, cache=True)
         else:
             query = "SELECT COUNT(*) as count FROM posts"
-            result = execute_query(query, fetch_one=True)
+            result = execute_query(query, fetch_one=True, cache=True)
         
         return result['count'] if result else 0
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""Репозиторий отозванных JWT токенов.
+
+Применяемые паттерны:
+- Repository (Хранилище) — инкапсулирует логику доступа к данным
+
+Применяемые принципы:
+- Single Responsibility — только таблица revoked_tokens
+- Explicit is better than implicit — явные SQL запросы
+- Type safety — строгие типы возвращаемых значений
+
+Токен идентифицируется парой (user_id, iat): поля уже есть в payload,
+и отдельный идентификатор токена не нужен.
+"""
+
+from ..db import execute_query, execute_update
+
+
+class RevokedTokenRepository:
+    """Репозиторий для доступа к таблице revoked_tokens."""
+    
+    def revoke(self, user_id: int, iat: int, expires_at: int) -> bool:
+        """Отзывает токен пользователя.
+        
+        Args:
+            user_id: ID пользователя
+            iat: Время выпуска токена
+            expires_at: Время истечения токена
+        
+        Returns:
+            True если запись добавлена (False — токен уже отозван)
+        """
+        query = """
+        INSERT OR IGNORE INTO revoked_tokens (user_id, iat, expires_at)
+        VALUES (?, ?, ?)
+        """
+        return execute_update(query, (user_id, iat, expires_at)) > 0
+    
+    def is_revoked(self, user_id: int, iat: int) -> bool:
+        """Точно проверяет, отозван ли токен.
+        
+        Args:
+            user_id: ID пользователя
+            iat: Время выпуска токена
+        
+        Returns:
+            True если токен отозван
+        """
+        result = execute_query(
+            "SELECT 1 FROM revoked_tokens WHERE user_id = ? AND iat = ?",
+            (user_id, iat),
+            fetch_one=True
+        )
+        return result is not None
+    
+    def find_active(self, now: int) -> list[tuple[int, int]]:
+        """Возвращает отозванные токены, срок которых ещё не истёк.
+        
+        Args:
+            now: Текущее время (Unix timestamp)
+        
+        Returns:
+            Список пар (user_id, iat)
+        """
+        results = execute_query(
+            "SELECT user_id, iat FROM revoked_tokens WHERE expires_at > ?",
+            (now,),
+            fetch_all=True
+        )
+        return [(row['user_id'], row['iat']) for row in results]
+    
+    def delete_expired(self, now: int) -> int:
+        """Удаляет записи об истёкших токенах.
+        
+        Args:
+            now: Текущее время (Unix timestamp)
+        
+        Returns:
+            Количество удалённых записей
+        """
+        return execute_update(
+            "DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,)
+        )
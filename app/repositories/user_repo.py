@@ -11,11 +11,14 @@
 """
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 from ..db import execute_insert, execute_query, execute_update
+from ..models.authors import intern_roles
 from ..models.users import User
 from ..constants.roles import SystemRole
+from ..signals import user_changed
+from .login_attempt_repo import parse_failures
 
 
 class UserRepository:
@@ -36,7 +39,7 @@ class UserRepository:
         """
         query = """
         SELECT u.id, u.login, u.discriminator, u.password_hash, 
-               u.created_at, u.updated_at,
+               u.created_at, u.updated_at, u.token_version,
                GROUP_CONCAT(r.name) as roles
         FROM users u
         LEFT JOIN user_roles ur ON u.id = ur.user_id
@@ -44,10 +47,10 @@ class UserRepository:
         WHERE u.id = ?
         GROUP BY u.id
         """
-        result = execute_query(query, (user_id,), fetch_one=True)
+        result = execute_query(query, (user_id,), fetch_one=True, cache=True)
         
         if result:
-            roles = result['roles'].split(',') if result['roles'] else []
+            roles = intern_roles(result['roles'])
             return User(
                 id=result['id'],
                 login=result['login'],
@@ -55,6 +58,7 @@ class UserRepository:
                 password_hash=result['password_hash'],
                 created_at=result['created_at'],
                 updated_at=result['updated_at'],
+                token_version=result['token_version'],
                 _roles=roles
             )
         return None
@@ -71,7 +75,7 @@ class UserRepository:
         """
         query = """
         SELECT u.id, u.login, u.discriminator, u.password_hash,
-               u.created_at, u.updated_at,
+               u.created_at, u.updated_at, u.token_version,
                GROUP_CONCAT(r.name) as roles
         FROM users u
         LEFT JOIN user_roles ur ON u.id = ur.user_id
@@ -79,10 +83,10 @@ class UserRepository:
         WHERE u.login = ? AND u.discriminator = ?
         GROUP BY u.id
         """
-        result = execute_query(query, (login, discriminator), fetch_one=True)
+        result = execute_query(query, (login, discriminator), fetch_one=True, cache=True)
         
         if result:
-            roles = result['roles'].split(',') if result['roles'] else []
+            roles = intern_roles(result['roles'])
             return User(
                 id=result['id'],
                 login=result['login'],
@@ -90,6 +94,7 @@ class UserRepository:
                 password_hash=result['password_hash'],
                 created_at=result['created_at'],
                 updated_at=result['updated_at'],
+                token_version=result['token_version'],
                 _roles=roles
             )
         return None
@@ -105,7 +110,7 @@ class UserRepository:
         """
         query = """
         SELECT u.id, u.login, u.discriminator, u.password_hash,
-               u.created_at, u.updated_at,
+               u.created_at, u.updated_at, u.token_version,
                GROUP_CONCAT(r.name) as roles
         FROM users u
         LEFT JOIN user_roles ur ON u.id = ur.user_id
@@ -114,11 +119,11 @@ class UserRepository:
         GROUP BY u.id
         ORDER BY u.discriminator
         """
-        results = execute_query(query, (login,), fetch_all=True)
+        results = execute_query(query, (login,), fetch_all=True, cache=True)
         
         users = []
         for result in results:
-            roles = result['roles'].split(',') if result['roles'] else []
+            roles = intern_roles(result['roles'])
             users.append(User(
                 id=result['id'],
                 login=result['login'],
@@ -126,10 +131,74 @@ class UserRepository:
                 password_hash=result['password_hash'],
                 created_at=result['created_at'],
                 updated_at=result['updated_at'],
+                token_version=result['token_version'],
                 _roles=roles
             ))
         return users
     
+    def find_login_candidates(
+        self,
+        login: str,
+        ip_address: str,
+        now: datetime
+    ) -> Tuple[List[User], List[Tuple[int, str]], List[float]]:
+        """Загружает всё, что нужно для решения о входе, одним запросом.
+        
+        Возвращает аккаунты с логином, их действующие блокировки и окно
+        неудачных попыток входа с этого IP (login_failure_windows). Строка
+        с окном есть всегда, даже если аккаунтов с таким логином нет.
+        
+        Args:
+            login: Введённый логин
+            ip_address: IP адрес клиента
+            now: Текущее время
+            
+        Returns:
+            Кортеж (пользователи, пары (user_id, locked_until),
+            времена неудачных попыток по возрастанию)
+        """
+        query = """
+        SELECT w.failures,
+               u.id, u.login, u.discriminator, u.password_hash,
+               u.created_at, u.updated_at, u.token_version,
+               GROUP_CONCAT(r.name) as roles,
+               (SELECT MAX(la.locked_until) FROM locked_accounts la
+                WHERE la.user_id = u.id AND la.locked_until > ?) as locked_until
+        FROM (SELECT 1)
+        LEFT JOIN login_failure_windows w
+            ON w.ip_address = ? AND w.login = ? AND w.expires_at > ?
+        LEFT JOIN users u ON u.login = ?
+        LEFT JOIN user_roles ur ON u.id = ur.user_id
+        LEFT JOIN roles r ON ur.role_id = r.id
+        GROUP BY u.id
+        ORDER BY u.discriminator
+        """
+        results = execute_query(
+            query,
+            (now.isoformat(), ip_address, login, now.timestamp(), login),
+            fetch_all=True
+        )
+        
+        failures = parse_failures(results[0]['failures']) if results else []
+        users = []
+        locks = []
+        for result in results:
+            if result['id'] is None:
+                continue
+            users.append(User(
+                id=result['id'],
+                login=result['login'],
+                discriminator=result['discriminator'],
+                password_hash=result['password_hash'],
+                created_at=result['created_at'],
+                updated_at=result['updated_at'],
+                token_version=result['token_version'],
+                _roles=intern_roles(result['roles'])
+            ))
+            if result['locked_until'] is not None:
+                locks.append((result['id'], result['locked_until']))
+        return users, locks, failures
+    
     def find_admin(self) -> Optional[User]:
         """Находит администратора системы.
         
@@ -138,7 +207,7 @@ class UserRepository:
         """
         query = """
         SELECT u.id, u.login, u.discriminator, u.password_hash,
-               u.created_at, u.updated_at,
+               u.created_at, u.updated_at, u.token_version,
                GROUP_CONCAT(r.name) as roles
         FROM users u
         JOIN user_roles ur ON u.id = ur.user_id
@@ -147,10 +216,10 @@ class UserRepository:
         GROUP BY u.id
         LIMIT 1
         """
-        result = execute_query(query, (SystemRole.ADMIN, SystemRole.ADMIN), fetch_one=True)
+        result = execute_query(query, (SystemRole.ADMIN, SystemRole.ADMIN), fetch_one=True, cache=True)
         
         if result:
-            roles = result['roles'].split(',') if result['roles'] else []
+            roles = intern_roles(result['roles'])
             return User(
                 id=result['id'],
                 login=result['login'],
@@ -158,6 +227,7 @@ class UserRepository:
                 password_hash=result['password_hash'],
                 created_at=result['created_at'],
                 updated_at=result['updated_at'],
+                token_version=result['token_version'],
                 _roles=roles
             )
         return None
@@ -258,10 +328,13 @@ class UserRepository:
         VALUES (?, (SELECT id FROM roles WHERE name = ?))
         """
         affected_rows = execute_update(query, (user_id, role_name))
+        if affected_rows > 0:
+            # Роли зашиты в токены, поэтому выпущенные токены отзываются
+            self.bump_token_version(user_id)
         return affected_rows > 0
     
     def update_password(self, user_id: int, password_hash: str) -> bool:
-        """Обновляет пароль пользователя.
+        """Обновляет пароль пользователя и отзывает его токены.
         
         Args:
             user_id: ID пользователя
@@ -271,15 +344,80 @@ class UserRepository:
             True если пароль обновлен
         """
         query = """
-        UPDATE users SET password_hash = ?, updated_at = ?
+        UPDATE users SET password_hash = ?, updated_at = ?,
+                         token_version = token_version + 1
         WHERE id = ?
         """
         affected_rows = execute_update(
             query, 
             (password_hash, datetime.utcnow(), user_id)
         )
+        if affected_rows > 0:
+            user_changed.send(self, user_id=user_id)
+        return affected_rows > 0
+    
+    def update_password_hash(self, user_id: int, old_hash: str, new_hash: str) -> bool:
+        """Заменяет хэш того же пароля на хэш с новыми параметрами.
+        
+        Пароль не меняется, поэтому токены пользователя не отзываются.
+        Хэш заменяется только если его не изменили параллельно.
+        
+        Args:
+            user_id: ID пользователя
+            old_hash: Хэш, по которому пароль был проверен
+            new_hash: Новый хэш того же пароля
+            
+        Returns:
+            True если хэш заменён
+        """
+        query = "UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?"
+        affected_rows = execute_update(query, (new_hash, user_id, old_hash))
+        if affected_rows > 0:
+            user_changed.send(self, user_id=user_id)
+        return affected_rows > 0
+    
+    def bump_token_version(self, user_id: int) -> bool:
+        """Увеличивает версию токенов пользователя.
+        
+        Все ранее выпущенные токены пользователя становятся невалидными.
+        
+        Args:
+            user_id: ID пользователя
+            
+        Returns:
+            True если версия увеличена
+        """
+        query = "UPDATE users SET token_version = token_version + 1 WHERE id = ?"
+        affected_rows = execute_update(query, (user_id,))
+        if affected_rows > 0:
+            user_changed.send(self, user_id=user_id)
         return affected_rows > 0
     
+    def find_token_version(self, user_id: int) -> Optional[int]:
+        """Возвращает текущую версию токенов пользователя.
+        
+        Args:
+            user_id: ID пользователя
+            
+        Returns:
+            Версия токенов или None если пользователь не найден
+        """
+        result = execute_query(
+            "SELECT token_version FROM users WHERE id = ?",
+            (user_id,),
+            fetch_one=True
+        )
+        return result['token_version'] if result else None
+    
+    def find_all_token_versions(self) -> dict[int, int]:
+        """Возвращает версии токенов всех пользователей одним запросом.
+        
+        Returns:
+            Словарь {user_id: token_version}
+        """
+        results = execute_query("SELECT id, token_version FROM users", fetch_all=True)
+        return {row['id']: row['token_version'] for row in results}
+    
     def delete_user(self, user_id: int) -> bool:
         """Удаляет пользователя.
         
@@ -295,4 +433,6 @@ class UserRepository:
         # Затем удаляем пользователя
         query = "DELETE FROM users WHERE id = ?"
         affected_rows = execute_update(query, (user_id,))
+        # Роли удалены в любом случае, поэтому сбрасываем кэши всегда
+        user_changed.send(self, user_id=user_id)
         return affected_rows > 0
\ No newline at end of file
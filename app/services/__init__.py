@@ -9,6 +9,14 @@
 from .comment_service import CommentService
 from .user_auth_service import UserAuthService
 from .jwt_service import JWTService
+from .login_resolver import LoginDecision, LoginResolver
+from .password_hasher import PasswordHasher, PasswordHasherBusy
 from .post_service import PostService
+from .revocation_service import RevocationService
+from .token_version_service import TokenVersionService
 
-__all__ = ['JWTService', 'UserAuthService', 'PostService', 'CommentService']
\ No newline at end of file
+__all__ = [
+    'JWTService', 'UserAuthService', 'PostService', 'CommentService',
+    'TokenVersionService', 'RevocationService', 'PasswordHasher', 'PasswordHasherBusy',
+    'LoginResolver', 'LoginDecision',
+]
\ No newline at end of file
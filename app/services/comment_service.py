@@ -11,12 +11,18 @@
 - Fail fast — ранние проверки и ошибки
 """
 
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
+from ..cache import NegativeCache
+from ..cache.tags import POSTS_LISTING, post_tag
 from ..models.comments import Comment
 from ..models.posts import Post
 from ..repositories.comment_repo import CommentRepository
 from ..repositories.post_repo import PostRepository
+from ..signals import comment_changed, tags_invalidated
+
+if TYPE_CHECKING:
+    from .post_service import PostService
 
 
 class CommentService:
@@ -25,15 +31,41 @@ class CommentService:
     Обеспечивает CRUD операции и бизнес-логику для комментариев.
     """
     
-    def __init__(self, comment_repo: CommentRepository, post_repo: PostRepository):
+    def __init__(
+        self,
+        comment_repo: CommentRepository,
+        post_repo: PostRepository,
+        post_service: Optional['PostService'] = None,
+        missing_comments: Optional[NegativeCache] = None
+    ):
         """Инициализирует сервис с зависимостями.
         
         Args:
             comment_repo: Репозиторий комментариев
             post_repo: Репозиторий постов
+            post_service: Сервис постов для проверки существования поста
+                через его кэш (опционально)
+            missing_comments: Кэш отсутствующих ID комментариев (None — без кэширования)
         """
         self.comment_repo = comment_repo
         self.post_repo = post_repo
+        self.post_service = post_service
+        self.missing_comments = (
+            missing_comments if missing_comments is not None
+            else NegativeCache('missing_comments', 0, 0)
+        )
+        comment_changed.connect(self._on_comment_changed)
+    
+    def _on_comment_changed(self, sender, comment_id: Optional[int] = None, **extra) -> None:
+        """Отмечает созданный или изменённый комментарий как существующий."""
+        if comment_id is not None:
+            self.missing_comments.add(comment_id)
+    
+    def _find_post(self, post_id: int) -> Optional[Post]:
+        """Находит пост через кэш сервиса постов или напрямую в БД."""
+        if self.post_service is not None:
+            return self.post_service.get_post_by_id(post_id)
+        return self.post_repo.find_by_id(post_id)
     
     def create_comment(self, post_id: int, user_id: int, body: str) -> tuple[bool, str, Optional[Comment]]:
         """Создает новый комментарий.
@@ -47,7 +79,7 @@ class CommentService:
             Кортеж (успех, сообщение, комментарий)
         """
         # Проверяем существование поста
-        post = self.post_repo.find_by_id(post_id)
+        post = self._find_post(post_id)
         if not post:
             return False, "Пост не найден", None
         
@@ -65,6 +97,9 @@ class CommentService:
                 body=body.strip()
             )
             
+            # Комментарии видны на странице поста, счётчики — в списках
+            tags_invalidated.send(self, tags=(post_tag(post_id), POSTS_LISTING))
+            
             comment = self.comment_repo.find_by_id(comment_id)
             if comment:
                 return True, "Комментарий успешно добавлен", comment
@@ -83,7 +118,13 @@ class CommentService:
         Returns:
             Комментарий или None если не найден
         """
-        return self.comment_repo.find_by_id(comment_id)
+        if self.missing_comments.is_missing(comment_id):
+            return None
+        
+        comment = self.comment_repo.find_by_id(comment_id)
+        if comment is None:
+            self.missing_comments.mark_missing(comment_id)
+        return comment
     
     def get_post_comments(self, post_id: int, limit: Optional[int] = None) -> List[Comment]:
         """Получает комментарии к посту.
@@ -96,7 +137,7 @@ class CommentService:
             Список комментариев к посту
         """
         # Проверяем существование поста
-        post = self.post_repo.find_by_id(post_id)
+        post = self._find_post(post_id)
         if not post:
             return []
         
@@ -149,6 +190,7 @@ class CommentService:
             )
             
             if success:
+                tags_invalidated.send(self, tags=(post_tag(comment.post_id),))
                 updated_comment = self.comment_repo.find_by_id(comment_id)
                 return True, "Комментарий успешно обновлен", updated_comment
             else:
@@ -181,6 +223,7 @@ class CommentService:
             success = self.comment_repo.delete_comment(comment_id)
             
             if success:
+                tags_invalidated.send(self, tags=(post_tag(comment.post_id), POSTS_LISTING))
                 return True, "Комментарий успешно удален"
             else:
                 return False, "Ошибка при удалении комментария"
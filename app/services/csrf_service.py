@@ -4,104 +4,171 @@
 - Security — защита от CSRF атак
 - Service — инкапсуляция логики CSRF
 - Singleton — один экземпляр для приложения
+- Double Submit Cookie — токен в форме привязан к случайному nonce из cookie
+- Prototype — состояние HMAC с ключом готовится один раз и копируется
+- Placeholder — в закэшированной странице вместо токена стоит метка
 
 Применяемые принципы:
 - Secure by default — защита включена по умолчанию
 - Explicit is better than implicit — явная генерация токенов
 - Fail fast — ранние проверки безопасности
+- Stateless — сервер ничего не хранит, сессия не пишется
+
+Токен имеет вид '<время в hex>.<HMAC(nonce.время)>'. Nonce лежит в
+HttpOnly cookie и выдаётся один раз; чужой сайт не может ни прочитать
+его, ни подделать подпись, поэтому токен из формы проверяется без
+обращения к сессии или БД.
 """
 
+import base64
 import hashlib
 import hmac
 import secrets
-from typing import Optional
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+from flask import current_app, g, request
 
-from flask import current_app, session
+# Метка токена в HTML, который рендерится один раз для многих пользователей
+CSRF_PLACEHOLDER = '__csrf_token_placeholder__'
+
+# Методы, которые не меняют состояние и не проверяются
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'TRACE'))
 
 
 class CSRFService:
     """Сервис для CSRF защиты форм."""
     
-    def __init__(self, secret_key: str):
+    # Длина подписи в байтах (128 бит достаточно против подбора)
+    SIGNATURE_BYTES = 16
+    
+    # Ограничение длины nonce из cookie
+    MAX_NONCE_LENGTH = 64
+    
+    def __init__(
+        self,
+        secret_key: str,
+        max_age: int = 24 * 60 * 60,
+        cookie_name: str = 'csrf_nonce',
+        cookie_secure: bool = False
+    ):
         """Инициализация CSRF сервиса.
         
         Args:
             secret_key: Секретный ключ для подписи токенов
+            max_age: Время жизни токена в секундах
+            cookie_name: Имя cookie с nonce
+            cookie_secure: Отправлять cookie только по HTTPS
         """
-        self.secret_key = secret_key.encode()
+        # Отдельный ключ, чтобы подпись CSRF не совпадала ни с одной подписью JWT
+        key = hmac.new(secret_key.encode(), b'csrf-token', hashlib.sha256).digest()
+        self._prototype = hmac.new(key, digestmod=hashlib.sha256)
+        self.max_age = max_age
+        self.cookie_name = cookie_name
+        self.cookie_secure = cookie_secure
     
-    def generate_token(self) -> str:
-        """Генерирует новый CSRF токен.
+    def _sign(self, nonce: str, issued: str) -> str:
+        """Подписывает пару (nonce, время выпуска)."""
+        mac = self._prototype.copy()
+        mac.update(f"{nonce}.{issued}".encode())
+        digest = mac.digest()[:self.SIGNATURE_BYTES]
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+    
+    def get_nonce(self) -> str:
+        """Возвращает nonce текущего клиента.
+        
+        Если cookie ещё нет, создаётся новый nonce; он будет установлен
+        в ответе (см. set_nonce_cookie).
         
         Returns:
-            CSRF токен для использования в формах
+            Значение nonce
         """
-        # Генерируем случайную строку
-        random_data = secrets.token_urlsafe(32)
-        
-        # Создаем подпись
-        signature = hmac.new(
-            self.secret_key,
-            random_data.encode(),
-            hashlib.sha256
-        ).hexdigest()
+        nonce = g.get('csrf_nonce')
+        if nonce is None:
+            nonce = request.cookies.get(self.cookie_name)
+            if not nonce or len(nonce) > self.MAX_NONCE_LENGTH:
+                nonce = secrets.token_urlsafe(16)
+                g.csrf_new_nonce = True
+            g.csrf_nonce = nonce
+        return nonce
+    
+    def generate_token(self, now: Optional[float] = None) -> str:
+        """Генерирует новый CSRF токен.
         
-        # Сохраняем токен в сессии
-        session['csrf_token'] = f"{random_data}.{signature}"
+        Args:
+            now: Время выпуска (по умолчанию — сейчас)
         
-        return session['csrf_token']
+        Returns:
+            CSRF токен для использования в формах
+        """
+        issued = format(int(time.time() if now is None else now), 'x')
+        return f"{issued}.{self._sign(self.get_nonce(), issued)}"
     
-    def verify_token(self, token: str) -> bool:
+    def verify_token(self, token: str, now: Optional[float] = None) -> bool:
         """Проверяет валидность CSRF токена.
         
         Args:
             token: CSRF токен из формы
-            
+            now: Время проверки (по умолчанию — сейчас)
+        
         Returns:
             True если токен валиден, иначе False
         """
-        if not token:
+        if not token or len(token) > 64:
             return False
         
-        # Получаем сохраненный токен из сессии
-        stored_token = session.get('csrf_token')
-        if not stored_token:
+        try:
+            issued, signature = token.split('.', 1)
+            age = (time.time() if now is None else now) - int(issued, 16)
+        except ValueError:
             return False
         
-        # Проверяем совпадение токенов
-        if not hmac.compare_digest(token, stored_token):
+        # Токен из будущего допускаем только в пределах расхождения часов
+        if age > self.max_age or age < -60:
             return False
         
-        # Дополнительно проверяем подпись
-        try:
-            random_data, expected_signature = token.split('.', 1)
-            
-            # Пересчитываем подпись
-            actual_signature = hmac.new(
-                self.secret_key,
-                random_data.encode(),
-                hashlib.sha256
-            ).hexdigest()
-            
-            return hmac.compare_digest(expected_signature, actual_signature)
-            
-        except (ValueError, IndexError):
-            return False
+        return hmac.compare_digest(signature, self._sign(self.get_nonce(), issued))
     
     def get_token(self) -> str:
-        """Возвращает текущий CSRF токен или генерирует новый.
+        """Возвращает CSRF токен текущего запроса.
+        
+        Токен вычисляется один раз за запрос. При рендеринге страницы
+        для кэша (см. deferred_tokens) возвращается CSRF_PLACEHOLDER.
         
         Returns:
-            CSRF токен
+            CSRF токен или метка
         """
-        if 'csrf_token' not in session:
-            return self.generate_token()
+        if g.get('csrf_deferred'):
+            return CSRF_PLACEHOLDER
         
-        return session['csrf_token']
+        token = g.get('csrf_token')
+        if token is None:
+            token = g.csrf_token = self.generate_token()
+        return token
     
     def clear_token(self) -> None:
-        """Удаляет CSRF токен из сессии."""
-        session.pop('csrf_token', None)
+        """Сбрасывает токен текущего запроса."""
+        g.pop('csrf_token', None)
+    
+    def fill_placeholder(self, body: Any) -> Any:
+        """Подставляет токен текущего запроса вместо метки.
+        
+        Args:
+            body: HTML страницы (str или bytes)
+        
+        Returns:
+            HTML с токеном; без метки возвращается тот же объект
+        """
+        if isinstance(body, bytes):
+            placeholder = CSRF_PLACEHOLDER.encode('ascii')
+            if placeholder not in body:
+                return body
+            return body.replace(placeholder, self.get_token().encode('ascii'))
+        
+        if CSRF_PLACEHOLDER not in body:
+            return body
+        return body.replace(CSRF_PLACEHOLDER, self.get_token())
     
     def validate_request(self) -> bool:
         """Проверяет CSRF токен из текущего запроса.
@@ -109,16 +176,53 @@ class CSRFService:
         Returns:
             True если токен валиден, иначе False
         """
-        from flask import request
-        
         # Пропускаем безопасные методы
-        if request.method in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+        if request.method in SAFE_METHODS:
             return True
         
+        # Без cookie nonce токен не может быть валидным
+        if self.cookie_name not in request.cookies:
+            return False
+        
         # Получаем токен из формы или заголовка
         token = request.form.get('csrf_token') or request.headers.get('X-CSRF-Token')
         
         return self.verify_token(token)
+    
+    def set_nonce_cookie(self, response):
+        """Устанавливает cookie с nonce, если он был создан в этом запросе.
+        
+        Args:
+            response: Flask response объект
+        
+        Returns:
+            Тот же response
+        """
+        if g.get('csrf_new_nonce'):
+            response.set_cookie(
+                self.cookie_name,
+                g.csrf_nonce,
+                max_age=365 * 24 * 60 * 60,  # nonce не содержит данных, живёт долго
+                httponly=True,
+                secure=self.cookie_secure,
+                samesite='Lax'
+            )
+        return response
+
+
+@contextmanager
+def deferred_tokens() -> Iterator[None]:
+    """Рендеринг страницы, общей для многих пользователей.
+    
+    Внутри контекста csrf_token() возвращает CSRF_PLACEHOLDER, а настоящий
+    токен подставляется при отдаче (CSRFService.fill_placeholder).
+    """
+    previous = g.get('csrf_deferred', False)
+    g.csrf_deferred = True
+    try:
+        yield
+    finally:
+        g.csrf_deferred = previous
 
 
 def get_csrf_service() -> CSRFService:
@@ -144,8 +248,20 @@ def validate_csrf_token(token: str) -> bool:
     
     Args:
         token: CSRF токен для проверки
-        
+    
     Returns:
         True если токен валиден, иначе False
     """
-    return get_csrf_service().verify_token(token)
\ No newline at end of file
+    return get_csrf_service().verify_token(token)
+
+
+def set_csrf_cookie(response):
+    """Устанавливает cookie с nonce после обработки запроса.
+    
+    Args:
+        response: Flask response объект
+    
+    Returns:
+        Тот же response
+    """
+    return get_csrf_service().set_nonce_cookie(response)
@@ -4,6 +4,8 @@
 - Service Layer — инкапсулирует логику работы с JWT
 - Singleton — один экземпляр для всего приложения
 - Strategy — жестко закодированный алгоритм безопасности
+- Cache-Aside — проверенные токены кэшируются до истечения срока
+- Codec — формат токена (JSON или двоичный) выбирается конфигурацией
 
 Применяемые принципы:
 - Single Responsibility — только работа с JWT токенами
@@ -16,16 +18,24 @@ import hashlib
 import hmac
 import json
 import time
-from typing import Optional, TypedDict
+from typing import Any, NotRequired, Optional, TypedDict
 
 from flask import current_app
 
+from ..cache import TTLCache
+from . import token_codec
+
 
 class Payload(TypedDict):
     """Структура payload для JWT токена."""
     user_id: int
     exp: int
     iat: int
+    # Необязательные подписанные claims (см. UserAuthService._token_claims)
+    ver: NotRequired[int]  # Версия токенов пользователя
+    login: NotRequired[str]
+    disc: NotRequired[Optional[str]]
+    roles: NotRequired[list[str]]
 
 
 class JWTService:
@@ -45,22 +55,61 @@ class JWTService:
         "HS512": hashlib.sha512
     }
     
-    def __init__(self):
-        """Инициализирует JWT сервис."""
-        pass
+    def __init__(self, verified_cache: Optional[TTLCache] = None):
+        """Инициализирует JWT сервис.
+        
+        Args:
+            verified_cache: Кэш проверенных токенов (None — без кэширования)
+        """
+        self.verified_cache = verified_cache if verified_cache is not None else TTLCache(0, 0, name='jwt')
+        # (SECRET_KEY, его байты) — меняются вместе
+        self._keyed: Optional[tuple[str, bytes]] = None
     
-    def generate_token(self, user_id: int, remember_me: bool = False) -> str:
+    def _signing_key(self) -> bytes:
+        """Возвращает ключ подписи из SECRET_KEY.
+        
+        При смене SECRET_KEY кэш проверенных токенов очищается: токены,
+        подписанные старым ключом, должны проверяться заново.
+        
+        Returns:
+            Ключ HMAC в байтах
+        """
+        secret_key = current_app.config.get('SECRET_KEY', 'default-secret')
+        keyed = self._keyed
+        if keyed is None or keyed[0] != secret_key:
+            keyed = (secret_key, secret_key.encode('utf-8'))
+            self._keyed = keyed
+            self.verified_cache.clear()
+        return keyed[1]
+    
+    def generate_token(
+        self,
+        user_id: int,
+        remember_me: bool = False,
+        claims: Optional[dict[str, Any]] = None
+    ) -> str:
         """Генерирует JWT токен для пользователя.
         
         Args:
             user_id: ID пользователя
             remember_me: Запомнить на 30 дней вместо 24 часов
+            claims: Дополнительные подписанные поля payload (ver, login, disc, roles)
             
         Returns:
-            JWT токен в формате payload.signature
+            JWT токен в формате payload.signature или двоичный токен
+            (JWT_TOKEN_FORMAT = 'binary')
         """
         exp_hours = 720 if remember_me else 24  # 30*24=720 или 24 часа
-        encoded_payload = self._create_payload(user_id, exp_hours)
+        
+        if current_app.config.get('JWT_TOKEN_FORMAT', 'json') == 'binary':
+            return token_codec.encode(
+                self._payload_data(user_id, exp_hours, claims),
+                self._signing_key(),
+                self.ALGORITHMS[self.ALGORITHM],
+                current_app.config.get('JWT_SIGNATURE_BYTES', 16)
+            )
+        
+        encoded_payload = self._create_payload(user_id, exp_hours, claims)
         encoded_signature = self._create_signature(encoded_payload)
         token = f"{encoded_payload}.{encoded_signature}"
         return token
@@ -68,9 +117,47 @@ class JWTService:
     def verify_token(self, token: str) -> Optional[Payload]:
         """Проверяет и декодирует JWT токен.
         
+        Принимает оба формата независимо от JWT_TOKEN_FORMAT: JSON токен
+        содержит точку между payload и подписью, двоичный — нет.
+        
         Args:
             token: JWT токен
             
+        Returns:
+            Payload токена или None если токен невалиден
+        """
+        key = self._signing_key()
+        current_time = int(time.time())
+        
+        # Токен уже проверялся этим ключом — нужна только проверка срока
+        cached = self.verified_cache.get(token) if self.verified_cache.enabled else None
+        if cached is not None:
+            return cached if current_time <= cached['exp'] else None
+        
+        if '.' not in token:
+            payload_data = token_codec.decode(token, key, self.ALGORITHMS[self.ALGORITHM])
+        else:
+            payload_data = self._decode_json_token(token, key)
+        if payload_data is None:
+            return None
+        
+        exp_time = payload_data.get('exp', 0)
+        if current_time > exp_time:
+            return None
+        
+        # Запись не переживает сам токен
+        self.verified_cache.set(
+            token, payload_data, min(self.verified_cache.ttl, exp_time - current_time + 1)
+        )
+        return payload_data
+    
+    def _decode_json_token(self, token: str, key: bytes) -> Optional[dict]:
+        """Проверяет подпись JSON токена и декодирует payload.
+        
+        Args:
+            token: Токен в формате payload.signature
+            key: Ключ подписи из _signing_key
+            
         Returns:
             Payload токена или None если токен невалиден
         """
@@ -81,37 +168,36 @@ class JWTService:
         payload, signature = parts[0], parts[1]
         
         # Проверяем подпись
-        expected_signature = self._create_signature(payload)
+        expected_signature = self._create_signature(payload, key)
         if not hmac.compare_digest(signature, expected_signature):
             return None
         
-        # Проверяем срок действия
-        current_time = int(time.time())
-        
         try:
             # Декодируем payload
             payload_json = base64.urlsafe_b64decode(
                 self._add_padding(payload)
             ).decode('utf-8')
             payload_data = json.loads(payload_json)
-            exp_time = payload_data.get('exp', 0)
         except Exception:
             return None
         
-        if current_time > exp_time:
-            return None
-        
-        return payload_data
+        return payload_data if isinstance(payload_data, dict) else None
     
-    def _create_payload(self, user_id: int, exp_hours: int) -> str:
-        """Создает закодированный payload.
+    def _payload_data(
+        self,
+        user_id: int,
+        exp_hours: int,
+        claims: Optional[dict[str, Any]] = None
+    ) -> dict[str, Any]:
+        """Формирует поля payload.
         
         Args:
             user_id: ID пользователя
             exp_hours: Срок действия в часах
+            claims: Дополнительные поля payload
             
         Returns:
-            Закодированный payload
+            Словарь полей payload
         """
         current_time = int(time.time())  # Unix timestamp
         exp_time = current_time + (exp_hours * 3600)  # 3600 секунд = 1 час
@@ -121,6 +207,28 @@ class JWTService:
             "exp": exp_time,  # дата истечения
             "iat": current_time  # дата создания
         }
+        if claims:
+            # Обязательные поля не перезаписываются дополнительными
+            payload_data = {**claims, **payload_data}
+        return payload_data
+    
+    def _create_payload(
+        self,
+        user_id: int,
+        exp_hours: int,
+        claims: Optional[dict[str, Any]] = None
+    ) -> str:
+        """Создает закодированный payload.
+        
+        Args:
+            user_id: ID пользователя
+            exp_hours: Срок действия в часах
+            claims: Дополнительные поля payload
+            
+        Returns:
+            Закодированный payload
+        """
+        payload_data = self._payload_data(user_id, exp_hours, claims)
         
         # Сериализуем в JSON
         payload_json = json.dumps(payload_data, separators=(',', ':'))
@@ -132,19 +240,18 @@ class JWTService:
         
         return encoded_payload
     
-    def _create_signature(self, payload: str) -> str:
+    def _create_signature(self, payload: str, key: Optional[bytes] = None) -> str:
         """Создает подпись для payload.
         
         Args:
             payload: Закодированный payload
+            key: Ключ подписи из _signing_key (если уже получен)
             
         Returns:
             Закодированная подпись
         """
-        secret_key = current_app.config.get('SECRET_KEY', 'default-secret')
-        
         signature = hmac.new(
-            secret_key.encode('utf-8'),
+            key or self._signing_key(),
             payload.encode('utf-8'),
             self.ALGORITHMS[self.ALGORITHM]
         ).digest()
@@ -162,7 +269,7 @@ class JWTService:
         Returns:
             Base64 строка с padding
         """
-        padding_needed = 4 - (len(encoded_string) % 4)
+        padding_needed = -len(encoded_string) % 4
         if padding_needed:
             encoded_string += '=' * padding_needed
         return encoded_string
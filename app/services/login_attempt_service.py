@@ -4,35 +4,230 @@
 - Service — бизнес-логика для защиты от bruteforce
 - Rate Limiting — ограничение количества попыток
 - Account Lockout — блокировка аккаунта
+- Write-Behind — попытки пишутся в БД пачками
+- Retention — раз в сутки старые дни сворачиваются в сводку
 
 Применяемые принципы:
 - Single Responsibility — только защита от bruteforce
 - Fail fast — ранние проверки и блокировки
-- KISS — простая и понятная логика
+- Bounded memory — счётчики ограничены по числу ключей и длине окна
+
+Проверки (should_block_login, will_exceed_max_attempts, find_locked)
+отвечают по памяти процесса за O(1). Общее для процессов состояние —
+окна неудачных попыток login_failure_windows и блокировки
+locked_accounts: попытки пишутся в них пачками раз в flush_interval
+секунд (блокировки — сразу), а окно пары IP + логин или блокировка
+аккаунта перечитываются одним поиском по индексу не чаще раза в
+flush_interval и объединяются с памятью. Как и у лимитов запросов
+(SQLiteLimiterStorage), лимит может быть превышен не больше чем на
+попытки других процессов за последние 2·flush_interval секунд.
+Состояние из БД загружается в память при первом обращении; неудачная
+загрузка повторяется с растущей паузой.
+
+Попытки хранятся по дням (см. LoginAttemptRepository): отдельные записи
+живут raw_days дней, затем день сворачивается в login_attempt_totals,
+которая хранится totals_days дней. Очистка запускается первой записью
+после смены суток или командой `flask login-retention`.
 """
 
-from datetime import datetime, timedelta
-from typing import Optional, Tuple
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Hashable, Iterable, Optional, Tuple
+
+from ..cache.sliding_window import SlidingWindowCounter
+from ..repositories.login_attempt_repo import LoginAttemptRepository
+
+logger = logging.getLogger(__name__)
 
-from ..db import execute_query, execute_insert, execute_update
+# Формат CURRENT_TIMESTAMP, которым заполняется login_attempts.attempt_time
+ATTEMPT_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Пауза перед повторной загрузкой состояния после ошибки БД, в секундах
+LOAD_RETRY_DELAY = 1.0
+LOAD_RETRY_MAX_DELAY = 60.0
 
 
 class LoginAttemptService:
     """Сервис для отслеживания попыток входа и защиты от bruteforce атаки."""
     
-    def __init__(self):
-        """Инициализирует сервис."""
+    def __init__(
+        self,
+        repo: Optional[LoginAttemptRepository] = None,
+        max_keys: int = 10000,
+        flush_interval: float = 5.0,
+        batch_size: int = 100,
+        raw_days: int = 7,
+        totals_days: int = 90
+    ):
+        """Инициализирует сервис.
+        
+        Args:
+            repo: Репозиторий попыток входа
+            max_keys: Максимум отслеживаемых пар IP + логин
+            flush_interval: Максимальная задержка записи попыток в БД и
+                чтения общих счётчиков в секундах
+            batch_size: Размер пачки, при котором запись выполняется сразу
+            raw_days: Сколько дней (включая текущий) хранить отдельные попытки
+            totals_days: Сколько дней хранить сводку попыток
+        """
         self.max_attempts = 5  # Максимальное количество неудачных попыток
         self.lockout_duration = timedelta(minutes=15)  # Длительность блокировки
         self.attempt_window = timedelta(minutes=15)  # Окно для подсчета попыток
+        
+        self.repo = repo or LoginAttemptRepository()
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.raw_days = max(1, raw_days)
+        self.totals_days = max(self.raw_days, totals_days)
+        self._failures = SlidingWindowCounter(
+            self.max_attempts,
+            self.attempt_window.total_seconds(),
+            max_keys,
+            name='login_failures'
+        )
+        self._locks: dict[int, datetime] = {}
+        self._pending_attempts: list[Tuple[str, str, bool, str]] = []
+        self._pending_failures: dict[Tuple[str, str], list[float]] = {}
+        self._pending_locks: list[Tuple[int, str, str]] = []
+        # Когда окно пары (ip, login) или блокировка ('lock', user_id) читались из БД
+        self._synced: OrderedDict[Hashable, float] = OrderedDict()
+        self._max_synced = max_keys
+        self._sync_lock = threading.Lock()
+        # Не больше стольких записей ждут БД, если она недоступна
+        self._max_pending = self.batch_size * 100
+        self._flushed_at = time.monotonic()
+        self._flush_lock = threading.Lock()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._load_retry_at = 0.0
+        self._load_retry_delay = LOAD_RETRY_DELAY
+        self._retention_day: Optional[str] = None
+        self._retention_lock = threading.Lock()
+        self.flushes = 0
+        self.dropped = 0
+        self.syncs = 0
+        atexit.register(self.flush)
+    
+    def attempts_cutoff(self) -> str:
+        """Возвращает начало окна подсчёта попыток.
+        
+        attempt_time заполняется CURRENT_TIMESTAMP (UTC, 'YYYY-MM-DD HH:MM:SS'),
+        поэтому граница окна строится в том же формате.
+        
+        Returns:
+            Строка времени для сравнения с attempt_time
+        """
+        return (datetime.utcnow() - self.attempt_window).strftime(ATTEMPT_TIME_FORMAT)
+    
+    def load(self) -> bool:
+        """Восстанавливает счётчики и блокировки из БД.
+        
+        Попытки, оставленные миграцией 009 в прежней таблице, сначала
+        переносятся в дневные таблицы и окна неудачных попыток.
+        
+        Returns:
+            True если состояние прочитано, False при ошибке БД
+        """
+        try:
+            self.repo.adopt_legacy_attempts(
+                self.attempt_window.total_seconds(), self.max_attempts
+            )
+            windows = self.repo.find_failure_windows(time.time())
+            locks = self.repo.find_active_locks(datetime.now().isoformat())
+        except Exception as e:
+            logger.warning("Не удалось загрузить попытки входа: %s", e)
+            return False
+        
+        for ip_address, login, timestamps in windows:
+            self._failures.merge((ip_address, login), timestamps)
+        for user_id, locked_until in locks:
+            self._locks[user_id] = datetime.fromisoformat(locked_until)
+        self._loaded = True
+        return True
+    
+    def _ensure_loaded(self) -> None:
+        """Загружает состояние из БД при первом обращении.
+        
+        После ошибки загрузка повторяется не раньше чем через паузу,
+        которая удваивается до LOAD_RETRY_MAX_DELAY.
+        """
+        if self._loaded or time.monotonic() < self._load_retry_at:
+            return
+        with self._load_lock:
+            if self._loaded or time.monotonic() < self._load_retry_at:
+                return
+            if not self.load():
+                self._load_retry_at = time.monotonic() + self._load_retry_delay
+                self._load_retry_delay = min(
+                    self._load_retry_delay * 2, LOAD_RETRY_MAX_DELAY
+                )
+    
+    def flush(self) -> int:
+        """Записывает накопленные попытки и блокировки в БД.
+        
+        Returns:
+            Количество записанных строк
+        """
+        with self._flush_lock:
+            attempts, self._pending_attempts = self._pending_attempts, []
+            failures, self._pending_failures = self._pending_failures, {}
+            locks, self._pending_locks = self._pending_locks, []
+            self._flushed_at = time.monotonic()
+            if not attempts and not locks:
+                return 0
+            
+            try:
+                written = self.repo.save_batch(
+                    attempts, locks, failures,
+                    self.attempt_window.total_seconds(), self.max_attempts
+                )
+            except Exception as e:
+                logger.warning("Не удалось сохранить попытки входа: %s", e)
+                # Вернём пачку в очередь, отбросив самые старые попытки
+                self._pending_attempts = attempts + self._pending_attempts
+                self._pending_locks = locks + self._pending_locks
+                for key, timestamps in failures.items():
+                    pending = self._pending_failures.setdefault(key, [])
+                    pending[:0] = timestamps
+                    del pending[:-self.max_attempts]
+                overflow = len(self._pending_attempts) - self._max_pending
+                if overflow > 0:
+                    del self._pending_attempts[:overflow]
+                    self.dropped += overflow
+                return 0
+            
+            self.flushes += 1
+            return written
+    
+    def _maybe_flush(self) -> None:
+        """Записывает пачку по размеру или по таймеру."""
+        if (
+            len(self._pending_attempts) >= self.batch_size
+            or self._pending_locks
+            or time.monotonic() - self._flushed_at >= self.flush_interval
+        ):
+            self.flush()
+        
+        if self._retention_day != datetime.utcnow().strftime('%Y-%m-%d'):
+            # Запросы не ждут очистку, начатую другим потоком
+            if self._retention_lock.acquire(blocking=False):
+                try:
+                    self.apply_retention()
+                finally:
+                    self._retention_lock.release()
     
     def record_login_attempt(
-        self, 
-        ip_address: str, 
-        login: str, 
+        self,
+        ip_address: str,
+        login: str,
         success: bool
     ) -> bool:
-        """Записывает попытку входа в базу данных.
+        """Учитывает попытку входа и ставит её в очередь на запись в БД.
+        
         
         Args:
             ip_address: IP адрес пользователя
@@ -40,25 +235,71 @@ class LoginAttemptService:
             success: Успешность попытки входа
             
         Returns:
-            True если запись успешна, False при ошибке
+            True если попытка учтена
         """
+        self._ensure_loaded()
+        now = time.time()
+        if not success:
+            self._failures.add((ip_address, login), now)
+        
+        attempt_time = datetime.fromtimestamp(now, timezone.utc).strftime(ATTEMPT_TIME_FORMAT)
+        with self._flush_lock:
+            self._pending_attempts.append((ip_address, login, success, attempt_time))
+            if not success:
+                pending = self._pending_failures.setdefault((ip_address, login), [])
+                pending.append(now)
+                # В общем окне хранятся только max_attempts последних отметок
+                del pending[:-self.max_attempts]
+        self._maybe_flush()
+        return True
+    
+    def _needs_sync(self, key: Hashable) -> bool:
+        """Проверяет, пора ли перечитать общее состояние ключа из БД."""
+        synced = self._synced.get(key)
+        return synced is None or time.monotonic() - synced >= self.flush_interval
+    
+    def _mark_synced(self, keys: Iterable[Hashable]) -> None:
+        """Запоминает время чтения ключей из БД."""
+        now = time.monotonic()
+        with self._sync_lock:
+            for key in keys:
+                self._synced[key] = now
+                self._synced.move_to_end(key)
+            while len(self._synced) > self._max_synced:
+                self._synced.popitem(last=False)
+    
+    def merge_failures(self, ip_address: str, login: str, timestamps: Iterable[float]) -> None:
+        """Объединяет счётчик процесса с окном неудачных попыток из БД.
+        
+        Args:
+            ip_address: IP адрес пользователя
+            login: Логин пользователя
+            timestamps: Времена неудачных попыток всех процессов (Unix timestamp)
+        """
+        self._failures.merge((ip_address, login), timestamps)
+        self._mark_synced([(ip_address, login)])
+    
+    def _sync_failures(self, ip_address: str, login: str) -> None:
+        """Перечитывает окно пары IP + логин, если прошло flush_interval."""
+        if not self._needs_sync((ip_address, login)):
+            return
         try:
-            execute_insert(
-                """INSERT INTO login_attempts (ip_address, login, success)
-                   VALUES (?, ?, ?)""",
-                (ip_address, login, success)
-            )
-            return True
-        except Exception:
-            return False
+            timestamps = self.repo.find_failure_window(ip_address, login, time.time())
+        except Exception as e:
+            logger.warning("Не удалось прочитать неудачные попытки входа: %s", e)
+            return
+        self.syncs += 1
+        self.merge_failures(ip_address, login, timestamps)
     
     def get_failed_attempts_count(
-        self, 
-        ip_address: str, 
+        self,
+        ip_address: str,
         login: str
     ) -> int:
         """Возвращает количество неудачных попыток входа за окно времени.
         
+        Счётчик хранит не больше max_attempts последних попыток.
+        
         Args:
             ip_address: IP адрес пользователя
             login: Логин пользователя
@@ -66,36 +307,86 @@ class LoginAttemptService:
         Returns:
             Количество неудачных попыток
         """
-        try:
-            cutoff_time = datetime.now() - self.attempt_window
-            
-            result = execute_query(
-                """SELECT COUNT(*) as count FROM login_attempts
-                   WHERE ip_address = ? AND login = ? AND success = 0
-                   AND attempt_time > ?""",
-                (ip_address, login, cutoff_time.isoformat()),
-                fetch_all=True
-            )
-            
-            return result[0]['count'] if result else 0
-        except Exception:
-            return 0
+        self._ensure_loaded()
+        self._sync_failures(ip_address, login)
+        return self._failures.count((ip_address, login))
     
     def will_exceed_max_attempts(
-        self, 
-        ip_address: str, 
-        login: str
+        self,
+        ip_address: str,
+        login: str,
+        sync: bool = True
     ) -> bool:
         """Проверяет, превысит ли текущая попытка максимальное количество.
         
         Args:
             ip_address: IP адрес пользователя
             login: Логин пользователя
+            sync: Перечитать окно из БД, если прошло flush_interval
+                (False — только память процесса)
             
         Returns:
             True если текущая попытка превысит максимум
         """
-        return self.get_failed_attempts_count(ip_address, login) >= self.max_attempts
+        self._ensure_loaded()
+        # Исчерпанный лимит не требует запроса
+        if self._failures.exceeded((ip_address, login)):
+            return True
+        if sync:
+            self._sync_failures(ip_address, login)
+        return self._failures.exceeded((ip_address, login))
+    
+    def merge_locks(self, user_ids: Iterable[int], rows: Iterable[Tuple[int, str]]) -> None:
+        """Заменяет блокировки аккаунтов в памяти прочитанными из БД.
+        
+        Блокировки процесса, ещё не записанные в БД, сохраняются.
+        
+        Args:
+            user_ids: ID пользователей, блокировки которых прочитаны
+            rows: Действующие блокировки из БД (user_id, locked_until)
+        """
+        user_ids = set(user_ids)
+        locked = {user_id: datetime.fromisoformat(until) for user_id, until in rows}
+        with self._flush_lock:
+            for user_id, until, _ in self._pending_locks:
+                if user_id in user_ids:
+                    until = datetime.fromisoformat(until)
+                    locked[user_id] = max(until, locked.get(user_id, until))
+        for user_id in user_ids:
+            self._locks.pop(user_id, None)
+        self._locks.update(locked)
+        self._mark_synced(('lock', user_id) for user_id in user_ids)
+    
+    def find_locked(self, user_ids: Iterable[int]) -> dict[int, datetime]:
+        """Возвращает действующие блокировки аккаунтов.
+        
+        Блокировки, которые не читались из БД дольше flush_interval,
+        перечитываются одним запросом (их могли поставить или снять другие
+        процессы); если БД недоступна — остаются блокировки процесса.
+        
+        Args:
+            user_ids: ID пользователей
+            
+        Returns:
+            Словарь {ID заблокированного пользователя: время разблокировки}
+        """
+        self._ensure_loaded()
+        user_ids = set(user_ids)
+        now = datetime.now()
+        stale = [user_id for user_id in user_ids if self._needs_sync(('lock', user_id))]
+        if stale:
+            try:
+                rows = self.repo.find_active_locks(now.isoformat(), stale)
+            except Exception as e:
+                logger.warning("Не удалось прочитать блокировки аккаунтов: %s", e)
+            else:
+                self.syncs += 1
+                self.merge_locks(stale, rows)
+        
+        return {
+            user_id: until for user_id, until in self._locks.items()
+            if user_id in user_ids and until > now
+        }
     
     def is_account_locked(self, user_id: int) -> Tuple[bool, Optional[datetime]]:
         """Проверяет, заблокирован ли аккаунт.
@@ -106,25 +397,12 @@ class LoginAttemptService:
         Returns:
             Кортеж (заблокирован, время разблокировки)
         """
-        try:
-            result = execute_query(
-                """SELECT locked_until FROM locked_accounts
-                   WHERE user_id = ? AND locked_until > ?""",
-                (user_id, datetime.now().isoformat()),
-                fetch_all=True
-            )
-            
-            if result:
-                locked_until = datetime.fromisoformat(result[0]['locked_until'])
-                return True, locked_until
-            
-            return False, None
-        except Exception:
-            return False, None
+        locked_until = self.find_locked([user_id]).get(user_id)
+        return locked_until is not None, locked_until
     
     def lock_account(
-        self, 
-        user_id: int, 
+        self,
+        user_id: int,
         reason: str = "Too many failed login attempts"
     ) -> bool:
         """Блокирует аккаунт пользователя.
@@ -134,19 +412,15 @@ class LoginAttemptService:
             reason: Причина блокировки
             
         Returns:
-            True если блокировка успешна, False при ошибке
+            True если блокировка успешна
         """
-        try:
-            locked_until = datetime.now() + self.lockout_duration
-            
-            execute_insert(
-                """INSERT INTO locked_accounts (user_id, locked_until, lock_reason)
-                   VALUES (?, ?, ?)""",
-                (user_id, locked_until.isoformat(), reason)
-            )
-            return True
-        except Exception:
-            return False
+        self._ensure_loaded()
+        locked_until = datetime.now() + self.lockout_duration
+        self._locks[user_id] = locked_until
+        with self._flush_lock:
+            self._pending_locks.append((user_id, locked_until.isoformat(), reason))
+        self._maybe_flush()
+        return True
     
     def unlock_account(self, user_id: int) -> bool:
         """Разблокирует аккаунт пользователя.
@@ -157,40 +431,60 @@ class LoginAttemptService:
         Returns:
             True если разблокировка успешна, False при ошибке
         """
+        self._locks.pop(user_id, None)
+        with self._flush_lock:
+            self._pending_locks = [
+                lock for lock in self._pending_locks if lock[0] != user_id
+            ]
         try:
-            execute_update(
-                """DELETE FROM locked_accounts WHERE user_id = ?""",
-                (user_id,)
-            )
+            self.repo.delete_locks(user_id)
             return True
         except Exception:
             return False
     
+    def apply_retention(self) -> Optional[dict[str, int]]:
+        """Сворачивает старые дни в сводку и удаляет устаревшие данные.
+        
+        Returns:
+            Словарь с количеством удалённых таблиц и строк или None при ошибке БД
+        """
+        today = datetime.utcnow()
+        self._retention_day = today.strftime('%Y-%m-%d')
+        raw_from = (today - timedelta(days=self.raw_days - 1)).strftime('%Y-%m-%d')
+        totals_from = (today - timedelta(days=self.totals_days)).strftime('%Y-%m-%d')
+        
+        self.flush()
+        try:
+            partitions, rolled_up = self.repo.compact_before(raw_from)
+            return {
+                'partitions': partitions,
+                'rolled_up': rolled_up,
+                'expired_totals': self.repo.delete_totals_before(totals_from),
+                'expired_locks': self.repo.delete_expired_locks(datetime.now().isoformat()),
+            }
+        except Exception as e:
+            logger.warning("Не удалось очистить старые попытки входа: %s", e)
+            return None
+    
     def cleanup_old_attempts(self) -> bool:
         """Удаляет старые записи о попытках входа.
         
         Returns:
             True если очистка успешна, False при ошибке
         """
-        try:
-            cutoff_time = datetime.now() - timedelta(days=7)
-            
-            execute_update(
-                """DELETE FROM login_attempts WHERE attempt_time < ?""",
-                (cutoff_time.isoformat(),)
-            )
-            return True
-        except Exception:
-            return False
+        return self.apply_retention() is not None
     
     def should_block_login(
-        self, 
-        ip_address: str, 
-        login: str, 
+        self,
+        ip_address: str,
+        login: str,
         user_id: Optional[int] = None
     ) -> Tuple[bool, Optional[str]]:
         """Проверяет, следует ли заблокировать попытку входа.
         
+        Проверки отвечают по памяти процесса; общее состояние ключа
+        перечитывается из БД не чаще раза в flush_interval.
+        
         Args:
             ip_address: IP адрес пользователя
             login: Логин пользователя
@@ -206,9 +500,23 @@ class LoginAttemptService:
                 return True, f"Аккаунт заблокирован до {locked_until.strftime('%H:%M')}"
         
         # Проверяем количество неудачных попыток
-        failed_attempts = self.get_failed_attempts_count(ip_address, login)
-        
-        if failed_attempts >= self.max_attempts:
-            return True, f"Слишком много неудачных попыток ({failed_attempts})"
+        if self.will_exceed_max_attempts(ip_address, login):
+            return True, f"Слишком много неудачных попыток ({self.max_attempts})"
         
         return False, None
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику счётчиков и очереди записи.
+        
+        Returns:
+            Словарь со статистикой счётчиков, блокировок и записи в БД
+        """
+        stats = self._failures.stats()
+        stats.update(
+            locked_accounts=len(self._locks),
+            pending=len(self._pending_attempts) + len(self._pending_locks),
+            flushes=self.flushes,
+            dropped=self.dropped,
+            syncs=self.syncs,
+        )
+        return stats
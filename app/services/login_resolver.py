@@ -0,0 +1,195 @@
+"""Принятие решения о входе пользователя.
+
+Применяемые паттерны:
+- Service Layer — вся логика входа в одном месте вместо веток во view
+- Pipeline — загрузка кандидатов → фильтры → проверка паролей → решение
+- Result Object — view получает одно решение LoginDecision
+
+Применяемые принципы:
+- Fixed cost — один запрос к БД на попытку входа и не больше
+  max_candidates проверок хэша
+- Fail fast — исчерпанный лимит попыток отклоняет вход до запроса к БД
+- Single Responsibility — view только отображает решение
+
+Кандидаты, их блокировки и окно неудачных попыток с этого IP читаются
+одним запросом (UserRepository.find_login_candidates) и объединяются
+со счётчиками процесса (LoginAttemptService), поэтому попытки и
+блокировки других процессов учитываются без отдельных запросов; запись
+попыток идёт пачками. Подсказки из cookies (последний аккаунт,
+сохранённые аккаунты) только сужают список кандидатов.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Optional
+
+from ..models.users import User
+from ..repositories.user_repo import UserRepository
+from .login_attempt_service import LoginAttemptService
+from .user_auth_service import UserAuthService
+
+
+@dataclass(slots=True)
+class LoginDecision:
+    """Результат попытки входа."""
+    
+    OK = 'ok'  # Пароль подошёл к одному аккаунту
+    CHOOSE = 'choose'  # Пароль подошёл к нескольким аккаунтам
+    INVALID = 'invalid'  # Неверный пароль
+    NOT_FOUND = 'not_found'  # Аккаунтов с таким логином нет
+    BLOCKED = 'blocked'  # Слишком много неудачных попыток
+    LOCKED = 'locked'  # Все подходящие аккаунты заблокированы
+    
+    status: str
+    message: Optional[str] = None
+    user: Optional[User] = None
+    accounts: list[User] = field(default_factory=list)
+    
+    @property
+    def success(self) -> bool:
+        """Проверяет, можно ли выдать токен или показать выбор аккаунта."""
+        return self.status in (self.OK, self.CHOOSE)
+
+
+class LoginResolver:
+    """Определяет, в какой аккаунт входит пользователь."""
+    
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        auth_service: UserAuthService,
+        login_attempts: LoginAttemptService,
+        max_candidates: int = 8
+    ):
+        """Инициализирует сервис.
+        
+        Args:
+            user_repo: Репозиторий пользователей
+            auth_service: Сервис авторизации (хэшер паролей и пересчёт хэшей)
+            login_attempts: Сервис учёта попыток входа
+            max_candidates: Максимум проверок пароля за одну попытку входа
+        """
+        self.user_repo = user_repo
+        self.auth_service = auth_service
+        self.login_attempts = login_attempts
+        self.max_candidates = max_candidates
+    
+    def resolve(
+        self,
+        login: str,
+        password: str,
+        ip_address: str,
+        discriminator: Optional[str] = None,
+        account_ids: Iterable[int] = ()
+    ) -> LoginDecision:
+        """Проверяет пароль и возвращает решение о входе.
+        
+        Попытка записывается в журнал попыток входа; аккаунт блокируется,
+        если неудачные попытки исчерпали лимит.
+        
+        Args:
+            login: Введённый логин
+            password: Введённый пароль
+            ip_address: IP адрес клиента
+            discriminator: Дискриминатор последнего аккаунта (из cookies)
+            account_ids: ID сохранённых аккаунтов (из cookies)
+        
+        Returns:
+            Решение о входе
+        """
+        # Счётчик процесса не больше общего: исчерпанный лимит не требует запроса
+        if self.login_attempts.will_exceed_max_attempts(ip_address, login, sync=False):
+            return self._blocked()
+        
+        candidates, lock_rows, failures = self.user_repo.find_login_candidates(
+            login, ip_address, datetime.now()
+        )
+        self.login_attempts.merge_failures(ip_address, login, failures)
+        self.login_attempts.merge_locks((user.id for user in candidates), lock_rows)
+        if self.login_attempts.will_exceed_max_attempts(ip_address, login, sync=False):
+            return self._blocked()
+        
+        if not candidates:
+            return self._fail(
+                LoginDecision.NOT_FOUND, ip_address, login,
+                "Пользователь не найден. Пройдите регистрацию."
+            )
+        
+        candidates = self._narrow(candidates, discriminator, account_ids)
+        
+        locks = self.login_attempts.find_locked(user.id for user in candidates)
+        unlocked = [user for user in candidates if user.id not in locks]
+        if not unlocked:
+            return LoginDecision(
+                LoginDecision.LOCKED,
+                f"Аккаунт заблокирован до {max(locks.values()).strftime('%H:%M')}"
+            )
+        
+        unlocked = unlocked[:self.max_candidates]
+        matches = self.auth_service.password_hasher.verify_many(
+            [user.password_hash for user in unlocked], password
+        )
+        accounts = [user for user, matched in zip(unlocked, matches) if matched]
+        
+        if not accounts:
+            return self._fail(
+                LoginDecision.INVALID, ip_address, login,
+                "Неверный пароль", unlocked
+            )
+        
+        self.login_attempts.record_login_attempt(ip_address, login, True)
+        for user in accounts:
+            self.auth_service.rehash_if_needed(user, password)
+        
+        if len(accounts) == 1:
+            return LoginDecision(LoginDecision.OK, user=accounts[0], accounts=accounts)
+        return LoginDecision(LoginDecision.CHOOSE, accounts=accounts)
+    
+    @staticmethod
+    def _blocked() -> LoginDecision:
+        """Решение для исчерпанного лимита попыток."""
+        return LoginDecision(
+            LoginDecision.BLOCKED,
+            "Слишком много неудачных попыток. Попробуйте позже."
+        )
+    
+    @staticmethod
+    def _narrow(
+        candidates: list[User],
+        discriminator: Optional[str],
+        account_ids: Iterable[int]
+    ) -> list[User]:
+        """Сужает кандидатов по подсказкам из cookies.
+        
+        Подсказка, которой не соответствует ни один кандидат, игнорируется.
+        """
+        if discriminator:
+            preferred = [user for user in candidates if user.discriminator == discriminator]
+            if preferred:
+                return preferred
+        
+        ids = set(account_ids)
+        if ids:
+            preferred = [user for user in candidates if user.id in ids]
+            if preferred:
+                return preferred
+        return candidates
+    
+    def _fail(
+        self,
+        status: str,
+        ip_address: str,
+        login: str,
+        message: str,
+        checked: Optional[list[User]] = None
+    ) -> LoginDecision:
+        """Записывает неудачную попытку и при исчерпании лимита блокирует аккаунт."""
+        self.login_attempts.record_login_attempt(ip_address, login, False)
+        
+        # Блокируем только однозначно определённый аккаунт
+        if (
+            checked and len(checked) == 1
+            and self.login_attempts.will_exceed_max_attempts(ip_address, login, sync=False)
+        ):
+            self.login_attempts.lock_account(checked[0].id)
+        return LoginDecision(status, message)
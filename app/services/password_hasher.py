@@ -0,0 +1,246 @@
+"""Хэширование паролей в пуле процессов.
+
+Применяемые паттерны:
+- Service Layer — единая точка для хэширования и проверки паролей
+- Bulkhead — ограниченный пул процессов изолирует дорогие вычисления
+  от потоков, обслуживающих чтение
+- Fail fast — переполненная очередь сразу возвращает ошибку
+- Calibration — стоимость хэша подбирается под целевое время проверки
+
+Применяемые принципы:
+- Bounded resources — не больше max_pending задач в очереди
+- Explicit is better than implicit — таймауты задаются конфигурацией
+- Single Responsibility — только вычисление хэшей
+
+Проверка пароля намеренно дорогая (PBKDF2/scrypt). Вычисление в отдельном
+процессе не держит GIL процесса приложения, а несколько проверок для
+аккаунтов с одинаковым логином выполняются параллельно.
+
+Параметры алгоритма задаёт PASSWORD_HASH_METHOD (см. `flask hash-calibrate`);
+хэши со старыми параметрами пересчитываются после успешного входа.
+"""
+
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь хэширования переполнена или задача не уложилась в таймаут."""
+
+
+class PasswordHasher:
+    """Хэширование паролей инлайн или в ограниченном пуле процессов.
+    
+    При workers = 0 вычисления выполняются в текущем потоке.
+    """
+    
+    def __init__(
+        self,
+        workers: int = 0,
+        max_pending: Optional[int] = None,
+        timeout: float = 10.0,
+        method: str = 'scrypt'
+    ):
+        """Инициализирует хэшер.
+        
+        Args:
+            workers: Количество процессов пула (0 — без пула)
+            max_pending: Максимум задач в работе и очереди (по умолчанию workers * 4)
+            timeout: Максимальное время ожидания места в очереди и результата
+            method: Метод werkzeug с параметрами, например 'scrypt:32768:8:1'
+        """
+        self.method = method
+        self._method_prefix: Optional[str] = None
+        self.workers = max(0, int(workers))
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending) if self.workers else None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.rejected = 0
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Создаёт пул при первом использовании."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # spawn: fork многопоточного процесса приложения небезопасен
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+        return self._executor
+    
+    def _submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Ставит задачу в пул, ожидая свободный слот не дольше timeout.
+        
+        Raises:
+            PasswordHasherBusy: Если очередь переполнена
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            self.rejected += 1
+            raise PasswordHasherBusy("Очередь хэширования паролей переполнена")
+        
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def _result(self, future: Future) -> Any:
+        """Ожидает результат задачи не дольше timeout.
+        
+        Raises:
+            PasswordHasherBusy: Если задача не завершилась вовремя
+        """
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.rejected += 1
+            raise PasswordHasherBusy("Хэширование пароля не завершилось вовремя")
+    
+    def hash(self, password: str) -> str:
+        """Вычисляет хэш пароля.
+        
+        Args:
+            password: Пароль
+        
+        Returns:
+            Хэш пароля в формате werkzeug
+        """
+        if not self.workers:
+            return generate_password_hash(password, method=self.method)
+        return self._result(
+            self._submit(generate_password_hash, password, method=self.method)
+        )
+    
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Проверяет, создан ли хэш с параметрами, отличными от текущих.
+        
+        Args:
+            password_hash: Сохранённый хэш
+            
+        Returns:
+            True если хэш стоит пересчитать
+        """
+        if self._method_prefix is None:
+            # werkzeug дополняет сокращённый метод параметрами по умолчанию
+            self._method_prefix = generate_password_hash(
+                '', method=self.method, salt_length=1
+            ).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._method_prefix
+    
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Проверяет пароль.
+        
+        Args:
+            password_hash: Сохранённый хэш
+            password: Введённый пароль
+        
+        Returns:
+            True если пароль совпадает
+        """
+        if not self.workers:
+            return check_password_hash(password_hash, password)
+        return self._result(self._submit(check_password_hash, password_hash, password))
+    
+    def verify_many(self, password_hashes: list[str], password: str) -> list[bool]:
+        """Проверяет один пароль против нескольких хэшей параллельно.
+        
+        Args:
+            password_hashes: Сохранённые хэши
+            password: Введённый пароль
+        
+        Returns:
+            Результаты проверки в порядке хэшей
+        """
+        if not self.workers or len(password_hashes) < 2:
+            return [self.verify(h, password) for h in password_hashes]
+        
+        futures = []
+        try:
+            for password_hash in password_hashes:
+                futures.append(self._submit(check_password_hash, password_hash, password))
+            return [self._result(future) for future in futures]
+        except PasswordHasherBusy:
+            for future in futures:
+                future.cancel()
+            raise
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает параметры пула.
+        
+        Returns:
+            Словарь с размером пула, очередью и числом отказов
+        """
+        return {
+            'method': self.method,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'timeout': self.timeout,
+            'rejected': self.rejected,
+        }
+    
+    def shutdown(self) -> None:
+        """Останавливает пул процессов."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _time_hash(method: str, rounds: int = 3) -> float:
+    """Возвращает медианное время проверки хэша в миллисекундах."""
+    password_hash = generate_password_hash('calibration-password', method=method)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        check_password_hash(password_hash, 'calibration-password')
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate_method(algorithm: str = 'scrypt', target_ms: float = 250.0) -> tuple[str, float]:
+    """Подбирает параметры алгоритма под целевое время проверки на этом железе.
+    
+    Для pbkdf2 число итераций масштабируется линейно по замеру,
+    для scrypt параметр n удваивается (он обязан быть степенью двойки)
+    и выбирается значение с временем, ближайшим к целевому. n ограничен
+    2^17: память scrypt равна 128·n·r байт на каждую параллельную проверку.
+    
+    Args:
+        algorithm: 'scrypt' или 'pbkdf2'
+        target_ms: Целевое время одной проверки в миллисекундах
+        
+    Returns:
+        Кортеж (метод для PASSWORD_HASH_METHOD, измеренное время в мс)
+    """
+    if algorithm == 'pbkdf2':
+        probe = 100_000
+        elapsed = _time_hash(f'pbkdf2:sha256:{probe}')
+        iterations = max(10_000, int(probe * target_ms / elapsed) // 1000 * 1000)
+        method = f'pbkdf2:sha256:{iterations}'
+        return method, _time_hash(method)
+    
+    if algorithm != 'scrypt':
+        raise ValueError(f"Неизвестный алгоритм: {algorithm}")
+    
+    best: Optional[tuple[str, float]] = None
+    n = 2 ** 12
+    while n <= 2 ** 17:
+        method = f'scrypt:{n}:8:1'
+        elapsed = _time_hash(method)
+        if best is None or abs(elapsed - target_ms) < abs(best[1] - target_ms):
+            best = (method, elapsed)
+        if elapsed >= target_ms:
+            break
+        n *= 2
+    return best
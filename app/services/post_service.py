@@ -4,6 +4,7 @@
 - Service Layer — инкапсулирует бизнес-логику работы с постами
 - Dependency Injection — внедрение репозиториев
 - Validation — валидация данных постов
+- Read-Through Cache — чтение поста по ID через кэш
 
 Применяемые принципы:
 - Single Responsibility — только работа с постами
@@ -11,11 +12,15 @@
 - Fail fast — ранние проверки и ошибки
 """
 
-from typing import List, Optional
+from typing import Any, List, Optional, Union
 
-from ..models.posts import Post
+from ..cache import NegativeCache, SingleFlight, TTLCache
+from ..cache.single_flight import MISSING
+from ..cache.tags import ALL_TAGS, POSTS_LISTING, post_tag, tag_ids, user_tag
+from ..models.posts import CompactPost, Post
 from ..models.users import User
 from ..repositories.post_repo import PostRepository
+from ..signals import comment_changed, post_changed, remote_tags_invalidated, tags_invalidated
 
 
 class PostService:
@@ -24,13 +29,46 @@ class PostService:
     Обеспечивает CRUD операции и бизнес-логику для постов.
     """
     
-    def __init__(self, post_repo: PostRepository):
+    def __init__(
+        self,
+        post_repo: PostRepository,
+        post_cache: Optional[TTLCache] = None,
+        flight: Optional[SingleFlight] = None,
+        missing_posts: Optional[NegativeCache] = None
+    ):
         """Инициализирует сервис с зависимостями.
         
         Args:
             post_repo: Репозиторий постов
+            post_cache: Кэш постов по ID (None — без кэширования)
+            flight: Объединение одновременных загрузок поста при промахе кэша
+                (с каталогом блокировок — и между процессами, если кэш общий)
+            missing_posts: Кэш отсутствующих ID постов (None — без кэширования)
         """
         self.post_repo = post_repo
+        self.post_cache = post_cache if post_cache is not None else TTLCache(0, 0, name='posts')
+        self.flight = flight if flight is not None else SingleFlight('posts')
+        self.missing_posts = (
+            missing_posts if missing_posts is not None else NegativeCache('missing_posts', 0, 0)
+        )
+        
+        # Сбрасываем записи кэша точечно при изменении поста или его комментариев
+        post_changed.connect(self._on_post_changed)
+        comment_changed.connect(self._on_post_changed)
+        remote_tags_invalidated.connect(self._on_remote_tags)
+    
+    def _on_post_changed(self, sender, post_id: Optional[int] = None, **extra) -> None:
+        """Удаляет изменённый пост из кэша."""
+        if post_id is not None:
+            self.post_cache.invalidate(post_id)
+            self.missing_posts.add(post_id)
+    
+    def _on_remote_tags(self, sender, tags: frozenset[str] = frozenset(), **extra) -> None:
+        """Удаляет из кэша посты, изменённые другим процессом."""
+        if ALL_TAGS in tags:
+            self.post_cache.clear()
+        for post_id in tag_ids(tags, 'post'):
+            self._on_post_changed(sender, post_id=post_id)
     
     def create_post(self, user_id: int, title: str, body: str) -> tuple[bool, str, Optional[Post]]:
         """Создает новый пост.
@@ -64,6 +102,10 @@ class PostService:
                 body=body.strip()
             )
             
+            tags_invalidated.send(
+                self, tags=(post_tag(post_id), user_tag(user_id), POSTS_LISTING)
+            )
+            
             post = self.post_repo.find_by_id(post_id)
             if post:
                 return True, "Пост успешно создан", post
@@ -73,16 +115,70 @@ class PostService:
         except Exception as e:
             return False, f"Ошибка при создании поста: {e}", None
     
-    def get_post_by_id(self, post_id: int) -> Optional[Post]:
+    def get_post_by_id(self, post_id: int) -> Optional[Union[Post, CompactPost]]:
         """Получает пост по ID.
         
+        При включённом кэше возвращает неизменяемый CompactPost
+        из кэша, обращаясь к БД только при промахе. Заведомо
+        отсутствующие ID отвечаются из кэша отсутствующих постов.
+        
         Args:
             post_id: ID поста
             
         Returns:
             Пост или None если не найден
         """
-        return self.post_repo.find_by_id(post_id)
+        if self.post_cache.enabled:
+            post = self.post_cache.get(post_id)
+            if post is not None:
+                return post
+        
+        if self.missing_posts.is_missing(post_id):
+            return None
+        
+        if self.post_cache.enabled:
+            # Популярный пост после сброса загружает один запрос, остальные ждут его
+            post = self.flight.do(
+                post_id,
+                lambda: self._load_post(post_id),
+                recheck=lambda: self._cached_post(post_id)
+            )
+        else:
+            post = self.post_repo.find_by_id(post_id)
+        
+        if post is None:
+            self.missing_posts.mark_missing(post_id)
+        return post
+    
+    def _cached_post(self, post_id: int) -> Any:
+        """Пост, который другой процесс положил в общий кэш, пока мы ждали."""
+        post = self.post_cache.get(post_id) if post_id in self.post_cache else None
+        return MISSING if post is None else post
+    
+    def _load_post(self, post_id: int) -> Optional[CompactPost]:
+        """Загружает пост из БД и кладёт в кэш."""
+        found = self.post_repo.find_by_id(post_id)
+        if found is None:
+            return None
+        
+        post = CompactPost.from_post(found)
+        self.post_cache.set(post_id, post)
+        return post
+    
+    def warm_cache(self, limit: int) -> List[Post]:
+        """Загружает последние посты одним запросом и кладёт их в кэш.
+        
+        Args:
+            limit: Количество последних постов
+            
+        Returns:
+            Загруженные посты
+        """
+        posts = self.post_repo.find_all(limit=limit)
+        if self.post_cache.enabled:
+            for post in posts:
+                self.post_cache.set(post.id, CompactPost.from_post(post))
+        return posts
     
     def get_all_posts(self, page: int = 1, per_page: int = 10) -> tuple[List[Post], int]:
         """Получает все посты с пагинацией.
@@ -137,7 +233,7 @@ class PostService:
             Кортеж (успех, сообщение, пост)
         """
         # Получаем пост
-        post = self.post_repo.find_by_id(post_id)
+        post = self.get_post_by_id(post_id)
         if not post:
             return False, "Пост не найден", None
         
@@ -167,7 +263,8 @@ class PostService:
             )
             
             if success:
-                updated_post = self.post_repo.find_by_id(post_id)
+                tags_invalidated.send(self, tags=(post_tag(post_id), POSTS_LISTING))
+                updated_post = self.get_post_by_id(post_id)
                 return True, "Пост успешно обновлен", updated_post
             else:
                 return False, "Ошибка при обновлении поста", None
@@ -187,7 +284,7 @@ class PostService:
             Кортеж (успех, сообщение)
         """
         # Получаем пост
-        post = self.post_repo.find_by_id(post_id)
+        post = self.get_post_by_id(post_id)
         if not post:
             return False, "Пост не найден"
         
@@ -199,6 +296,7 @@ class PostService:
             success = self.post_repo.delete_post(post_id)
             
             if success:
+                tags_invalidated.send(self, tags=(post_tag(post_id), POSTS_LISTING))
                 return True, "Пост успешно удален"
             else:
                 return False, "Ошибка при удалении поста"
@@ -217,7 +315,7 @@ class PostService:
         Returns:
             True если пользователь может редактировать пост
         """
-        post = self.post_repo.find_by_id(post_id)
+        post = self.get_post_by_id(post_id)
         if not post:
             return False
         
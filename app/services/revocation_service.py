@@ -0,0 +1,162 @@
+"""Сервис отзыва JWT токенов.
+
+Применяемые паттерны:
+- Service Layer — инкапсулирует отзыв и проверку токенов
+- Bloom Filter — отрицательный ответ без обращения к БД
+- Lazy Rebuild — фильтр перестраивается из таблицы по таймеру
+
+Применяемые принципы:
+- Single Responsibility — только отзыв отдельных токенов
+- Fail closed — при ошибке точной проверки токен считается отозванным
+- Bounded memory — истёкшие записи удаляются при перестройке
+
+Большинство токенов не отозвано, поэтому проверка почти всегда
+заканчивается в фильтре. Попадание в фильтр перепроверяется точным
+запросом к revoked_tokens. Отзывы из других процессов становятся
+видны после очередной перестройки фильтра.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+from ..cache.bloom import BloomFilter
+from ..repositories.token_repo import RevokedTokenRepository
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationService:
+    """Список отозванных токенов с фильтром Блума в памяти."""
+    
+    def __init__(
+        self,
+        token_repo: RevokedTokenRepository,
+        capacity: int = 10000,
+        error_rate: float = 0.001,
+        rebuild_interval: float = 60.0
+    ):
+        """Инициализирует сервис.
+        
+        Args:
+            token_repo: Репозиторий отозванных токенов
+            capacity: Минимальная ёмкость фильтра
+            error_rate: Целевая доля ложных срабатываний фильтра
+            rebuild_interval: Интервал перестройки фильтра и сборки мусора в секундах
+        """
+        self.token_repo = token_repo
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self._filter = BloomFilter(capacity, error_rate)
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+        self.rebuilds = 0
+        self.collected = 0
+    
+    @staticmethod
+    def _key(user_id: int, iat: int) -> str:
+        return f"{user_id}:{iat}"
+    
+    def rebuild(self) -> bool:
+        """Удаляет истёкшие записи и перестраивает фильтр из БД.
+        
+        Returns:
+            True если фильтр перестроен, False при ошибке БД
+        """
+        now = int(time.time())
+        with self._lock:
+            try:
+                self.collected += self.token_repo.delete_expired(now)
+                active = self.token_repo.find_active(now)
+            except Exception as e:
+                logger.warning("Не удалось перестроить список отозванных токенов: %s", e)
+                # Повторим после следующего интервала, а не на каждом запросе
+                self._built_at = time.monotonic()
+                return False
+            
+            bloom = BloomFilter(max(self.capacity, 2 * len(active)), self.error_rate)
+            for user_id, iat in active:
+                bloom.add(self._key(user_id, iat))
+            self._filter = bloom
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+        return True
+    
+    def _ensure_fresh(self) -> None:
+        """Перестраивает фильтр по таймеру или при переполнении."""
+        if (
+            self._built_at is None
+            or time.monotonic() - self._built_at > self.rebuild_interval
+            or self._filter.count > self._filter.capacity
+        ):
+            self.rebuild()
+    
+    def revoke(self, user_id: int, iat: int, expires_at: int) -> bool:
+        """Отзывает один токен.
+        
+        Args:
+            user_id: ID пользователя
+            iat: Время выпуска токена
+            expires_at: Время истечения токена
+        
+        Returns:
+            True если токен отозван
+        """
+        if expires_at <= time.time():
+            return True
+        
+        self.token_repo.revoke(user_id, iat, expires_at)
+        with self._lock:
+            self._filter.add(self._key(user_id, iat))
+        return True
+    
+    def is_revoked(self, user_id: int, iat: int) -> bool:
+        """Проверяет, отозван ли токен.
+        
+        Args:
+            user_id: ID пользователя
+            iat: Время выпуска токена
+        
+        Returns:
+            True если токен отозван
+        """
+        self._ensure_fresh()
+        self.lookups += 1
+        if self._key(user_id, iat) not in self._filter:
+            return False
+        
+        self.filter_hits += 1
+        try:
+            revoked = self.token_repo.is_revoked(user_id, iat)
+        except Exception as e:
+            logger.warning("Не удалось проверить отзыв токена: %s", e)
+            return True
+        
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+    
+    def stats(self) -> dict[str, Any]:
+        """Возвращает статистику фильтра и проверок.
+        
+        Returns:
+            Словарь с параметрами фильтра, памятью и долей ложных срабатываний
+        """
+        stats = self._filter.stats()
+        negatives = self.lookups - self.filter_hits + self.false_positives
+        stats.update(
+            lookups=self.lookups,
+            filter_hits=self.filter_hits,
+            false_positives=self.false_positives,
+            observed_false_positive_rate=(
+                self.false_positives / negatives if negatives else 0.0
+            ),
+            rebuilds=self.rebuilds,
+            collected=self.collected,
+        )
+        return stats
@@ -0,0 +1,128 @@
+"""Компактный двоичный формат токенов авторизации.
+
+Применяемые паттерны:
+- Codec — симметричные encode/decode для одного формата
+- Strategy — формат выбирается конфигурацией JWT_TOKEN_FORMAT
+
+Применяемые принципы:
+- Fixed layout — поля читаются struct.unpack без разбора JSON
+- Security first — поля используются только после проверки подписи
+- Explicit is better than implicit — версия формата в первом байте
+
+Структура токена (base64url без padding, без точек):
+
+    +--------+---------+-----+-----+-----+-------------------+----------+
+    | формат | user_id | exp | iat | ver | claims (формат 2) | HMAC[:n] |
+    |   1 Б  |   4 Б   | 4 Б | 4 Б | 4 Б |   длина + байты   | 16..32 Б |
+    +--------+---------+-----+-----+-----+-------------------+----------+
+
+Claims формата 2 — три строки login, disc, roles (через запятую),
+каждая с префиксом длины в один байт. Подпись считается по всем
+байтам до неё и может быть усечена до SIGNATURE_MIN_BYTES.
+"""
+
+import base64
+import hmac
+import struct
+from typing import Any, Optional
+
+HEADER = struct.Struct('>BIIII')
+
+# Версии формата
+FORMAT_IDS = 1  # Только идентификаторы и сроки
+FORMAT_CLAIMS = 2  # Плюс логин, дискриминатор и роли
+
+# Усечённый HMAC короче 128 бит не принимается
+SIGNATURE_MIN_BYTES = 16
+
+
+def _pack_str(value: Optional[str]) -> bytes:
+    data = (value or '').encode('utf-8')
+    if len(data) > 255:
+        raise ValueError("Строка claims длиннее 255 байт")
+    return bytes((len(data),)) + data
+
+
+def encode(payload: dict[str, Any], key: bytes, digestmod: Any, signature_bytes: int) -> str:
+    """Кодирует payload в двоичный токен.
+    
+    Args:
+        payload: Поля user_id, exp, iat и необязательные ver, login, disc, roles
+        key: Ключ подписи
+        digestmod: Хэш-функция HMAC
+        signature_bytes: Длина подписи в байтах
+    
+    Returns:
+        Токен в base64url без padding
+    """
+    has_claims = 'login' in payload
+    body = HEADER.pack(
+        FORMAT_CLAIMS if has_claims else FORMAT_IDS,
+        payload['user_id'],
+        payload['exp'],
+        payload['iat'],
+        payload.get('ver', 0)
+    )
+    if has_claims:
+        body += (
+            _pack_str(payload['login'])
+            + _pack_str(payload.get('disc'))
+            + _pack_str(','.join(payload.get('roles') or ()))
+        )
+    
+    signature = hmac.new(key, body, digestmod).digest()
+    length = max(SIGNATURE_MIN_BYTES, min(signature_bytes, len(signature)))
+    token = body + signature[:length]
+    return base64.urlsafe_b64encode(token).decode('ascii').rstrip('=')
+
+
+def decode(token: str, key: bytes, digestmod: Any) -> Optional[dict[str, Any]]:
+    """Проверяет подпись и декодирует двоичный токен.
+    
+    Срок действия не проверяется — это делает вызывающий код.
+    
+    Args:
+        token: Токен в base64url без padding
+        key: Ключ подписи
+        digestmod: Хэш-функция HMAC
+    
+    Returns:
+        Payload токена или None если токен повреждён или подделан
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        fmt, user_id, exp, iat, ver = HEADER.unpack_from(raw)
+    except (ValueError, struct.error):
+        return None
+    
+    offset = HEADER.size
+    strings = []
+    if fmt == FORMAT_CLAIMS:
+        for _ in range(3):
+            if offset >= len(raw):
+                return None
+            length = raw[offset]
+            strings.append(raw[offset + 1:offset + 1 + length])
+            offset += 1 + length
+    elif fmt != FORMAT_IDS:
+        return None
+    
+    body, signature = raw[:offset], raw[offset:]
+    expected = hmac.new(key, body, digestmod).digest()
+    if not SIGNATURE_MIN_BYTES <= len(signature) <= len(expected):
+        return None
+    if not hmac.compare_digest(signature, expected[:len(signature)]):
+        return None
+    
+    payload: dict[str, Any] = {'user_id': user_id, 'exp': exp, 'iat': iat, 'ver': ver}
+    if strings:
+        try:
+            login, disc, roles = (s.decode('utf-8') for s in strings)
+        except UnicodeDecodeError:
+            return None
+        payload.update(
+            login=login,
+            disc=disc or None,
+            roles=roles.split(',') if roles else []
+        )
+    return payload
@@ -0,0 +1,130 @@
+"""Сервис версий токенов пользователей.
+
+Применяемые паттерны:
+- Service Layer — инкапсулирует проверку актуальности токенов
+- Observer — подписка на сигнал user_changed
+- Bulk Refresh — таблица версий обновляется одним запросом
+
+Применяемые принципы:
+- Single Responsibility — только версии токенов
+- Fail closed — при ошибке БД неизвестная версия считается невалидной
+- Explicit is better than implicit — явный интервал обновления
+
+Каждый JWT токен содержит версию (claim `ver`). Смена пароля или ролей
+увеличивает `users.token_version`, и все ранее выпущенные токены
+пользователя перестают проходить проверку.
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from ..repositories.user_repo import UserRepository
+from ..cache.tags import tag_ids
+from ..signals import remote_tags_invalidated, user_changed
+
+logger = logging.getLogger(__name__)
+
+
+class TokenVersionService:
+    """Таблица версий токенов в памяти процесса.
+    
+    Изменения в своём процессе применяются сразу (через сигнал),
+    изменения из других процессов — при периодическом обновлении.
+    """
+    
+    def __init__(self, user_repo: UserRepository, refresh_interval: float = 30.0):
+        """Инициализирует сервис.
+        
+        Args:
+            user_repo: Репозиторий пользователей
+            refresh_interval: Интервал полного обновления таблицы в секундах
+        """
+        self.user_repo = user_repo
+        self.refresh_interval = refresh_interval
+        self._versions: dict[int, int] = {}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        
+        user_changed.connect(self._on_user_changed)
+        remote_tags_invalidated.connect(self._on_remote_tags)
+    
+    def _on_user_changed(self, sender, user_id: Optional[int] = None, **extra) -> None:
+        """Забывает версию изменённого пользователя до следующего запроса."""
+        if user_id is not None:
+            with self._lock:
+                self._versions.pop(user_id, None)
+    
+    def _on_remote_tags(self, sender, tags: frozenset[str] = frozenset(), **extra) -> None:
+        """Забывает версии пользователей, изменённых другим процессом."""
+        for user_id in tag_ids(tags, 'user'):
+            self._on_user_changed(sender, user_id=user_id)
+    
+    def refresh(self) -> bool:
+        """Загружает версии всех пользователей одним запросом.
+        
+        Returns:
+            True если таблица обновлена, False при ошибке БД
+        """
+        try:
+            versions = self.user_repo.find_all_token_versions()
+        except Exception as e:
+            logger.warning("Не удалось обновить версии токенов: %s", e)
+            return False
+        
+        with self._lock:
+            self._versions = versions
+            self._refreshed_at = time.monotonic()
+        return True
+    
+    def current_version(self, user_id: int) -> Optional[int]:
+        """Возвращает текущую версию токенов пользователя.
+        
+        Args:
+            user_id: ID пользователя
+        
+        Returns:
+            Версия токенов или None если пользователь не найден
+        """
+        if time.monotonic() - self._refreshed_at > self.refresh_interval:
+            self.refresh()
+        
+        version = self._versions.get(user_id)
+        if version is not None:
+            return version
+        
+        # Новый или только что изменённый пользователь — точечный запрос
+        try:
+            version = self.user_repo.find_token_version(user_id)
+        except Exception as e:
+            logger.warning("Не удалось получить версию токенов: %s", e)
+            return None
+        
+        if version is not None:
+            with self._lock:
+                self._versions[user_id] = version
+        return version
+    
+    def is_current(self, user_id: int, version: int) -> bool:
+        """Проверяет, что версия из токена совпадает с текущей.
+        
+        Args:
+            user_id: ID пользователя
+            version: Версия из токена
+        
+        Returns:
+            True если токен не отозван
+        """
+        return self.current_version(user_id) == version
+    
+    def bump(self, user_id: int) -> bool:
+        """Отзывает все токены пользователя.
+        
+        Args:
+            user_id: ID пользователя
+        
+        Returns:
+            True если версия увеличена
+        """
+        return self.user_repo.bump_token_version(user_id)
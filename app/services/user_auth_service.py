@@ -4,6 +4,9 @@
 - Service Layer — инкапсулирует бизнес-логику авторизации
 - Dependency Injection — внедрение репозиториев
 - Strategy — разные стратегии для обычных пользователей и admin
+- Read-Through Cache — пользователь по токену читается через кэш
+- Self-contained Token — логин и роли подписаны в токене, версия сверяется
+  с таблицей в памяти
 
 Применяемые принципы:
 - Single Responsibility — только авторизация и регистрация
@@ -13,13 +16,20 @@
 
 import logging
 import sqlite3
+import threading
 from typing import Optional, Tuple
 
-from werkzeug.security import check_password_hash, generate_password_hash
+from flask import current_app
 
+from ..cache import TTLCache
+from ..cache.tags import ALL_TAGS, tag_ids, user_tag
 from ..models.users import User
 from ..repositories.user_repo import UserRepository
+from ..signals import remote_tags_invalidated, tags_invalidated, user_changed
 from .jwt_service import JWTService
+from .password_hasher import PasswordHasher
+from .revocation_service import RevocationService
+from .token_version_service import TokenVersionService
 
 logger = logging.getLogger(__name__)
 
@@ -31,15 +41,94 @@ class UserAuthService:
     с системой логин + дискриминатор (в стиле Discord).
     """
     
-    def __init__(self, user_repo: UserRepository, jwt_service: JWTService):
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        jwt_service: JWTService,
+        user_cache: Optional[TTLCache] = None,
+        token_versions: Optional[TokenVersionService] = None,
+        revocations: Optional[RevocationService] = None,
+        password_hasher: Optional[PasswordHasher] = None
+    ):
         """Инициализирует сервис с зависимостями.
         
         Args:
             user_repo: Репозиторий пользователей
             jwt_service: Сервис для работы с JWT токенами
+            user_cache: Кэш пользователей по ID (None — без кэширования)
+            token_versions: Таблица версий токенов (None — без проверки версий)
+            revocations: Список отозванных токенов (None — без проверки отзыва)
+            password_hasher: Хэшер паролей (None — хэширование в текущем потоке)
         """
         self.user_repo = user_repo
         self.jwt_service = jwt_service
+        self.user_cache = user_cache if user_cache is not None else TTLCache(0, 0, name='users')
+        self.token_versions = token_versions
+        self.revocations = revocations
+        self.password_hasher = password_hasher if password_hasher is not None else PasswordHasher()
+        # Пользователи, чей хэш пересчитывается прямо сейчас
+        self._rehashing: set[int] = set()
+        self._rehash_lock = threading.Lock()
+        
+        # Смена пароля, ролей или удаление пользователя сбрасывает его запись
+        user_changed.connect(self._on_user_changed)
+        remote_tags_invalidated.connect(self._on_remote_tags)
+    
+    def _on_user_changed(self, sender, user_id: Optional[int] = None, **extra) -> None:
+        """Удаляет изменённого пользователя из кэша и сбрасывает страницы с ним."""
+        if user_id is not None:
+            self.user_cache.invalidate(user_id)
+            # Роли автора видны в списках постов
+            tags_invalidated.send(self, tags=(user_tag(user_id),))
+    
+    def _on_remote_tags(self, sender, tags: frozenset[str] = frozenset(), **extra) -> None:
+        """Удаляет из кэша пользователей, изменённых другим процессом.
+        
+        Теги дальше не отправляются: другие процессы их уже получили.
+        """
+        if ALL_TAGS in tags:
+            self.user_cache.clear()
+        for user_id in tag_ids(tags, 'user'):
+            self.user_cache.invalidate(user_id)
+    
+    def get_user_by_id(self, user_id: int) -> Optional[User]:
+        """Получает пользователя по ID через кэш.
+        
+        Args:
+            user_id: ID пользователя
+            
+        Returns:
+            Пользователь или None если не найден
+        """
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+        
+        user = self.user_repo.find_by_id(user_id)
+        if user is not None:
+            self.user_cache.set(user_id, user)
+        return user
+    
+    def _token_claims(self, user: User) -> dict:
+        """Формирует дополнительные claims токена для пользователя.
+        
+        При JWT_EMBED_CLAIMS логин, дискриминатор и роли подписываются
+        в токене, и запросы авторизованных пользователей обходятся без БД.
+        
+        Args:
+            user: Пользователь
+        
+        Returns:
+            Словарь claims для JWTService.generate_token
+        """
+        claims = {'ver': user.token_version}
+        if current_app.config.get('JWT_EMBED_CLAIMS', True):
+            claims.update(
+                login=user.login,
+                disc=user.discriminator,
+                roles=list(user.roles)
+            )
+        return claims
     
     def register_user(
         self, login: str, password: str, max_retries: int = 3
@@ -72,7 +161,7 @@ class UserAuthService:
             return False, "Пароль должен содержать минимум 6 символов", None
         
         # Хэшируем пароль (одинаков для всех попыток)
-        password_hash = generate_password_hash(password)
+        password_hash = self.password_hasher.hash(password)
         
         # Пытаемся создать пользователя с повторными попытками при коллизии
         last_error: str = ""
@@ -139,9 +228,10 @@ class UserAuthService:
             if not user:
                 return False, "Администратор не найден", None
             
-            if not check_password_hash(user.password_hash, password):
+            if not self.password_hasher.verify(user.password_hash, password):
                 return False, "Неверный пароль", None
             
+            self.rehash_if_needed(user, password)
             return True, "Аутентификация успешна", user
         
         if not discriminator:
@@ -151,11 +241,56 @@ class UserAuthService:
         if not user:
             return False, "Неверный логин, дискриминатор или пароль", None
         
-        if not check_password_hash(user.password_hash, password):
+        if not self.password_hasher.verify(user.password_hash, password):
             return False, "Неверный логин, дискриминатор или пароль", None
         
+        self.rehash_if_needed(user, password)
         return True, "Аутентификация успешна", user
     
+    def rehash_if_needed(self, user: User, password: str) -> bool:
+        """Пересчитывает устаревший хэш пароля в фоновом потоке.
+        
+        Вызывается только после успешной проверки пароля: открытый пароль
+        есть лишь в момент входа. Ответ пользователю не ждёт пересчёта.
+        
+        Args:
+            user: Пользователь, чей пароль только что проверен
+            password: Проверенный пароль
+            
+        Returns:
+            True если пересчёт запущен
+        """
+        if not self.password_hasher.needs_rehash(user.password_hash):
+            return False
+        
+        with self._rehash_lock:
+            if user.id in self._rehashing:
+                return False
+            self._rehashing.add(user.id)
+        
+        app = current_app._get_current_object()
+        thread = threading.Thread(
+            target=self._rehash,
+            args=(app, user.id, user.password_hash, password),
+            name=f'rehash-{user.id}',
+            daemon=True
+        )
+        thread.start()
+        return True
+    
+    def _rehash(self, app, user_id: int, old_hash: str, password: str) -> None:
+        """Вычисляет новый хэш и сохраняет его, не отзывая токены."""
+        try:
+            new_hash = self.password_hasher.hash(password)
+            with app.app_context():
+                if self.user_repo.update_password_hash(user_id, old_hash, new_hash):
+                    logger.info("Хэш пароля пересчитан: user_id=%s", user_id)
+        except Exception as e:
+            logger.warning("Не удалось пересчитать хэш пароля user_id=%s: %s", user_id, e)
+        finally:
+            with self._rehash_lock:
+                self._rehashing.discard(user_id)
+    
     def login_user(self, login: str, password: str, discriminator: Optional[str] = None, remember_me: bool = False) -> Tuple[bool, str, Optional[str]]:
         """Выполняет вход пользователя и возвращает JWT токен.
         
@@ -174,11 +309,7 @@ class UserAuthService:
         if not success or not user:
             return False, message, None
         
-        try:
-            token = self.jwt_service.generate_token(user.id, remember_me)
-            return True, "Вход выполнен успешно", token
-        except Exception as e:
-            return False, f"Ошибка при генерации токена: {e}", None
+        return self.issue_token(user, remember_me)
     
     def login_user_by_id(self, user_id: int, remember_me: bool = False) -> Tuple[bool, str, Optional[str]]:
         """Выполняет вход пользователя по ID и возвращает JWT токен.
@@ -198,8 +329,22 @@ class UserAuthService:
         if not user:
             return False, "Пользователь не найден", None
         
+        return self.issue_token(user, remember_me)
+    
+    def issue_token(self, user: User, remember_me: bool = False) -> Tuple[bool, str, Optional[str]]:
+        """Выдаёт JWT токен уже проверенному пользователю без запроса к БД.
+        
+        Args:
+            user: Пользователь, чей пароль проверен
+            remember_me: Запомнить пользователя на 30 дней
+            
+        Returns:
+            Кортеж (успех, сообщение, JWT токен)
+        """
         try:
-            token = self.jwt_service.generate_token(user.id, remember_me)
+            token = self.jwt_service.generate_token(
+                user.id, remember_me, self._token_claims(user)
+            )
             return True, "Вход выполнен успешно", token
         except Exception as e:
             return False, f"Ошибка при генерации токена: {e}", None
@@ -207,27 +352,83 @@ class UserAuthService:
     def get_user_by_token(self, token: str) -> Optional[User]:
         """Получает пользователя по JWT токену.
         
+        Повреждённый токен считается невалидным; ошибка БД записывается
+        в лог, остальные исключения не перехватываются.
+        
         Args:
             token: JWT токен
             
         Returns:
-            Пользователь или None если токен невалиден
+            Пользователь или None если токен невалиден или БД недоступна
         """
-        
         try:
             payload = self.jwt_service.verify_token(token)
             if not payload:
                 return None
             
-            user_id = payload.get('user_id')
-            if not user_id:
+            user_id = int(payload['user_id'])
+            issued_at = int(payload.get('iat', 0))
+        except (KeyError, TypeError, ValueError):
+            # Подпись верна, но поля не того типа, или токен не ASCII
+            return None
+        
+        try:
+            # Токен отозван выходом из системы
+            if self.revocations is not None and self.revocations.is_revoked(
+                user_id, issued_at
+            ):
                 return None
             
-            user = self.user_repo.find_by_id(user_id)
-            return user
-        except Exception as e:
+            version = payload.get('ver')
+            if version is not None and self.token_versions is not None:
+                # Токен отозван сменой пароля/ролей или пользователь удалён
+                if not self.token_versions.is_current(user_id, version):
+                    return None
+                
+                if 'login' in payload:
+                    return User.from_token_claims(payload)
+            
+            # Старые токены без версии и токены без claims — через БД
+            return self.get_user_by_id(user_id)
+        except sqlite3.Error as e:
+            logger.warning("Не удалось проверить токен user_id=%s: %s", user_id, e)
             return None
     
+    def revoke_token(self, token: str) -> bool:
+        """Отзывает токен до истечения его срока (выход из системы).
+        
+        Args:
+            token: JWT токен
+            
+        Returns:
+            True если токен отозван
+        """
+        if self.revocations is None:
+            return False
+        
+        payload = self.jwt_service.verify_token(token)
+        if not payload:
+            return False
+        
+        try:
+            return self.revocations.revoke(
+                payload['user_id'], payload.get('iat', 0), payload['exp']
+            )
+        except Exception as e:
+            logger.warning("Не удалось отозвать токен: %s", e)
+            return False
+    
+    def logout_everywhere(self, user_id: int) -> bool:
+        """Отзывает все токены пользователя на всех устройствах.
+        
+        Args:
+            user_id: ID пользователя
+            
+        Returns:
+            True если токены отозваны
+        """
+        return self.user_repo.bump_token_version(user_id)
+    
     def change_password(self, user_id: int, old_password: str, new_password: str) -> Tuple[bool, str]:
         """Изменяет пароль пользователя.
         
@@ -244,7 +445,7 @@ class UserAuthService:
             return False, "Пользователь не найден"
         
         # Проверяем старый пароль
-        if not check_password_hash(user.password_hash, old_password):
+        if not self.password_hasher.verify(user.password_hash, old_password):
             return False, "Неверный старый пароль"
         
         # Проверяем новый пароль
@@ -252,7 +453,7 @@ class UserAuthService:
             return False, "Новый пароль должен содержать минимум 6 символов"
         
         # Обновляем пароль
-        password_hash = generate_password_hash(new_password)
+        password_hash = self.password_hasher.hash(new_password)
         success = self.user_repo.update_password(user_id, password_hash)
         
         if success:
@@ -0,0 +1,32 @@
+"""Сигналы об изменении данных.
+
+Применяемые паттерны:
+- Observer (Наблюдатель) — кэши подписываются на изменения сущностей
+- Publish/Subscribe — репозитории публикуют события, не зная о подписчиках
+
+Применяемые принципы:
+- Single Responsibility — репозитории не знают о кэшах
+- Explicit is better than implicit — каждое событие несёт ID сущности
+
+Сигналы отправляются репозиториями после успешной записи в БД:
+- post_changed(sender, post_id) — пост создан, изменён или удалён
+- comment_changed(sender, post_id, comment_id) — комментарий поста изменился
+- user_changed(sender, user_id) — пароль, роли или сам пользователь изменились
+
+Сервисы после записи отправляют суррогатные ключи изменённых сущностей:
+- tags_invalidated(sender, tags) — теги вида 'post:42', 'user:7', 'listing:posts'
+
+Кэш страниц пересылает теги, сброшенные другим процессом (см. InvalidationLog):
+- remote_tags_invalidated(sender, tags) — кэши процесса сбрасывают свои записи
+  этих сущностей, но сами сигналы о записи не отправляют
+"""
+
+from blinker import Namespace
+
+_signals = Namespace()
+
+post_changed = _signals.signal('post-changed')
+comment_changed = _signals.signal('comment-changed')
+user_changed = _signals.signal('user-changed')
+tags_invalidated = _signals.signal('tags-invalidated')
+remote_tags_invalidated = _signals.signal('remote-tags-invalidated')
@@ -12,20 +12,34 @@
 """
 
 from flask import Blueprint, current_app, redirect, render_template, request, url_for
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
-from werkzeug.security import check_password_hash
-
-from ..auth import set_auth_cookie
-from ..services.login_attempt_service import LoginAttemptService
+from ..auth import get_current_user, login_required, set_auth_cookie
+from ..ratelimit import approximate_mode, check_approximate_limit, limiter
+from ..services.password_hasher import PasswordHasherBusy
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
-limiter = Limiter(key_func=get_remote_address)
-login_attempt_service = LoginAttemptService()
+auth_bp.before_request(check_approximate_limit)
+
+
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    """Отвечает 503, когда пул хэширования паролей перегружен."""
+    templates = {
+        'auth.register': 'auth/register.html',
+        'auth.select_account': 'auth/select_account.html',
+    }
+    template = templates.get(request.endpoint, 'auth/login.html')
+    
+    from flask import session
+    return render_template(
+        template,
+        login=request.form.get('login', session.get('login_input', '')),
+        accounts=session.get('available_accounts', []),
+        error='Сервер перегружен, попробуйте ещё раз через несколько секунд'
+    ), 503
 
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
-@limiter.limit("5 per hour")
+@limiter.limit(lambda: current_app.config['RATELIMIT_REGISTER'], exempt_when=approximate_mode)
 def register():
     """Регистрация нового пользователя."""
     if request.method == 'GET':
@@ -91,7 +105,7 @@ def register():
 
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
-@limiter.limit("10 per minute")
+@limiter.limit(lambda: current_app.config['RATELIMIT_LOGIN'], exempt_when=approximate_mode)
 def login():
     """Вход пользователя."""
     if request.method == 'GET':
@@ -113,252 +127,75 @@ def login():
     if not password:
         return render_template('auth/login.html', error='Пароль обязателен')
     
-    # Проверка защиты от bruteforce
-    ip_address = request.remote_addr or 'unknown'
+    # Один запрос к БД: аккаунты, блокировки и счётчик попыток (защита от bruteforce)
+    discriminator, account_ids = _saved_account_hints(login_input)
+    decision = current_app.login_resolver.resolve(
+        login_input,
+        password,
+        request.remote_addr or 'unknown',
+        discriminator=discriminator,
+        account_ids=account_ids
+    )
     
-    # Сначала проверяем, не превысит ли текущая попытка лимит
-    if login_attempt_service.will_exceed_max_attempts(ip_address, login_input):
-        return render_template('auth/login.html', 
+    if not decision.success:
+        return render_template('auth/login.html',
                              login=login_input,
-                             error=f"Слишком много неудачных попыток. Попробуйте позже.")
-    
-    # Проверяем блокировку аккаунта (если известен user_id)
-    # Это будет проверено позже после поиска пользователя
-    
-    # Всегда используем полный логин из cookies для авторизации
-    last_full_login = request.cookies.get('last_full_login')
-    if last_full_login and '#' in last_full_login:
-        parts = last_full_login.split('#')
-        if len(parts) == 2:
-            stored_login = parts[0].strip()
-            discriminator = parts[1].strip()
-            
-            # Проверяем, что логин совпадает с введенным
-            if stored_login != login_input:
-                # Если логины не совпадают, ищем все аккаунты пользователя
-                from ..repositories import UserRepository
-                user_repo = UserRepository()
-                users = user_repo.find_by_login(login_input)
-                
-                if not users:
-                    return render_template('auth/login.html', 
-                                         login=login_input,
-                                         error='Пользователь не найден. Пройдите регистрацию.')
-                
-                # Ищем аккаунт с правильным паролем
-                authenticated_users = []
-                for user in users:
-                    success, message, token = current_app.auth_service.login_user(
-                        user.login, password, user.discriminator, remember_me=False
-                    )
-                    if success and token:
-                        authenticated_users.append({
-                            'user': user,
-                            'token': token
-                        })
-                
-                if not authenticated_users:
-                    return render_template('auth/login.html', 
-                                         login=login_input,
-                                         error='Неверный пароль')
-                
-                # Если найден только один аккаунт, входим в него
-                if len(authenticated_users) == 1:
-                    auth_info = authenticated_users[0]
-                    response = _complete_login(auth_info['user'], auth_info['token'], remember_me)
-                    
-                    # Обновляем информацию об аккаунтах
-                    _update_user_accounts(response, authenticated_users)
-                    return response
-                
-                # Если аккаунтов несколько, сохраняем информацию и просим выбрать
-                # TODO: добавить страницу выбора аккаунтов
-                # Временно выбираем первый
-                auth_info = authenticated_users[0]
-                response = _complete_login(auth_info['user'], auth_info['token'], remember_me)
-                
-                # Сохраняем информацию обо всех аккаунтах
-                _update_user_accounts(response, authenticated_users)
-                return response
-            
-            # Логины совпадают, используем сохраненный аккаунт
-            from ..repositories import UserRepository
-            user_repo = UserRepository()
-            user = user_repo.find_by_login_and_discriminator(stored_login, discriminator)
-            
-            if not user:
-                return render_template('auth/login.html', 
-                                     error='Сохранённый аккаунт не найден. Пройдите регистрацию.')
-            
-            # Пробуем войти
-            success, message, token = current_app.auth_service.login_user(
-                stored_login, password, discriminator, remember_me
-            )
-            
-            if success and token:
-                # Записываем успешную попытку входа
-                login_attempt_service.record_login_attempt(ip_address, login_input, True)
-                
-                return _complete_login(user, token, remember_me)
-            else:
-                # Записываем неудачную попытку входа
-                login_attempt_service.record_login_attempt(ip_address, login_input, False)
-                
-                return render_template('auth/login.html', 
-                                     login=login_input,
-                                     error='Неверный пароль')
-    
-    # Проверяем cookies на наличие сохраненных аккаунтов
-    user_accounts_cookie = request.cookies.get('user_accounts')
+                             error=decision.message)
+    
+    # Пароль подошёл к нескольким аккаунтам — просим выбрать
+    if decision.status == decision.CHOOSE:
+        from flask import session
+        session['available_accounts'] = [
+            {'user_id': user.id, 'full_login': f"{user.login}#{user.discriminator}"}
+            for user in decision.accounts
+        ]
+        session['login_input'] = login_input
+        session['remember_me'] = remember_me
+        session['password'] = password  # Сохраняем пароль для проверки
+        
+        return redirect(url_for('auth.select_account'))
+    
+    user = decision.user
+    token_success, token_message, token = current_app.auth_service.issue_token(
+        user, remember_me
+    )
+    if not token_success or not token:
+        return render_template('auth/login.html',
+                             login=login_input,
+                             error='Ошибка при входе')
     
+    response = _complete_login(user, token, remember_me)
+    # Сохраняем информацию об аккаунтах
+    _update_user_accounts(response, [{'user': user, 'token': token}])
+    return response
+
+
+def _saved_account_hints(login_input: str):
+    """Разбирает cookies с сохранёнными аккаунтами для введённого логина.
+    
+    Returns:
+        Кортеж (дискриминатор последнего аккаунта, ID сохранённых аккаунтов)
+    """
+    discriminator = None
+    last_full_login = request.cookies.get('last_full_login', '')
+    stored_login, sep, stored_discriminator = last_full_login.partition('#')
+    if sep and stored_login.strip() == login_input:
+        discriminator = stored_discriminator.strip()
+    
+    account_ids = []
+    user_accounts_cookie = request.cookies.get('user_accounts')
     if user_accounts_cookie:
-        # Если есть сохраненные аккаунты в cookies, проверяем их
         import json
         try:
-            saved_accounts = json.loads(user_accounts_cookie)
-            
-            # Фильтруем аккаунты с тем же логином
-            matching_accounts = [acc for acc in saved_accounts if acc['full_login'].startswith(login_input + '#')]
-            
-            if len(matching_accounts) > 1:
-                # Если несколько аккаунтов с тем же логином, показываем страницу выбора из cookies
-                from flask import session
-                session['available_accounts'] = matching_accounts
-                session['login_input'] = login_input
-                session['remember_me'] = remember_me
-                session['password'] = password  # Сохраняем пароль для проверки
-                
-                return redirect(url_for('auth.select_account'))
-            
-            elif len(matching_accounts) == 1:
-                # Если один аккаунт, пробуем войти в него
-                account = matching_accounts[0]
-                from ..repositories import UserRepository
-                user_repo = UserRepository()
-                user = user_repo.find_by_id(account['user_id'])
-                
-                if user and check_password_hash(user.password_hash, password):
-                    # Пароль совпадает, входим
-                    token_success, token_message, token = current_app.auth_service.login_user_by_id(
-                        user.id, remember_me
-                    )
-                    
-                    if token_success and token:
-                        # Записываем успешную попытку входа
-                        login_attempt_service.record_login_attempt(ip_address, login_input, True)
-                        
-                        response = _complete_login(user, token, remember_me)
-                        # Обновляем cookies с аккаунтами
-                        _update_user_accounts_from_session(response, saved_accounts)
-                        return response
-                    else:
-                        # Записываем неудачную попытку входа
-                        login_attempt_service.record_login_attempt(ip_address, login_input, False)
-                        
-                        return render_template('auth/login.html', 
-                                             login=login_input,
-                                             error='Неверный пароль')
-        except (json.JSONDecodeError, KeyError):
-            # Если cookies повреждены, игнорируем их и ищем в базе данных
+            account_ids = [
+                int(acc['user_id']) for acc in json.loads(user_accounts_cookie)
+                if acc['full_login'].startswith(login_input + '#')
+            ]
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            # Если cookies повреждены, игнорируем их
             pass
     
-    # Если нет подходящих аккаунтов в cookies или cookies отсутствуют, ищем в базе данных
-    from ..repositories import UserRepository
-    user_repo = UserRepository()
-    users = user_repo.find_by_login(login_input)
-    
-    if not users:
-        # Записываем неудачную попытку входа (пользователь не найден)
-        login_attempt_service.record_login_attempt(ip_address, login_input, False)
-        
-        return render_template('auth/login.html', 
-                             login=login_input,
-                             error='Пользователь не найден. Пройдите регистрацию.')
-    
-    if len(users) == 1:
-        # Если пользователь один, входим в него и сохраняем полный логин
-        user = users[0]
-        success, message, token = current_app.auth_service.login_user(
-            user.login, password, user.discriminator, remember_me
-        )
-        
-        if success and token:
-            # Записываем успешную попытку входа
-            login_attempt_service.record_login_attempt(ip_address, login_input, True)
-            
-            response = _complete_login(user, token, remember_me)
-            # Сохраняем информацию об аккаунтах
-            _update_user_accounts(response, [{'user': user, 'token': token}])
-            return response
-        else:
-            # Записываем неудачную попытку входа
-            login_attempt_service.record_login_attempt(ip_address, login_input, False)
-            
-            # Проверяем, нужно ли заблокировать аккаунт
-            failed_attempts = login_attempt_service.get_failed_attempts_count(ip_address, login_input)
-            if failed_attempts >= login_attempt_service.max_attempts:
-                login_attempt_service.lock_account(user.id)
-            
-            return render_template('auth/login.html', 
-                                 login=login_input,
-                                 error='Неверный пароль')
-    else:
-        # Если пользователей несколько, проверяем пароль для каждого
-        authenticated_users = []
-        for user in users:
-            if check_password_hash(user.password_hash, password):
-                # Пароль подходит, добавляем в список
-                authenticated_users.append({
-                    'user': user,
-                    'token': None  # Токен будет сгенерирован позже
-                })
-        
-        if not authenticated_users:
-            # Записываем неудачную попытку входа (пароль неверный)
-            login_attempt_service.record_login_attempt(ip_address, login_input, False)
-            
-            return render_template('auth/login.html', 
-                                 login=login_input,
-                                 error='Неверный пароль')
-        
-        # Если найдено несколько аккаунтов, показываем страницу выбора
-        if len(authenticated_users) > 1:
-            # Сохраняем информацию об аккаунтах в session для страницы выбора
-            from flask import session
-            accounts_info = []
-            for auth_info in authenticated_users:
-                accounts_info.append({
-                    'user_id': auth_info['user'].id,
-                    'full_login': f"{auth_info['user'].login}#{auth_info['user'].discriminator}"
-                })
-            session['available_accounts'] = accounts_info
-            session['login_input'] = login_input
-            session['remember_me'] = remember_me
-            session['password'] = password  # Сохраняем пароль для проверки
-            
-            return redirect(url_for('auth.select_account'))
-        
-        # Если аккаунт только один, входим в него
-        auth_info = authenticated_users[0]
-        token_success, token_message, token = current_app.auth_service.login_user_by_id(
-            auth_info['user'].id, remember_me
-        )
-        
-        if token_success and token:
-            # Записываем успешную попытку входа
-            login_attempt_service.record_login_attempt(ip_address, login_input, True)
-            
-            response = _complete_login(auth_info['user'], token, remember_me)
-            # Сохраняем информацию об аккаунтах
-            _update_user_accounts(response, [{'user': auth_info['user'], 'token': token}])
-            return response
-        else:
-            # Записываем неудачную попытку входа
-            login_attempt_service.record_login_attempt(ip_address, login_input, False)
-            
-            return render_template('auth/login.html', 
-                                 login=login_input,
-                                 error='Ошибка при входе')
+    return discriminator, account_ids
 
 
 def _update_user_accounts(response, authenticated_users):
@@ -447,9 +284,7 @@ def select_account():
                              error='Не выбран аккаунт')
     
     # Находим выбранного пользователя
-    from ..repositories import UserRepository
-    user_repo = UserRepository()
-    user = user_repo.find_by_id(int(user_id))
+    user = current_app.user_repo.find_by_id(int(user_id))
     
     if not user:
         return render_template('auth/select_account.html', 
@@ -459,12 +294,16 @@ def select_account():
     
     # Проверяем пароль
     password = session.get('password', '')
-    if not password or not check_password_hash(user.password_hash, password):
+    if not password or not current_app.auth_service.password_hasher.verify(
+        user.password_hash, password
+    ):
         return render_template('auth/select_account.html', 
                              accounts=session.get('available_accounts', []),
                              login=session.get('login_input', ''),
                              error='Неверный пароль')
     
+    current_app.auth_service.rehash_if_needed(user, password)
+    
     # Генерируем токен для выбранного пользователя
     remember_me = session.get('remember_me', False)
     token_success, token_message, token = current_app.auth_service.login_user_by_id(
@@ -502,6 +341,24 @@ def select_account():
 @auth_bp.route('/logout')
 def logout():
     """Выход пользователя."""
+    # Отзываем токен: украденная копия cookie перестанет работать
+    token = request.cookies.get('auth_token')
+    if token:
+        current_app.auth_service.revoke_token(token)
+    
+    return _logout_response()
+
+
+@auth_bp.route('/logout-all', methods=['POST'])
+@login_required
+def logout_all():
+    """Выход пользователя на всех устройствах."""
+    current_app.auth_service.logout_everywhere(get_current_user().id)
+    return _logout_response()
+
+
+def _logout_response():
+    """Создаёт ответ выхода с удалением cookies авторизации."""
     response = redirect(url_for('auth.login'))
     from ..auth import clear_auth_cookie
     clear_auth_cookie(response)
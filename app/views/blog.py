@@ -14,24 +14,44 @@
 from flask import Blueprint, current_app, redirect, render_template, request, url_for
 
 from ..auth import get_current_user, is_authenticated, login_required
+from ..cache.tags import POSTS_LISTING, post_tag, user_tag
+from ..page_cache import add_surrogate_keys, cache_page, error_page
 
 blog_bp = Blueprint('blog', __name__)
 
+POSTS_PER_PAGE = 10
+
+
+def _tag_listing(posts) -> None:
+    """Отмечает страницу списка тегами показанных постов и их авторов."""
+    add_surrogate_keys(POSTS_LISTING)
+    for post in posts:
+        add_surrogate_keys(post_tag(post.id), user_tag(post.user_id))
+
 
 @blog_bp.route('/')
+@cache_page
 def index():
     """Главная страница с постами, сгруппированными по пользователям."""
     posts = current_app.post_service.get_posts_grouped_by_users(limit_per_user=3)
-    return render_template('blog/index.html', posts=posts)
+    _tag_listing(posts)
+    
+    # Посты одного автора идут подряд в порядке первого появления автора
+    posts_by_user: dict[int, list] = {}
+    for post in posts:
+        posts_by_user.setdefault(post.user_id, []).append(post)
+    return render_template('blog/index.html', posts_by_user=list(posts_by_user.values()))
 
 
 @blog_bp.route('/posts')
+@cache_page
 def posts():
     """Страница со всеми постами с пагинацией."""
     page = request.args.get('page', 1, type=int)
-    per_page = 10
+    per_page = POSTS_PER_PAGE
     
     posts, total = current_app.post_service.get_all_posts(page=page, per_page=per_page)
+    _tag_listing(posts)
     
     # Рассчитываем пагинацию
     total_pages = (total + per_page - 1) // per_page
@@ -49,16 +69,20 @@ def posts():
 
 
 @blog_bp.route('/post/<int:post_id>')
+@cache_page
 def view_post(post_id):
     """Просмотр отдельного поста с комментариями."""
     post = current_app.post_service.get_post_by_id(post_id)
     
     if not post:
-        return render_template('errors/404.html'), 404
+        return error_page(404)
     
     comments = current_app.comment_service.get_post_comments(post_id)
     comments_count = current_app.comment_service.get_post_comments_count(post_id)
     
+    add_surrogate_keys(post_tag(post_id), user_tag(post.user_id))
+    add_surrogate_keys(*(user_tag(comment.user_id) for comment in comments))
+    
     return render_template('blog/post_detail.html', 
                          post=post,
                          comments=comments,
@@ -98,7 +122,7 @@ def edit_post(post_id):
     post = current_app.post_service.get_post_by_id(post_id)
     
     if not post:
-        return render_template('errors/404.html'), 404
+        return error_page(404)
     
     # Проверяем права на редактирование
     current_user = get_current_user()
@@ -137,7 +161,7 @@ def delete_post(post_id):
     post = current_app.post_service.get_post_by_id(post_id)
     
     if not post:
-        return render_template('errors/404.html'), 404
+        return error_page(404)
     
     # Проверяем права на удаление
     current_user = get_current_user()
@@ -164,7 +188,7 @@ def add_comment(post_id):
     post = current_app.post_service.get_post_by_id(post_id)
     
     if not post:
-        return render_template('errors/404.html'), 404
+        return error_page(404)
     
     body = request.form.get('body', '').strip()
     
@@ -196,7 +220,7 @@ def edit_comment(comment_id):
     comment = current_app.comment_service.get_comment_by_id(comment_id)
     
     if not comment:
-        return render_template('errors/404.html'), 404
+        return error_page(404)
     
     # Проверяем права на редактирование
     current_user = get_current_user()
@@ -232,7 +256,7 @@ def delete_comment(comment_id):
     comment = current_app.comment_service.get_comment_by_id(comment_id)
     
     if not comment:
-        return render_template('errors/404.html'), 404
+        return error_page(404)
     
     # Проверяем права на удаление
     current_user = get_current_user()
@@ -0,0 +1,139 @@
+"""Прогрев кэшей при старте воркера и после деплоя.
+
+Применяемые паттерны:
+- Cache Warming — последние посты, их авторы, шаблоны и публичные
+  страницы загружаются до первого запроса
+- Report — время и покрытие прогрева возвращаются отчётом WarmupReport
+
+Применяемые принципы:
+- Fail open — ошибка одного шага записывается в отчёт и не мешает
+  воркеру стартовать
+- Explicit is better than implicit — прогрев при старте включается
+  конфигурацией WARMUP_ON_STARTUP, вручную — командой `flask warm`
+
+Страницы рендерятся через обработчики без before/after_request хуков:
+прогрев не расходует лимиты запросов и не выдаёт CSRF cookie, а
+запрос без cookie попадает в кэш страниц как анонимный.
+"""
+
+import math
+import time
+from dataclasses import dataclass, field
+
+from flask import Flask
+
+from .views.blog import POSTS_PER_PAGE
+
+
+@dataclass(slots=True)
+class WarmupReport:
+    """Время и покрытие прогрева."""
+    
+    seconds: float = 0.0
+    templates: int = 0
+    templates_total: int = 0
+    posts: int = 0
+    posts_total: int = 0
+    authors: int = 0
+    filters: int = 0
+    pages: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    
+    @property
+    def post_coverage(self) -> float:
+        """Доля постов, загруженных в кэш."""
+        return self.posts / self.posts_total if self.posts_total else 1.0
+    
+    def summary(self) -> str:
+        """Однострочное описание для лога."""
+        return (
+            f"Прогрев за {self.seconds * 1000:.0f} мс: "
+            f"шаблоны {self.templates}/{self.templates_total}, "
+            f"посты {self.posts}/{self.posts_total} ({self.post_coverage:.0%}), "
+            f"авторы {self.authors}, фильтры {self.filters}, "
+            f"страницы {len(self.pages)}, ошибки {len(self.errors)}"
+        )
+
+
+def _compile_templates(app: Flask, report: WarmupReport) -> None:
+    """Компилирует все шаблоны в кэш Jinja."""
+    names = app.jinja_env.list_templates()
+    report.templates_total = len(names)
+    for name in names:
+        try:
+            app.jinja_env.get_template(name)
+            report.templates += 1
+        except Exception as e:
+            report.errors.append(f"template {name}: {e}")
+
+
+def _load_posts(app: Flask, report: WarmupReport, recent_posts: int) -> None:
+    """Загружает последние посты в кэш, их авторов — в кэш пользователей."""
+    report.posts_total = app.post_repo.count_posts()
+    if recent_posts <= 0:
+        return
+    
+    posts = app.post_service.warm_cache(recent_posts)
+    report.posts = len(posts)
+    for user_id in {post.user_id for post in posts}:
+        if app.auth_service.get_user_by_id(user_id) is not None:
+            report.authors += 1
+
+
+def _build_filters(app: Flask, report: WarmupReport) -> None:
+    """Строит фильтры существующих ID, чтобы первый запрос их не ждал."""
+    for negative in (app.post_service.missing_posts, app.comment_service.missing_comments):
+        if negative.rebuild():
+            report.filters += 1
+
+
+def _render_pages(app: Flask, report: WarmupReport, listing_pages: int) -> None:
+    """Рендерит главную и первые страницы списка постов в кэш страниц."""
+    total_pages = max(1, math.ceil(report.posts_total / POSTS_PER_PAGE))
+    paths = ['/'] + [
+        '/posts' if page == 1 else f'/posts?page={page}'
+        for page in range(1, min(listing_pages, total_pages) + 1)
+    ]
+    
+    for path in paths:
+        try:
+            with app.test_request_context(path):
+                response = app.make_response(app.dispatch_request())
+        except Exception as e:
+            report.errors.append(f"page {path}: {e}")
+            continue
+        if response.status_code == 200:
+            report.pages.append(path)
+        else:
+            report.errors.append(f"page {path}: HTTP {response.status_code}")
+
+
+def warm_up(app: Flask, recent_posts: int = 50, listing_pages: int = 3) -> WarmupReport:
+    """Прогревает кэши приложения.
+    
+    Args:
+        app: Flask приложение
+        recent_posts: Сколько последних постов загрузить в кэш постов
+        listing_pages: Сколько первых страниц списка постов отрендерить
+    
+    Returns:
+        Отчёт о прогреве
+    """
+    report = WarmupReport()
+    started = time.perf_counter()
+    
+    _compile_templates(app, report)
+    with app.app_context():
+        steps = (
+            ('posts', lambda: _load_posts(app, report, recent_posts)),
+            ('filters', lambda: _build_filters(app, report)),
+            ('pages', lambda: _render_pages(app, report, listing_pages)),
+        )
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                report.errors.append(f"{name}: {e}")
+    
+    report.seconds = time.perf_counter() - started
+    return report
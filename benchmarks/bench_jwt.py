@@ -0,0 +1,106 @@
+"""Бенчмарк проверки JWT токенов.
+
+Сравнивает варианты verify_token на одном ядре:
+- legacy — проверка до появления кэша проверенных токенов
+- json   — текущий JWTService с JSON токеном, кэш выключен
+- binary — двоичный токен (JWT_TOKEN_FORMAT = 'binary'), кэш выключен
+- cached — повторная проверка того же токена через кэш проверенных токенов
+
+Двоичный формат выигрывает в длине cookie (64 символа против 180), а
+не в скорости: проверка подписи занимает столько же, сколько у JSON,
+и на одном ядре binary даёт x1.0–1.4 к legacy в зависимости от шума.
+Кратный прирост проверок в секунду даёт только кэш (cached): json
+без кэша считает тот же HMAC, что и legacy, и идёт вровень с ним.
+
+Запуск:
+    python benchmarks/bench_jwt.py [--count 200000]
+"""
+
+import argparse
+import base64
+import hmac
+import json
+import os
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, current_app  # noqa: E402
+
+from app.cache import TTLCache  # noqa: E402
+from app.services.jwt_service import JWTService  # noqa: E402
+
+
+class LegacyJWTService(JWTService):
+    """Проверка подписи в том виде, в каком она была до кэширования ключа."""
+
+    def _create_signature(self, payload, key=None):
+        secret_key = current_app.config.get('SECRET_KEY', 'default-secret')
+        signature = hmac.new(
+            secret_key.encode('utf-8'),
+            payload.encode('utf-8'),
+            self.ALGORITHMS[self.ALGORITHM]
+        ).digest()
+        return base64.urlsafe_b64encode(signature).decode('utf-8').rstrip('=')
+
+    def verify_token(self, token):
+        parts = token.split('.')
+        if len(parts) != 2:
+            return None
+        payload, signature = parts
+        if not hmac.compare_digest(signature, self._create_signature(payload)):
+            return None
+        try:
+            payload_data = json.loads(
+                base64.urlsafe_b64decode(self._add_padding(payload)).decode('utf-8')
+            )
+        except Exception:
+            return None
+        if int(time.time()) > payload_data.get('exp', 0):
+            return None
+        return payload_data
+
+
+def measure(verify: Callable[[str], object], token: str, count: int) -> float:
+    """Возвращает количество проверок в секунду."""
+    assert verify(token) is not None
+    started = time.perf_counter()
+    for _ in range(count):
+        verify(token)
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200_000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark-secret-key-' + 'x' * 43
+    with app.app_context():
+        claims = {'ver': 3, 'login': 'user', 'disc': '0042', 'roles': ['user']}
+        token = JWTService().generate_token(42, claims=claims)
+        app.config['JWT_TOKEN_FORMAT'] = 'binary'
+        binary_token = JWTService().generate_token(42, claims=claims)
+
+        print(f"Проверок: {args.count}")
+        print(f"{'вариант':<10}{'проверок/с':>14}{'длина токена':>16}")
+        baseline = None
+        for name, service, sample in (
+            ('legacy', LegacyJWTService(), token),
+            ('json', JWTService(), token),
+            ('binary', JWTService(), binary_token),
+            ('cached', JWTService(TTLCache(1024, 300, name='jwt')), token),
+        ):
+            rate = measure(service.verify_token, sample, args.count)
+            baseline = baseline or rate
+            print(
+                f"{name:<10}{rate:>14,.0f}{len(sample):>16}"
+                f"   (x{rate / baseline:.2f} к legacy)"
+            )
+
+
+if __name__ == '__main__':
+    main()
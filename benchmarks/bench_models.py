@@ -0,0 +1,140 @@
+"""Бенчмарк памяти и скорости создания моделей постов.
+
+Сравнивает три варианта модели на 100 000 постов:
+- legacy  — обычный @dataclass с __dict__ и собственным списком ролей
+- slots   — текущая модель Post (__slots__, общий кортеж ролей)
+- compact — CompactPost (frozen, __slots__, общий объект автора)
+
+Запуск:
+    python benchmarks/bench_models.py [--count 100000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.authors import intern_roles, shared_author  # noqa: E402
+from app.models.posts import CompactPost, Post  # noqa: E402
+
+
+@dataclass
+class LegacyPost:
+    """Модель поста в том виде, в каком она была до перехода на __slots__."""
+    id: int
+    user_id: int
+    title: str
+    body: str
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
+    author_login: Optional[str] = None
+    author_discriminator: Optional[str] = None
+    author_roles: Optional[list[str]] = None
+
+
+AUTHORS = 50
+TITLE = 'Заголовок поста'
+BODY = 'Содержание поста ' * 20
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _rows(count: int) -> list[tuple]:
+    """Готовит строки «как из БД» заранее, чтобы не мерить их создание."""
+    rows = []
+    for i in range(count):
+        author = i % AUTHORS
+        rows.append((
+            i, author, TITLE, BODY,
+            BASE_TIME + timedelta(seconds=i),
+            f'user{author}', f'{author:04d}',
+            'admin,common' if author == 0 else 'common',
+        ))
+    return rows
+
+
+def build_legacy(rows: list[tuple]) -> list:
+    """Создаёт посты старой модели."""
+    return [
+        LegacyPost(
+            id=r[0], user_id=r[1], title=r[2], body=r[3], created_at=r[4],
+            author_login=r[5], author_discriminator=r[6],
+            author_roles=r[7].split(',')
+        )
+        for r in rows
+    ]
+
+
+def build_slots(rows: list[tuple]) -> list:
+    """Создаёт посты модели Post."""
+    return [
+        Post(
+            id=r[0], user_id=r[1], title=r[2], body=r[3], created_at=r[4],
+            author_login=r[5], author_discriminator=r[6],
+            author_roles=intern_roles(r[7])
+        )
+        for r in rows
+    ]
+
+
+def build_compact(rows: list[tuple]) -> list:
+    """Создаёт посты модели CompactPost."""
+    return [
+        CompactPost(
+            id=r[0], user_id=r[1], title=r[2], body=r[3], created_at=r[4],
+            author=shared_author(r[5], r[6], r[7])
+        )
+        for r in rows
+    ]
+
+
+def measure(builder: Callable[[list[tuple]], list], rows: list[tuple]) -> tuple[float, float]:
+    """Возвращает (байт на экземпляр, секунд на создание всех экземпляров)."""
+    # Время меряем без tracemalloc: трассировка сильно замедляет аллокации
+    gc.collect()
+    started = time.perf_counter()
+    objects = builder(rows)
+    elapsed = time.perf_counter() - started
+    del objects
+
+    gc.collect()
+    tracemalloc.start()
+    objects = builder(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_instance = current / len(objects)
+    del objects
+    return per_instance, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = _rows(args.count)
+    print(f"Постов: {args.count}, авторов: {AUTHORS}")
+    print(f"{'вариант':<10}{'байт/пост':>12}{'создание, мс':>16}")
+
+    baseline = None
+    for name, builder in (
+        ('legacy', build_legacy),
+        ('slots', build_slots),
+        ('compact', build_compact),
+    ):
+        per_instance, elapsed = measure(builder, rows)
+        baseline = baseline or per_instance
+        print(
+            f"{name:<10}{per_instance:>12.1f}{elapsed * 1000:>16.1f}"
+            f"   (x{baseline / per_instance:.2f} к legacy)"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,7 @@
 
 import os
 import tempfile
+import threading
 import unittest
 from typing import Any
 
@@ -60,6 +61,67 @@ class BaseTestCase(unittest.TestCase):
         self.app_context.pop()
 
 
+def migrate_database(db_path: str) -> None:
+    """Применяет миграции приложения к файлу БД."""
+    from app.migrations import migration_runner
+    
+    runner = migration_runner.MigrationRunner(db_path)
+    runner.migrations_dir = os.path.dirname(os.path.abspath(migration_runner.__file__))
+    runner.generate_schema = lambda: True
+    if not runner.migrate_up():
+        raise RuntimeError(f"Не удалось применить миграции к {db_path}")
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Базовый класс тестов с файловой БД и применёнными миграциями.
+    
+    В отличие от sqlite:///:memory: все подключения видят одну базу.
+    Подклассы дополняют конфигурацию через config_overrides.
+    """
+    
+    config_overrides: dict[str, Any] = {}
+    
+    def setUp(self) -> None:
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        migrate_database(self.db_path)
+        self.apps = []
+        self.app = self.make_app()
+        self.client = self.app.test_client()
+    
+    def tearDown(self) -> None:
+        from app.signals import tags_invalidated
+        
+        # Сигнал общий для процесса: кэши прошлых тестов не должны писать в журнал
+        for app in self.apps:
+            tags_invalidated.disconnect(app.page_cache.invalidate_tags)
+        for suffix in ('', '-invalidations'):
+            if os.path.exists(self.db_path + suffix):
+                os.unlink(self.db_path + suffix)
+    
+    def make_app(self, **overrides: Any):
+        """Создаёт приложение с этой БД и настройками теста."""
+        config = type(f'{type(self).__name__}Config', (TestConfig,), {
+            'DATABASE_URL': f'sqlite:///{self.db_path}',
+            **self.config_overrides,
+            **overrides,
+        })
+        app = create_app(config)
+        self.apps.append(app)
+        return app
+    
+    def csrf_token(self, path: str) -> str:
+        """Возвращает CSRF токен из формы на странице."""
+        import re
+        
+        html = self.client.get(path).get_data(as_text=True)
+        # Закомментированное поле форма не отправляет
+        html = re.sub(r'<!--.*?-->', '', html, flags=re.DOTALL)
+        match = re.search(r'name="csrf_token" value="([^"]+)"', html)
+        self.assertIsNotNone(match, f"На странице {path} нет поля csrf_token")
+        return match.group(1)
+
+
 class TestAuth(BaseTestCase):
     """Тесты авторизации."""
     
@@ -134,6 +196,27 @@ class TestAuth(BaseTestCase):
         self.assertIn('auth_token=;', response.headers.get('Set-Cookie', ''))
 
 
+class TestAuthContext(BaseTestCase):
+    """Тесты ленивого контекста авторизации."""
+    
+    def test_token_is_verified_lazily_once_per_request(self) -> None:
+        """Токен проверяется только при обращении и не более одного раза."""
+        from flask import render_template_string
+        from app.auth import get_current_user
+        
+        calls = []
+        self.app.auth_service.get_user_by_token = lambda token: calls.append(token)
+        
+        with self.app.test_request_context('/', headers={'Cookie': 'auth_token=abc'}):
+            self.app.preprocess_request()
+            render_template_string('{{ 1 }}')
+            self.assertEqual(calls, [])
+            
+            render_template_string('{% if current_user %}{% endif %}')
+            get_current_user()
+            self.assertEqual(calls, ['abc'])
+
+
 class TestBlog(BaseTestCase):
     """Тесты функциональности блога."""
     
@@ -223,8 +306,9 @@ class TestCSRF(BaseTestCase):
             self.assertIsNotNone(token)
             self.assertGreater(len(token), 10)
             
-            # Проверяем, что токен сохраняется в сессии
-            self.assertIn('csrf_token', token)
+            # Токен не сохраняется в сессии (stateless)
+            from flask import session
+            self.assertNotIn('csrf_token', session)
     
     def test_csrf_token_verification(self) -> None:
         """Тест проверки CSRF токена."""
@@ -282,6 +366,1500 @@ class TestJWT(BaseTestCase):
             payload = jwt_service.verify_token('invalid.jwt.token')
             
             self.assertIsNone(payload)
+    
+    def test_get_user_by_token_hides_only_token_errors(self) -> None:
+        """Повреждённый токен — не пользователь, ошибка в коде не скрывается."""
+        auth_service = self.app.auth_service
+        with self.app.test_request_context():
+            self.assertIsNone(auth_service.get_user_by_token('токен.подпись'))
+            
+            class BrokenRevocations:
+                def is_revoked(self, user_id, issued_at):
+                    raise RuntimeError('bug')
+            
+            token = auth_service.jwt_service.generate_token(1)
+            auth_service.revocations = BrokenRevocations()
+            with self.assertRaises(RuntimeError):
+                auth_service.get_user_by_token(token)
+
+
+class TestModels(unittest.TestCase):
+    """Тесты компактных моделей."""
+    
+    def test_models_have_no_instance_dict(self) -> None:
+        """Модели используют __slots__ вместо __dict__."""
+        from app.models import CompactPost, Post, User
+        
+        post = Post(id=1, user_id=1, title='t', body='b')
+        user = User(id=1, login='u', discriminator='0001', password_hash='h')
+        
+        self.assertFalse(hasattr(post, '__dict__'))
+        self.assertFalse(hasattr(user, '__dict__'))
+        self.assertFalse(hasattr(CompactPost.from_post(post), '__dict__'))
+    
+    def test_roles_and_authors_are_shared(self) -> None:
+        """Равные наборы ролей и авторы разделяются между моделями."""
+        from app.models import CompactPost, Post, intern_roles
+        
+        self.assertIs(intern_roles('common,admin'), intern_roles(['admin', 'common']))
+        
+        first, second = (
+            CompactPost.from_post(Post(
+                id=i, user_id=7, title='t', body='b',
+                author_login='bob', author_discriminator='0007',
+                author_roles=intern_roles('admin')
+            ))
+            for i in (1, 2)
+        )
+        self.assertIs(first.author, second.author)
+        self.assertTrue(first.author_is_admin)
+        self.assertEqual(first.author_display_name, 'bob#0007')
+
+
+class TestPostCache(unittest.TestCase):
+    """Тесты кэша постов."""
+    
+    class FakePostRepository:
+        """Репозиторий постов в памяти со счётчиком запросов."""
+        
+        def __init__(self) -> None:
+            from app.models import Post
+            self.queries = 0
+            self.posts = {1: Post(id=1, user_id=1, title='t', body='b')}
+        
+        def find_by_id(self, post_id: int):
+            self.queries += 1
+            return self.posts.get(post_id)
+    
+    def test_ttl_cache_evicts_least_recently_used(self) -> None:
+        """При переполнении вытесняется самая старая запись."""
+        from app.cache import TTLCache
+        
+        cache = TTLCache(2, 60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+    
+    def test_post_is_served_from_cache_until_changed(self) -> None:
+        """Пост читается из БД один раз и сбрасывается сигналом изменения."""
+        from app.cache import TTLCache
+        from app.services import PostService
+        from app.signals import comment_changed, post_changed
+        
+        repo = self.FakePostRepository()
+        service = PostService(repo, TTLCache(10, 60))
+        
+        service.get_post_by_id(1)
+        service.get_post_by_id(1)
+        self.assertEqual(repo.queries, 1)
+        
+        post_changed.send(self, post_id=1)
+        service.get_post_by_id(1)
+        self.assertEqual(repo.queries, 2)
+        
+        comment_changed.send(self, post_id=1, comment_id=5)
+        service.get_post_by_id(1)
+        self.assertEqual(repo.queries, 3)
+
+
+class TestUserCache(unittest.TestCase):
+    """Тесты кэша пользователей."""
+    
+    def test_user_is_cached_until_changed(self) -> None:
+        """Пользователь читается из БД один раз до сигнала изменения."""
+        from app.cache import TTLCache
+        from app.models import User
+        from app.services import UserAuthService
+        from app.signals import user_changed
+        
+        queries = []
+        
+        class FakeUserRepository:
+            def find_by_id(self, user_id: int):
+                queries.append(user_id)
+                return User(id=user_id, login='u', discriminator='0001', password_hash='h')
+        
+        cache = TTLCache(10, 60)
+        service = UserAuthService(FakeUserRepository(), None, cache)
+        
+        service.get_user_by_id(3)
+        service.get_user_by_id(3)
+        self.assertEqual(queries, [3])
+        self.assertEqual(cache.stats()['hit_ratio'], 0.5)
+        
+        user_changed.send(self, user_id=3)
+        service.get_user_by_id(3)
+        self.assertEqual(queries, [3, 3])
+
+
+class TestTokenVersions(unittest.TestCase):
+    """Тесты self-contained токенов с версией."""
+    
+    class FakeUserRepository:
+        def __init__(self) -> None:
+            self.versions = {5: 0}
+            self.queries = 0
+        
+        def find_all_token_versions(self):
+            self.queries += 1
+            return dict(self.versions)
+        
+        def find_token_version(self, user_id: int):
+            self.queries += 1
+            return self.versions.get(user_id)
+        
+        def find_by_id(self, user_id: int):
+            self.queries += 1
+            return None
+    
+    def setUp(self) -> None:
+        from flask import Flask
+        self.app = Flask(__name__)
+        self.app.config['SECRET_KEY'] = 'test-secret-key'
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+    
+    def tearDown(self) -> None:
+        self.app_context.pop()
+    
+    def test_claims_served_without_db_until_version_bumped(self) -> None:
+        """Пользователь восстанавливается из токена, смена версии его отзывает."""
+        from app.models import User
+        from app.services import JWTService, TokenVersionService, UserAuthService
+        from app.signals import user_changed
+        
+        repo = self.FakeUserRepository()
+        versions = TokenVersionService(repo, refresh_interval=60)
+        service = UserAuthService(repo, JWTService(), token_versions=versions)
+        
+        user = User(id=5, login='alice', discriminator='0042', password_hash='h')
+        user._roles = ('user',)
+        token = service.jwt_service.generate_token(5, claims=service._token_claims(user))
+        
+        restored = service.get_user_by_token(token)
+        self.assertEqual((restored.login, restored.discriminator), ('alice', '0042'))
+        self.assertEqual(restored.roles, ('user',))
+        queries = repo.queries
+        service.get_user_by_token(token)
+        self.assertEqual(repo.queries, queries)
+        
+        repo.versions[5] = 1
+        user_changed.send(self, user_id=5)
+        self.assertIsNone(service.get_user_by_token(token))
+
+
+class TestRevocation(unittest.TestCase):
+    """Тесты фильтра Блума и списка отозванных токенов."""
+    
+    class FakeTokenRepository:
+        def __init__(self) -> None:
+            self.rows = {}
+            self.exact_lookups = 0
+        
+        def revoke(self, user_id: int, iat: int, expires_at: int) -> bool:
+            self.rows[(user_id, iat)] = expires_at
+            return True
+        
+        def is_revoked(self, user_id: int, iat: int) -> bool:
+            self.exact_lookups += 1
+            return (user_id, iat) in self.rows
+        
+        def find_active(self, now: int):
+            return [key for key, exp in self.rows.items() if exp > now]
+        
+        def delete_expired(self, now: int) -> int:
+            expired = [key for key, exp in self.rows.items() if exp <= now]
+            for key in expired:
+                del self.rows[key]
+            return len(expired)
+    
+    def test_bloom_filter_has_no_false_negatives(self) -> None:
+        """Добавленные элементы всегда находятся, ошибка близка к расчётной."""
+        from app.cache import BloomFilter
+        
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"1:{i}")
+        self.assertTrue(all(f"1:{i}" in bloom for i in range(1000)))
+        
+        false_hits = sum(f"2:{i}" in bloom for i in range(10000))
+        self.assertLess(false_hits / 10000, 0.03)
+        self.assertAlmostEqual(bloom.false_positive_rate(), 0.01, delta=0.005)
+    
+    def test_revoked_token_checked_exactly_only_on_filter_hit(self) -> None:
+        """Неотозванные токены не доходят до БД, истёкшие записи удаляются."""
+        import time
+        from app.services import RevocationService
+        
+        repo = self.FakeTokenRepository()
+        repo.rows[(9, 100)] = int(time.time()) - 1  # истёкший отзыв
+        service = RevocationService(repo, capacity=100)
+        
+        service.revoke(1, 1000, int(time.time()) + 3600)
+        self.assertTrue(service.is_revoked(1, 1000))
+        self.assertFalse(service.is_revoked(1, 1001))
+        self.assertEqual(repo.exact_lookups, 1)
+        self.assertNotIn((9, 100), repo.rows)
+        self.assertEqual(service.stats()['collected'], 1)
+
+
+class TestJWTVerifyCache(unittest.TestCase):
+    """Тесты кэша проверенных JWT токенов."""
+    
+    def test_secret_change_invalidates_verified_tokens(self) -> None:
+        """После смены SECRET_KEY закэшированный токен больше не принимается."""
+        from flask import Flask
+        from app.cache import TTLCache
+        from app.services import JWTService
+        
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'first-secret'
+        cache = TTLCache(10, 300, name='jwt')
+        with app.app_context():
+            service = JWTService(cache)
+            token = service.generate_token(7)
+            self.assertEqual(service.verify_token(token)['user_id'], 7)
+            self.assertEqual(service.verify_token(token)['user_id'], 7)
+            self.assertEqual(cache.hits, 1)
+            
+            app.config['SECRET_KEY'] = 'second-secret'
+            self.assertIsNone(service.verify_token(token))
+            self.assertEqual(len(cache), 0)
+    
+    def test_binary_tokens_are_compact_and_json_still_verified(self) -> None:
+        """Двоичный токен короче JSON, оба формата проходят проверку."""
+        from flask import Flask
+        from app.services import JWTService
+        
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'test-secret-key'
+        claims = {'ver': 2, 'login': 'alice', 'disc': '0042', 'roles': ['admin', 'user']}
+        with app.app_context():
+            service = JWTService()
+            json_token = service.generate_token(7, claims=claims)
+            app.config['JWT_TOKEN_FORMAT'] = 'binary'
+            binary_token = service.generate_token(7, claims=claims)
+            
+            self.assertNotIn('.', binary_token)
+            self.assertLess(len(binary_token), len(json_token) / 2)
+            for token in (json_token, binary_token):
+                payload = service.verify_token(token)
+                self.assertEqual(payload['user_id'], 7)
+                self.assertEqual(payload['roles'], ['admin', 'user'])
+                self.assertEqual(payload['ver'], 2)
+            
+            tampered = binary_token[:-2] + ('A' if binary_token[-2] != 'A' else 'B') + binary_token[-1]
+            self.assertIsNone(service.verify_token(tampered))
+
+
+class TestPasswordHasher(unittest.TestCase):
+    """Тесты пула хэширования паролей."""
+    
+    def test_pool_verifies_many_hashes_in_order(self) -> None:
+        """Пул возвращает результаты проверки в порядке хэшей."""
+        from werkzeug.security import generate_password_hash
+        from app.services import PasswordHasher
+        
+        hashes = [
+            generate_password_hash('secret', method='pbkdf2:sha256:1000'),
+            generate_password_hash('other', method='pbkdf2:sha256:1000'),
+            generate_password_hash('secret', method='pbkdf2:sha256:1000'),
+        ]
+        hasher = PasswordHasher(workers=2, timeout=60)
+        try:
+            self.assertEqual(hasher.verify_many(hashes, 'secret'), [True, False, True])
+            self.assertTrue(hasher.verify(hasher.hash('new'), 'new'))
+        finally:
+            hasher.shutdown()
+    
+    def test_full_queue_fails_fast(self) -> None:
+        """Переполненная очередь сразу отвечает PasswordHasherBusy."""
+        from app.services import PasswordHasher, PasswordHasherBusy
+        
+        hasher = PasswordHasher(workers=1, max_pending=1, timeout=0.01)
+        hasher._slots.acquire()  # очередь занята другим запросом
+        with self.assertRaises(PasswordHasherBusy):
+            hasher.verify('hash', 'password')
+        self.assertEqual(hasher.stats()['rejected'], 1)
+    
+    def test_outdated_hash_is_rehashed_after_login(self) -> None:
+        """После входа хэш со старыми параметрами заменяется в фоне."""
+        from flask import Flask
+        from werkzeug.security import generate_password_hash
+        from app.models import User
+        from app.services import PasswordHasher, UserAuthService
+        
+        method = 'pbkdf2:sha256:2000'
+        old_hash = generate_password_hash('secret', method='pbkdf2:sha256:1000')
+        updates = []
+        
+        class FakeUserRepository:
+            def find_by_login_and_discriminator(self, login, discriminator):
+                return User(id=4, login=login, discriminator=discriminator, password_hash=old_hash)
+            
+            def update_password_hash(self, user_id, old, new):
+                updates.append((user_id, old, new))
+                return True
+        
+        hasher = PasswordHasher(method=method)
+        self.assertTrue(hasher.needs_rehash(old_hash))
+        self.assertFalse(hasher.needs_rehash(hasher.hash('secret')))
+        
+        service = UserAuthService(FakeUserRepository(), None, password_hasher=hasher)
+        with Flask(__name__).app_context():
+            success, _, _ = service.authenticate_user('bob', 'secret', '0001')
+        self.assertTrue(success)
+        
+        for thread in threading.enumerate():
+            if thread.name == 'rehash-4':
+                thread.join(5)
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(updates[0][:2], (4, old_hash))
+        self.assertTrue(updates[0][2].startswith(method + '$'))
+
+
+class TestLoginResolver(unittest.TestCase):
+    """Тесты решения о входе."""
+    
+    def setUp(self) -> None:
+        from werkzeug.security import generate_password_hash
+        from app.models import User
+        from app.services import PasswordHasher, UserAuthService
+        
+        method = 'pbkdf2:sha256:1000'
+        self.users = [
+            User(id=1, login='bob', discriminator='0001',
+                 password_hash=generate_password_hash('secret', method=method)),
+            User(id=2, login='bob', discriminator='0002',
+                 password_hash=generate_password_hash('secret', method=method)),
+            User(id=3, login='bob', discriminator='0003',
+                 password_hash=generate_password_hash('other', method=method)),
+        ]
+        self.calls = []
+        self.saved = []
+        test = self
+        
+        def saved_failures(ip_address, login):
+            return [
+                timestamp for _, _, failures in test.saved
+                for timestamp in failures.get((ip_address, login), ())
+            ]
+        
+        def saved_locks(now, user_ids=None):
+            return [
+                (user_id, until) for _, locks, _ in test.saved for user_id, until, _ in locks
+                if until > now and (user_ids is None or user_id in user_ids)
+            ]
+        
+        class RecordedRepository:
+            """Записывает все обращения к репозиторию."""
+            
+            def __getattribute__(self, name):
+                if not name.startswith('_'):
+                    test.calls.append(name)
+                return object.__getattribute__(self, name)
+        
+        class FakeUserRepository(RecordedRepository):
+            def find_login_candidates(self, login, ip_address, now):
+                users = [u for u in test.users if u.login == login]
+                return (
+                    users,
+                    saved_locks(now.isoformat(), [u.id for u in users]),
+                    saved_failures(ip_address, login)
+                )
+        
+        class FakeAttemptRepository(RecordedRepository):
+            def adopt_legacy_attempts(self, window, keep):
+                return 0
+            
+            def find_failure_windows(self, now):
+                return []
+            
+            def find_failure_window(self, ip_address, login, now):
+                return saved_failures(ip_address, login)
+            
+            def find_active_locks(self, now, user_ids=None):
+                return saved_locks(now, user_ids)
+            
+            def save_batch(self, attempts, locks, failures=None, window=0.0, keep=0):
+                test.saved.append((attempts, locks, failures or {}))
+                return len(attempts) + len(locks)
+            
+            def compact_before(self, day):
+                return 0, 0
+            
+            def delete_totals_before(self, day):
+                return 0
+            
+            def delete_expired_locks(self, now):
+                return 0
+        
+        from app.services.login_attempt_service import LoginAttemptService
+        self.attempts = LoginAttemptService(FakeAttemptRepository(), flush_interval=3600)
+        # Загрузка состояния и очистка суток выполняются один раз, а не на каждом входе
+        self.attempts.load()
+        self.attempts.apply_retention()
+        self.calls.clear()
+        
+        from app.services import LoginResolver
+        auth_service = UserAuthService(None, None, password_hasher=PasswordHasher(method=method))
+        self.resolver = LoginResolver(FakeUserRepository(), auth_service, self.attempts)
+    
+    def test_single_query_and_single_decision(self) -> None:
+        """Один запрос к БД, решение зависит только от совпавших паролей."""
+        decision = self.resolver.resolve('bob', 'secret', '1.2.3.4')
+        self.assertEqual(decision.status, decision.CHOOSE)
+        self.assertEqual([u.id for u in decision.accounts], [1, 2])
+        self.assertEqual(self.calls, ['find_login_candidates'])
+        
+        decision = self.resolver.resolve('bob', 'wrong', '1.2.3.4')
+        self.assertEqual(decision.status, decision.INVALID)
+        decision = self.resolver.resolve('bob', 'secret', '1.2.3.4', discriminator='0002')
+        self.assertEqual(decision.status, decision.OK)
+        self.assertEqual(decision.user.id, 2)
+        self.assertEqual(self.calls, ['find_login_candidates'] * 3)
+        self.attempts.flush()
+        self.assertEqual(sum(len(attempts) for attempts, _, _ in self.saved), 3)
+    
+    def test_failures_lock_account_then_block(self) -> None:
+        """Исчерпание попыток блокирует однозначный аккаунт, затем IP+логин."""
+        for _ in range(self.attempts.max_attempts):
+            decision = self.resolver.resolve('bob', 'wrong', '1.2.3.4', discriminator='0003')
+            self.assertEqual(decision.status, decision.INVALID)
+        self.assertTrue(self.attempts.is_account_locked(3)[0])
+        self.assertFalse(self.attempts.is_account_locked(1)[0])
+        
+        calls = len(self.calls)
+        decision = self.resolver.resolve('bob', 'secret', '1.2.3.4')
+        self.assertEqual(decision.status, decision.BLOCKED)
+        self.assertEqual(len(self.calls), calls)
+        
+        # Блокировка записывается сразу вместе с накопленными попытками
+        self.assertEqual([lock[0] for lock in self.saved[-1][1]], [3])
+        self.assertEqual(self.attempts.stats()['pending'], 0)
+        self.assertEqual(
+            sum(len(attempts) for attempts, _, _ in self.saved), self.attempts.max_attempts
+        )
+        self.assertEqual(
+            sum(len(failures.get(('1.2.3.4', 'bob'), ())) for _, _, failures in self.saved),
+            self.attempts.max_attempts
+        )
+
+
+class TestSlidingWindowCounter(unittest.TestCase):
+    """Тесты счётчика неудачных попыток в скользящем окне."""
+    
+    def test_window_and_memory_bounds(self) -> None:
+        """Старые события выпадают из окна, старые ключи вытесняются."""
+        import time
+        from app.cache import SlidingWindowCounter
+        
+        counter = SlidingWindowCounter(limit=3, window=60, max_keys=2)
+        now = time.time()
+        counter.add('a', now - 120)
+        counter.add('a', now - 1)
+        self.assertEqual(counter.count('a'), 1)
+        self.assertFalse(counter.exceeded('a'))
+        
+        for _ in range(5):
+            counter.add('a')
+        self.assertEqual(counter.count('a'), 3)
+        self.assertTrue(counter.exceeded('a'))
+        
+        counter.add('b')
+        counter.add('c')
+        self.assertEqual(len(counter), 2)
+        self.assertFalse(counter.exceeded('a'))
+        self.assertEqual(counter.stats()['evictions'], 1)
+    
+    def test_service_restores_state_from_db(self) -> None:
+        """После перезапуска счётчики и блокировки читаются из БД."""
+        import time
+        from datetime import datetime, timedelta
+        from app.services.login_attempt_service import LoginAttemptService
+        
+        recent = time.time() - 60
+        locked_until = (datetime.now() + timedelta(minutes=5)).isoformat()
+        
+        class FakeAttemptRepository:
+            def adopt_legacy_attempts(self, window, keep):
+                return 0
+            
+            def find_failure_windows(self, now):
+                return [('1.2.3.4', 'bob', [recent + i for i in range(5)])]
+            
+            def find_failure_window(self, ip_address, login, now):
+                return []
+            
+            def find_active_locks(self, now, user_ids=None):
+                return [(7, locked_until)] if user_ids is None or 7 in user_ids else []
+        
+        service = LoginAttemptService(FakeAttemptRepository())
+        self.assertEqual(service.max_attempts, 5)
+        self.assertTrue(service.should_block_login('1.2.3.4', 'bob')[0])
+        self.assertFalse(service.should_block_login('5.6.7.8', 'bob')[0])
+        self.assertTrue(service.is_account_locked(7)[0])
+
+
+class TestLoginAttemptPartitions(DatabaseTestCase):
+    """Тесты дневных таблиц попыток входа и их свёртки."""
+    
+    def setUp(self) -> None:
+        super().setUp()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+    
+    def tearDown(self) -> None:
+        self.app_context.pop()
+        super().tearDown()
+    
+    def test_old_days_rolled_up_and_dropped(self) -> None:
+        """Старые дни сворачиваются в сводку, текущий день остаётся таблицей."""
+        from datetime import datetime
+        from app.repositories import LoginAttemptRepository
+        
+        repo = LoginAttemptRepository()
+        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        repo.save_batch([
+            ('1.1.1.1', 'bob', False, '2020-01-01 10:00:00'),
+            ('1.1.1.1', 'bob', False, '2020-01-01 11:00:00'),
+            ('1.1.1.1', 'bob', True, '2020-01-01 12:00:00'),
+            ('2.2.2.2', 'bob', False, '2020-01-02 10:00:00'),
+            ('1.1.1.1', 'bob', False, now),
+        ], [])
+        self.assertEqual(len(repo.list_partitions()), 3)
+        self.assertEqual(len(repo.find_failures_since(now[:10] + ' 00:00:00')), 1)
+        
+        self.assertEqual(repo.compact_before(now[:10]), (2, 2))
+        self.assertEqual(repo.list_partitions(), [now[:10]])
+        
+        from app.db import execute_query
+        totals = execute_query(
+            "SELECT day, ip_address, failures, successes FROM login_attempt_totals ORDER BY day",
+            fetch_all=True
+        )
+        self.assertEqual(
+            [tuple(row.values()) for row in totals],
+            [('2020-01-01', '1.1.1.1', 2, 1), ('2020-01-02', '2.2.2.2', 1, 0)]
+        )
+        self.assertEqual(repo.delete_totals_before('2020-01-02'), 1)
+    
+    def test_partition_list_read_once_per_day(self) -> None:
+        """Список дневных таблиц читается из sqlite_master раз в сутки."""
+        from datetime import datetime
+        from app.repositories import login_attempt_repo
+        
+        repo = login_attempt_repo.LoginAttemptRepository()
+        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        repo.save_batch([('1.1.1.1', 'bob', False, now)], [])
+        queries = []
+        execute_query = login_attempt_repo.execute_query
+        login_attempt_repo.execute_query = lambda query, *args, **kwargs: (
+            queries.append(query) or execute_query(query, *args, **kwargs)
+        )
+        try:
+            for _ in range(3):
+                self.assertEqual(repo.list_partitions(), [now[:10]])
+            repo.save_batch([('1.1.1.1', 'bob', False, '2020-01-01 10:00:00')], [])
+            self.assertEqual(repo.list_partitions(), ['2020-01-01', now[:10]])
+            self.assertEqual(repo.compact_before(now[:10]), (1, 1))
+            self.assertEqual(repo.list_partitions(), [now[:10]])
+        finally:
+            login_attempt_repo.execute_query = execute_query
+        self.assertEqual(sum('sqlite_master' in query for query in queries), 1)
+    
+    def test_upgrade_keeps_active_failures(self) -> None:
+        """Миграция 009 не обнуляет действующие счётчики неудачных попыток."""
+        from app.db import execute_query, execute_update
+        from app.migrations import migration_runner
+        from app.services.login_attempt_service import LoginAttemptService
+        
+        runner = migration_runner.MigrationRunner(self.db_path)
+        runner.migrations_dir = os.path.dirname(os.path.abspath(migration_runner.__file__))
+        runner.generate_schema = lambda: True
+        self.assertTrue(runner.migrate_down('008_create_revoked_tokens'))
+        for attempt_time in ("datetime('now', '-1 minute')",) * 3 + ("'2020-01-01 10:00:00'",):
+            execute_update(
+                f"""INSERT INTO login_attempts (ip_address, login, attempt_time, success)
+                   VALUES ('1.1.1.1', 'bob', {attempt_time}, 0)"""
+            )
+        self.assertTrue(runner.migrate_up())
+        
+        service = LoginAttemptService(flush_interval=3600)
+        self.assertEqual(service.get_failed_attempts_count('1.1.1.1', 'bob'), 3)
+        self.assertEqual(len(service.repo.list_partitions()), 1)
+        self.assertEqual(
+            execute_query("SELECT day, failures FROM login_attempt_totals", fetch_all=True),
+            [{'day': '2020-01-01', 'failures': 1}]
+        )
+        # Попытки переносятся один раз
+        self.assertEqual(service.repo.adopt_legacy_attempts(900, 5), 0)
+    
+    def test_workers_share_failures_and_locks(self) -> None:
+        """Лимит попыток и блокировки общие для процессов с одной БД."""
+        from app.services.login_attempt_service import LoginAttemptService
+        
+        first = LoginAttemptService(flush_interval=0)
+        second = LoginAttemptService(flush_interval=0)
+        for attempt in range(first.max_attempts):
+            worker = first if attempt % 2 else second
+            self.assertFalse(worker.will_exceed_max_attempts('1.1.1.1', 'bob'))
+            worker.record_login_attempt('1.1.1.1', 'bob', False)
+        self.assertTrue(first.will_exceed_max_attempts('1.1.1.1', 'bob'))
+        self.assertTrue(second.will_exceed_max_attempts('1.1.1.1', 'bob'))
+        self.assertEqual(second.get_failed_attempts_count('1.1.1.1', 'bob'), 5)
+        
+        first.lock_account(1)
+        self.assertTrue(second.is_account_locked(1)[0])
+        self.assertEqual(list(second.find_locked([1, 2])), [1])
+        second.unlock_account(1)
+        self.assertFalse(first.is_account_locked(1)[0])
+    
+    def test_checks_served_from_memory(self) -> None:
+        """Проверки не считают строки попыток и не пишут каждую попытку."""
+        from app.services.login_attempt_service import LoginAttemptService
+        
+        service = LoginAttemptService(flush_interval=3600)
+        service.apply_retention()  # первая запись суток иначе запустит очистку
+        calls = []
+        for name in ('find_failure_window', 'find_active_locks', 'save_batch'):
+            method = getattr(service.repo, name)
+            setattr(service.repo, name, lambda *args, _m=method, _n=name: calls.append(_n) or _m(*args))
+        
+        for _ in range(service.max_attempts):
+            self.assertFalse(service.should_block_login('1.1.1.1', 'bob', user_id=1)[0])
+            service.record_login_attempt('1.1.1.1', 'bob', False)
+        self.assertTrue(service.should_block_login('1.1.1.1', 'bob')[0])
+        # Загрузка при первом обращении и по одному чтению окна и блокировки
+        self.assertEqual(calls, ['find_active_locks', 'find_active_locks', 'find_failure_window'])
+        
+        # Попытки пишутся пачкой и видны другому процессу одним поиском
+        service.flush()
+        other = LoginAttemptService(flush_interval=3600)
+        self.assertTrue(other.will_exceed_max_attempts('1.1.1.1', 'bob'))
+        self.assertEqual(other.stats()['syncs'], 0)  # загружено при первом обращении
+    
+    def test_load_retried_after_db_error(self) -> None:
+        """Неудачная загрузка состояния повторяется после паузы."""
+        from app.services.login_attempt_service import LoginAttemptService
+        
+        service = LoginAttemptService(flush_interval=3600)
+        find_failure_windows = service.repo.find_failure_windows
+        service.repo.find_failure_windows = lambda now: 1 / 0
+        service.get_failed_attempts_count('1.1.1.1', 'bob')
+        self.assertFalse(service._loaded)
+        
+        service.repo.find_failure_windows = find_failure_windows
+        service.get_failed_attempts_count('1.1.1.1', 'bob')
+        self.assertFalse(service._loaded)  # пауза ещё не прошла
+        service._load_retry_at = 0.0
+        service.get_failed_attempts_count('1.1.1.1', 'bob')
+        self.assertTrue(service._loaded)
+
+
+class TestRateLimitStorage(unittest.TestCase):
+    """Тесты общего хранилища счётчиков лимитов."""
+    
+    def setUp(self) -> None:
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+    
+    def tearDown(self) -> None:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.db_path + suffix):
+                os.unlink(self.db_path + suffix)
+    
+    def test_workers_share_batched_counters(self) -> None:
+        """Приращения копятся в процессе и после записи видны другим воркерам."""
+        from limits.storage import storage_from_string
+        import app.ratelimit  # noqa: F401 — регистрирует схему sqlite://
+        
+        uri = f'sqlite:///{self.db_path}'
+        first = storage_from_string(uri, flush_interval=3600, batch_size=2)
+        second = storage_from_string(uri, flush_interval=0)
+        
+        self.assertEqual(first.incr('ip', 60), 1)
+        self.assertEqual(first.get('ip'), 1)
+        self.assertEqual(second.get('ip'), 0)
+        
+        first.incr('other', 60)  # второй ключ заполняет пачку
+        self.assertEqual(first.stats()['pending'], 0)
+        self.assertEqual(second.incr('ip', 60), 2)
+        self.assertGreater(second.get_expiry('ip'), 0)
+        
+        second.clear('ip')
+        self.assertEqual(second.get('ip'), 0)
+    
+    def test_limiter_bound_and_health_exempt(self) -> None:
+        """Лимиты из декораторов работают, /health не ограничивается."""
+        config = type('LimitConfig', (TestConfig,), {
+            'RATELIMIT_STORAGE_URI': f'sqlite:///{self.db_path}',
+            'RATELIMIT_DEFAULT': '2 per minute',
+        })
+        app = create_app(config)
+        client = app.test_client()
+        
+        statuses = [client.get('/auth/login').status_code for _ in range(11)]
+        self.assertEqual(statuses[-1], 429)
+        self.assertTrue(all(client.get('/health').status_code == 200 for _ in range(5)))
+
+
+class TestApproximateLimiter(unittest.TestCase):
+    """Тесты приблизительных лимитов на Count-Min Sketch."""
+    
+    def test_sketch_memory_fixed_and_never_underestimates(self) -> None:
+        """Память не растёт с числом ключей, оценка не меньше настоящего счёта."""
+        from app.cache import WindowedCountMinSketch
+        
+        sketch = WindowedCountMinSketch(60, epsilon=0.01, delta=0.01, buckets=3)
+        memory = sketch.stats()['memory_bytes']
+        for i in range(5000):
+            sketch.add(f'10.0.{i // 256}.{i % 256}', now=1000.0)
+        for _ in range(20):
+            sketch.add('attacker', now=1000.0)
+        
+        self.assertEqual(sketch.stats()['memory_bytes'], memory)
+        self.assertGreaterEqual(sketch.estimate('attacker', now=1000.0), 20)
+        # ε·N = 0.01 · 5020 ≈ 50 с вероятностью 1 - δ
+        self.assertLessEqual(sketch.estimate('attacker', now=1000.0), 20 + 51)
+        # Оценка покрывает окно плюс один интервал (20 с), затем обнуляется
+        self.assertGreaterEqual(sketch.estimate('attacker', now=1000.0 + 60), 20)
+        self.assertEqual(sketch.estimate('attacker', now=1000.0 + 80), 0)
+    
+    def test_exact_check_only_near_threshold(self) -> None:
+        """Точные счётчики заводятся только для ключей около порога."""
+        from app.ratelimit import ApproximateLimiter
+        
+        limiter = ApproximateLimiter('4 per minute', epsilon=0.01, near_ratio=0.5)
+        for i in range(100):
+            self.assertTrue(limiter.hit(f'client-{i}'))
+        self.assertEqual(limiter.stats()['exact_keys'], 0)
+        
+        allowed = sum(limiter.hit('attacker') for _ in range(20))
+        self.assertLessEqual(allowed, limiter.limit)
+        self.assertGreater(limiter.stats()['rejected'], 0)
+        self.assertEqual(limiter.stats()['exact_keys'], 1)
+    
+    def test_exact_count_shared_between_workers(self) -> None:
+        """Точный счёт у порога идёт через общее хранилище, а не память воркера."""
+        from limits.strategies import FixedWindowRateLimiter
+        from app.ratelimit import ApproximateLimiter, SQLiteLimiterStorage
+        
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.addCleanup(os.unlink, path)
+        workers = [
+            ApproximateLimiter(
+                '4 per minute', epsilon=0.01, near_ratio=0.5,
+                strategy=FixedWindowRateLimiter(
+                    SQLiteLimiterStorage(f'sqlite:///{path}', flush_interval=0)
+                )
+            )
+            for _ in range(2)
+        ]
+        allowed = sum(workers[i % 2].hit('attacker') for i in range(20))
+        # Второй воркер добавляет не больше своих запросов до порога, а не ещё limit
+        self.assertLessEqual(allowed, 4 + workers[1].threshold)
+        self.assertEqual(sum(worker.stats()['rejected'] for worker in workers), 20 - allowed)
+    
+    def test_approximate_mode_replaces_exact_login_limit(self) -> None:
+        """В приблизительном режиме вход ограничивает скетч, а не Flask-Limiter."""
+        config = type('ApproximateConfig', (TestConfig,), {
+            'RATELIMIT_APPROXIMATE': True,
+            'RATELIMIT_LOGIN': '4 per minute',
+        })
+        app = create_app(config)
+        client = app.test_client()
+        
+        statuses = [client.get('/auth/login').status_code for _ in range(10)]
+        self.assertLessEqual(statuses.count(200), 4)
+        self.assertEqual(app.approximate_limiters['auth.login'].stats()['exact_keys'], 1)
+
+
+class TestStatelessCSRF(unittest.TestCase):
+    """Тесты CSRF токенов без состояния на сервере."""
+    
+    def setUp(self) -> None:
+        config = type('CSRFConfig', (TestConfig,), {'WTF_CSRF_ENABLED': True})
+        self.app = create_app(config)
+        self.client = self.app.test_client()
+    
+    def test_get_sets_nonce_cookie_without_session(self) -> None:
+        """GET выдаёт nonce cookie один раз и не пишет сессию."""
+        response = self.client.get('/auth/login')
+        cookies = response.headers.getlist('Set-Cookie')
+        
+        self.assertTrue(any(c.startswith('csrf_nonce=') for c in cookies))
+        self.assertFalse(any(c.startswith('session=') for c in cookies))
+        
+        # Повторный запрос с cookie уже ничего не устанавливает
+        response = self.client.get('/auth/login')
+        self.assertFalse(any(
+            c.startswith('csrf_nonce=') for c in response.headers.getlist('Set-Cookie')
+        ))
+    
+    def test_post_without_valid_token_rejected(self) -> None:
+        """POST без токена или с чужим токеном отклоняется до обработчика."""
+        self.client.get('/auth/login')
+        self.assertEqual(self.client.post('/auth/login', data={}).status_code, 400)
+        
+        with self.app.test_request_context(headers={'Cookie': 'csrf_nonce=other'}):
+            foreign = self.app.csrf_service.generate_token()
+        response = self.client.post('/auth/login', data={'csrf_token': foreign})
+        self.assertEqual(response.status_code, 400)
+    
+    def test_token_bound_to_nonce_and_age(self) -> None:
+        """Токен проверяется по nonce из cookie и сроку жизни."""
+        service = self.app.csrf_service
+        with self.app.test_request_context(headers={'Cookie': 'csrf_nonce=abc'}):
+            token = service.generate_token(now=1000.0)
+            self.assertTrue(service.verify_token(token, now=1000.0 + 60))
+            self.assertFalse(service.verify_token(token, now=1000.0 + service.max_age + 1))
+            self.assertFalse(service.verify_token(token.replace('.', '.x', 1), now=1000.0))
+        
+        with self.app.test_request_context(headers={'Cookie': 'csrf_nonce=xyz'}):
+            self.assertFalse(service.verify_token(token, now=1000.0 + 60))
+    
+    def test_placeholder_filled_per_request(self) -> None:
+        """Страница, отрендеренная с меткой, получает токен текущего клиента."""
+        from flask import render_template_string
+        from app.services.csrf_service import CSRF_PLACEHOLDER, deferred_tokens
+        
+        service = self.app.csrf_service
+        with self.app.test_request_context(headers={'Cookie': 'csrf_nonce=abc'}):
+            with deferred_tokens():
+                html = render_template_string('<input value="{{ csrf_token() }}">')
+            self.assertIn(CSRF_PLACEHOLDER, html)
+            
+            filled = service.fill_placeholder(html.encode())
+            self.assertNotIn(CSRF_PLACEHOLDER.encode(), filled)
+            self.assertIn(service.get_token().encode(), filled)
+            self.assertTrue(service.verify_token(service.get_token()))
+
+
+class TestPageCache(DatabaseTestCase):
+    """Тесты кэша страниц для анонимных посетителей."""
+    
+    def setUp(self) -> None:
+        super().setUp()
+        with self.app.app_context():
+            _, _, self.user = self.app.auth_service.register_user('alice', 'secret123')
+            _, _, post = self.app.post_service.create_post(self.user.id, 'Hello', 'Body ' * 300)
+            self.post_id = post.id
+    
+    def test_hit_gzip_and_not_modified(self) -> None:
+        """Повторный запрос отдаётся из кэша, условный — ответом 304."""
+        first = self.client.get(f'/post/{self.post_id}')
+        self.assertEqual(first.headers['X-Page-Cache'], 'MISS')
+        self.assertIsNotNone(first.headers.get('Last-Modified'))
+        
+        second = self.client.get(f'/post/{self.post_id}', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(second.headers['X-Page-Cache'], 'HIT')
+        self.assertEqual(second.headers['Content-Encoding'], 'gzip')
+        self.assertNotEqual(second.headers['ETag'], first.headers['ETag'])
+        
+        import gzip
+        self.assertEqual(gzip.decompress(second.data), first.data)
+        
+        conditional = self.client.get(
+            f'/post/{self.post_id}', headers={'If-None-Match': first.headers['ETag']}
+        )
+        self.assertEqual(conditional.status_code, 304)
+        self.assertEqual(conditional.data, b'')
+        conditional = self.client.get(
+            f'/post/{self.post_id}', headers={'If-Modified-Since': first.headers['Last-Modified']}
+        )
+        self.assertEqual(conditional.status_code, 304)
+    
+    def test_writes_invalidate_and_logged_in_bypass(self) -> None:
+        """Запись комментария сбрасывает кэш, запросы с auth_token получают оболочку."""
+        self.client.get('/')
+        self.assertEqual(self.client.get('/').headers['X-Page-Cache'], 'HIT')
+        
+        with self.app.app_context():
+            self.app.comment_service.create_comment(self.post_id, self.user.id, 'Nice')
+        self.assertEqual(self.client.get('/').headers['X-Page-Cache'], 'MISS')
+        
+        self.client.set_cookie('auth_token', 'anything')
+        self.assertEqual(self.client.get('/').headers['X-Page-Cache'], 'SHELL-HIT')
+    
+    def test_invalidation_reaches_other_workers(self) -> None:
+        """Сброс в одном воркере виден кэшу страниц другого воркера."""
+        from app.cache.tags import post_tag
+        
+        other = self.make_app()
+        other_client = other.test_client()
+        path = f'/post/{self.post_id}'
+        self.client.get(path)
+        other_client.get(path)
+        self.assertEqual(other_client.get(path).headers['X-Page-Cache'], 'HIT')
+        
+        # Сигналы общие для приложений одного процесса, поэтому сброс вызывается напрямую
+        self.app.page_cache.invalidate_tags(tags=[post_tag(self.post_id)])
+        self.assertEqual(other_client.get(path).headers['X-Page-Cache'], 'MISS')
+        self.assertEqual(other_client.get(path).headers['X-Page-Cache'], 'HIT')
+        
+        self.app.page_cache.clear()
+        self.assertEqual(other_client.get(path).headers['X-Page-Cache'], 'MISS')
+        self.assertEqual(other.page_cache.stats()['external_invalidations'], 2)
+    
+    def test_other_process_update_reaches_object_caches(self) -> None:
+        """Пост, изменённый другим процессом, не берётся из кэша постов воркера."""
+        import subprocess
+        import sys
+        
+        app = self.make_app(POST_CACHE_SIZE=128, USER_CACHE_SIZE=128)
+        client = app.test_client()
+        path = f'/post/{self.post_id}'
+        self.assertIn('Hello', client.get(path).get_data(as_text=True))
+        self.assertEqual(client.get(path).headers['X-Page-Cache'], 'HIT')
+        
+        script = (
+            "from app import create_app\n"
+            "from app.config import Config\n"
+            "class WorkerConfig(Config):\n"
+            "    SECRET_KEY = 'test-secret-key'\n"
+            f"    DATABASE_URL = 'sqlite:///{self.db_path}'\n"
+            "app = create_app(WorkerConfig)\n"
+            "with app.app_context():\n"
+            f"    ok, message, _ = app.post_service.update_post({self.post_id}, {self.user.id}, 'Updated', 'New body')\n"
+            "    assert ok, message\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run([sys.executable, '-c', script], cwd=root, check=True)
+        
+        response = client.get(path)
+        self.assertEqual(response.headers['X-Page-Cache'], 'MISS')
+        self.assertIn('Updated', response.get_data(as_text=True))
+        self.assertNotIn('Hello', response.get_data(as_text=True))
+    
+    def test_shell_shared_between_users(self) -> None:
+        """Оболочка рендерится один раз, персональные части — для каждого."""
+        with self.app.app_context():
+            _, _, bob = self.app.auth_service.register_user('bob', 'secret123')
+            _, _, alice_token = self.app.auth_service.login_user_by_id(self.user.id)
+            _, _, bob_token = self.app.auth_service.login_user_by_id(bob.id)
+        
+        self.client.set_cookie('auth_token', alice_token)
+        alice_page = self.client.get(f'/post/{self.post_id}')
+        self.assertEqual(alice_page.headers['X-Page-Cache'], 'SHELL-MISS')
+        self.assertIn(self.user.login_full, alice_page.get_data(as_text=True))
+        self.assertIn(f'/edit/{self.post_id}', alice_page.get_data(as_text=True))
+        
+        self.client.set_cookie('auth_token', bob_token)
+        bob_page = self.client.get(f'/post/{self.post_id}')
+        self.assertEqual(bob_page.headers['X-Page-Cache'], 'SHELL-HIT')
+        self.assertIn(bob.login_full, bob_page.get_data(as_text=True))
+        self.assertNotIn(f'/edit/{self.post_id}', bob_page.get_data(as_text=True))
+        self.assertNotIn('<!--hole:', bob_page.get_data(as_text=True))
+        
+        # Анонимная страница строится из той же оболочки без повторного рендеринга
+        self.client.delete_cookie('auth_token')
+        anonymous = self.client.get(f'/post/{self.post_id}').get_data(as_text=True)
+        self.assertNotIn(bob.login_full, anonymous)
+        self.assertEqual(self.app.page_cache.stats()['shell_misses'], 1)
+
+    
+    def test_surrogate_keys_invalidate_exact_pages(self) -> None:
+        """Изменение поста сбрасывает только страницы с его тегом."""
+        with self.app.app_context():
+            _, _, other = self.app.post_service.create_post(self.user.id, 'Other', 'Text')
+        
+        page = self.client.get(f'/post/{self.post_id}')
+        self.assertEqual(
+            page.headers['Surrogate-Key'].split(),
+            [f'post:{self.post_id}', f'user:{self.user.id}']
+        )
+        self.client.get(f'/post/{other.id}')
+        self.assertIn('listing:posts', self.client.get('/').headers['Surrogate-Key'].split())
+        
+        with self.app.app_context():
+            self.app.post_service.update_post(other.id, self.user.id, 'Renamed', 'Text')
+        self.assertEqual(self.client.get(f'/post/{self.post_id}').headers['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.client.get(f'/post/{other.id}').headers['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/').headers['X-Page-Cache'], 'MISS')
+        self.assertIn(
+            f'post:{self.post_id}',
+            self.client.get(f'/post/{self.post_id}').headers['Surrogate-Key']
+        )
+    
+    def test_missing_post_answered_from_memory(self) -> None:
+        """Удалённый и несуществующий посты отдают 404 без запроса к БД."""
+        from unittest import mock
+        
+        with self.app.app_context():
+            _, _, gone = self.app.post_service.create_post(self.user.id, 'Gone', 'Text')
+            self.app.post_service.delete_post(gone.id, self.user.id)
+        self.assertEqual(self.client.get(f'/post/{gone.id}').status_code, 404)
+        
+        with mock.patch.object(self.app.post_repo, 'find_by_id') as find_by_id:
+            for post_id in (gone.id, gone.id, 0):
+                response = self.client.get(f'/post/{post_id}')
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('Страница не найдена', response.get_data(as_text=True))
+                self.assertNotIn('<!--hole:', response.get_data(as_text=True))
+            find_by_id.assert_not_called()
+        self.assertEqual(self.app.post_service.missing_posts.stats()['filter_negatives'], 1)
+        
+        # ID больше известного максимума проверяется в БД: новый пост виден сразу
+        self.assertEqual(self.client.get(f'/post/{gone.id + 1}').status_code, 404)
+        with self.app.app_context():
+            _, _, post = self.app.post_service.create_post(self.user.id, 'New', 'Text')
+        self.assertEqual(post.id, gone.id + 1)
+        self.assertEqual(self.client.get(f'/post/{post.id}').status_code, 200)
+        
+        with self.app.app_context():
+            self.assertIsNone(self.app.comment_service.get_comment_by_id(0))
+            _, _, comment = self.app.comment_service.create_comment(post.id, self.user.id, 'Hi')
+            self.assertFalse(self.app.comment_service.missing_comments.is_missing(comment.id))
+
+
+class TestFragmentCache(unittest.TestCase):
+    """Тесты тега {% cache %} для фрагментов шаблонов."""
+    
+    def setUp(self) -> None:
+        self.app = create_app(TestConfig)
+        self.renders = 0
+    
+    def _render(self, version: int) -> str:
+        from flask import render_template_string
+        
+        def expensive() -> str:
+            self.renders += 1
+            return '<b>fragment</b>'
+        
+        with self.app.test_request_context():
+            return render_template_string(
+                "{% cache 'card', 1, version %}{{ expensive() }}<i>{{ title }}</i>{% endcache %}",
+                version=version, expensive=expensive, title='<x>'
+            )
+    
+    def test_fragment_reused_until_version_changes(self) -> None:
+        """Фрагмент рендерится один раз на версию сущности."""
+        first = self._render(1)
+        self.assertEqual(self._render(1), first)
+        self.assertEqual(self.renders, 1)
+        
+        self._render(2)
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(len(self.app.caches['fragments']), 2)
+    
+    def test_cached_fragment_keeps_escaping(self) -> None:
+        """Закэшированный фрагмент не экранируется повторно."""
+        self._render(1)
+        html = self._render(1)
+        self.assertIn('&lt;b&gt;fragment&lt;/b&gt;', html)
+        self.assertIn('<i>&lt;x&gt;</i>', html)
+
+
+class TestIndexFragments(DatabaseTestCase):
+    """Тесты кэша карточек постов на главной странице."""
+    
+    # Без кэша страниц каждый запрос рендерит шаблон заново
+    config_overrides = {'PAGE_CACHE_SIZE': 0}
+    
+    def test_post_cards_cached_between_renders(self) -> None:
+        """Второй рендер главной берёт карточки постов из кэша фрагментов."""
+        with self.app.app_context():
+            _, _, user = self.app.auth_service.register_user('bob', 'secret123')
+            self.app.post_service.create_post(user.id, 'Первый пост', 'Текст поста')
+        fragments = self.app.caches['fragments']
+        
+        html = self.client.get('/').get_data(as_text=True)
+        self.assertIn('Первый пост', html)
+        self.assertIn(f"bob#{user.discriminator}", html)
+        self.assertEqual((fragments.hits, fragments.misses), (0, 1))
+        
+        self.assertEqual(self.client.get('/').get_data(as_text=True), html)
+        self.assertEqual((fragments.hits, fragments.misses), (1, 1))
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Тесты объединения одновременных вычислений."""
+    
+    def test_concurrent_callers_share_one_computation(self) -> None:
+        """Вычисление выполняется один раз, результат получают все."""
+        import threading
+        import time
+        from app.cache import SingleFlight
+        
+        flight = SingleFlight('test')
+        started, release = threading.Event(), threading.Event()
+        calls = []
+        
+        def compute() -> str:
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+        
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', compute)))
+        leader.start()
+        started.wait(5)
+        waiters = [
+            threading.Thread(target=lambda: results.append(flight.do('k', compute)))
+            for _ in range(4)
+        ]
+        for thread in waiters:
+            thread.start()
+        # Пока идёт вычисление, вызов с прежним значением не ждёт
+        self.assertEqual(flight.do('k', compute, stale='old'), 'old')
+        deadline = time.monotonic() + 5
+        while flight.stats()['shared'] < 4 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader, *waiters]:
+            thread.join(5)
+        
+        self.assertEqual(results, ['value'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats()['stale_served'], 1)
+        self.assertFalse(flight.in_flight('k'))
+    
+    def test_process_lock_and_recheck(self) -> None:
+        """С каталогом блокировок повторная проверка заменяет вычисление."""
+        from app.cache import SingleFlight
+        
+        with tempfile.TemporaryDirectory() as lock_dir:
+            flight = SingleFlight('test', lock_dir)
+            self.assertEqual(flight.do('k', lambda: 'computed', recheck=lambda: 'cached'), 'cached')
+            with self.assertRaises(ValueError):
+                flight.do('k', lambda: int('x'))
+            self.assertFalse(flight.in_flight('k'))
+    
+    def test_busy_process_lock_serves_stale_or_times_out(self) -> None:
+        """Занятая другим процессом блокировка не держит запрос дольше timeout."""
+        import fcntl
+        import glob
+        from app.cache import SingleFlight
+        
+        with tempfile.TemporaryDirectory() as lock_dir:
+            flight = SingleFlight('test', lock_dir, timeout=0.05)
+            flight.do('k', lambda: 'first')
+            # Отдельное открытие файла ведёт себя для flock как другой процесс
+            with open(glob.glob(os.path.join(lock_dir, '*.lock'))[0]) as other:
+                fcntl.flock(other, fcntl.LOCK_EX)
+                self.assertEqual(flight.do('k', lambda: 'new', stale='old'), 'old')
+                self.assertEqual(flight.stats()['timeouts'], 0)
+                self.assertEqual(flight.do('k', lambda: 'new'), 'new')
+                self.assertEqual(flight.stats()['timeouts'], 1)
+    
+    def test_expired_entry_served_stale(self) -> None:
+        """Истёкшая запись доступна через get_stale в пределах stale_ttl."""
+        import time
+        from app.cache import TTLCache
+        
+        cache = TTLCache(4, 0.01, stale_ttl=60)
+        cache.set('k', 'v')
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('k'))
+        self.assertEqual(cache.get_stale('k'), ('v', True))
+        self.assertNotIn('k', cache)
+
+
+class TestSharedCache(unittest.TestCase):
+    """Тесты кэша, общего для процессов, и двоичной сериализации моделей."""
+    
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.db')
+    
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+    
+    def _cache(self, max_bytes: int = 1 << 20):
+        from app.cache import SharedCache
+        from app.models import codec
+        return SharedCache(self.path, 'posts', 100, 60, max_bytes, codec.dumps, codec.loads)
+    
+    def test_codec_roundtrip(self) -> None:
+        """Модели восстанавливаются без потерь, автор остаётся общим объектом."""
+        from datetime import datetime, timezone
+        from markupsafe import Markup
+        from app.models import CompactPost, Post, User, codec, shared_author
+        
+        post = CompactPost.from_post(Post(
+            1, 2, 'Заголовок', 'Текст', datetime(2026, 1, 2, 3, 4, 5, 6),
+            author_login='alice', author_discriminator='1234', author_roles=('user',)
+        ))
+        user = User(7, 'bob', '0001', 'hash', datetime(2026, 1, 1, tzinfo=timezone.utc), _roles=('admin',))
+        value = {'post': post, 'user': user, 'html': Markup('<b>x</b>'), 'n': [-1, 2.5, None]}
+        
+        restored = codec.loads(codec.dumps(value))
+        self.assertEqual(restored, value)
+        self.assertIs(restored['post'].author, shared_author('alice', '1234', ('user',)))
+        self.assertIsInstance(restored['html'], Markup)
+        import pickle
+        self.assertLess(len(codec.dumps(post)), len(pickle.dumps(post)) // 2)
+        with self.assertRaises(TypeError):
+            codec.dumps(object())
+        with self.assertRaises(ValueError):
+            codec.loads(codec.dumps(post)[:-3])
+    
+    def test_workers_share_entries_and_generation(self) -> None:
+        """Запись, сброс и удаление видны другому «воркеру» с тем же файлом."""
+        first, second = self._cache(), self._cache()
+        first.set(1, ('post', 1))
+        self.assertEqual(second.get(1), ('post', 1))
+        
+        second.invalidate(1)
+        self.assertIsNone(first.get(1))
+        
+        first.set(2, 'two')
+        second.clear()
+        self.assertNotIn(2, first)
+        self.assertEqual(len(first), 0)
+    
+    def test_evicts_least_recently_read_by_bytes(self) -> None:
+        """При превышении бюджета в байтах вытесняются давно не читавшиеся записи."""
+        cache = self._cache(max_bytes=1000)
+        cache.touch_interval = 0
+        for key in range(4):
+            cache.set(key, 'x' * 200)
+        cache.get(0)
+        cache.set(4, 'x' * 200)
+        
+        self.assertIn(0, cache)
+        self.assertNotIn(1, cache)
+        self.assertLessEqual(cache.stats()['bytes'], 1000)
+        self.assertGreater(cache.stats()['evictions'], 0)
+    
+    def test_posts_shared_between_apps(self) -> None:
+        """Пост, загруженный одним приложением, второе берёт из общего файла."""
+        from unittest import mock
+        
+        db_path = os.path.join(self.tmp.name, 'blog.db')
+        migrate_database(db_path)
+        config = type('SharedConfig', (TestConfig,), {
+            'DATABASE_URL': f'sqlite:///{db_path}', 'SHARED_CACHE_PATH': self.path
+        })
+        first, second = create_app(config), create_app(config)
+        
+        with first.app_context():
+            _, _, user = first.auth_service.register_user('alice', 'secret123')
+            _, _, post = first.post_service.create_post(user.id, 'Shared', 'Body')
+            first.post_service.get_post_by_id(post.id)
+        
+        with second.app_context(), mock.patch.object(second.post_repo, 'find_by_id') as find_by_id:
+            cached = second.post_service.get_post_by_id(post.id)
+            find_by_id.assert_not_called()
+        self.assertEqual(cached.title, 'Shared')
+        self.assertEqual(cached.author_login, 'alice')
+
+
+class TestQueryCache(DatabaseTestCase):
+    """Тесты кэша результатов запросов с версиями таблиц."""
+    
+    config_overrides = {'QUERY_CACHE_SIZE': 128}
+    
+    def setUp(self) -> None:
+        super().setUp()
+        with self.app.app_context():
+            _, _, self.user = self.app.auth_service.register_user('alice', 'secret123')
+    
+    def test_repository_write_invalidates_read(self) -> None:
+        """Повторный подсчёт берётся из кэша, запись в таблицу его сбрасывает."""
+        cache = self.app.query_cache
+        with self.app.app_context():
+            self.assertEqual(self.app.post_repo.count_posts(), 0)
+            self.assertEqual(self.app.post_repo.count_posts(), 0)
+            self.assertEqual(cache.stats()['hits'], 1)
+            
+            self.app.post_service.create_post(self.user.id, 'Hello', 'Body')
+            self.assertEqual(self.app.post_repo.count_posts(), 1)
+            self.assertEqual(cache.stats()['hits'], 1)
+            
+            # Запись в posts не сбрасывает запросы к другим таблицам
+            self.app.user_repo.find_by_id(self.user.id)
+            self.app.post_service.create_post(self.user.id, 'Second', 'Body')
+            hits = cache.stats()['hits']
+            self.assertEqual(self.app.user_repo.find_by_id(self.user.id).roles, self.user.roles)
+            self.assertEqual(cache.stats()['hits'], hits + 1)
+    
+    def test_external_write_detected_by_data_version(self) -> None:
+        """Запись в обход хелперов db.py сбрасывает кэш через data_version."""
+        import sqlite3
+        
+        with self.app.app_context():
+            self.assertEqual(self.app.post_repo.count_posts(), 0)
+            
+            conn = sqlite3.connect(self.db_path)
+            conn.execute(
+                "INSERT INTO posts (title, body, user_id, created_at, updated_at) "
+                "VALUES ('Other', 'Body', ?, datetime('now'), datetime('now'))",
+                (self.user.id,)
+            )
+            conn.commit()
+            conn.close()
+            
+            self.assertEqual(self.app.post_repo.count_posts(), 1)
+            self.assertEqual(self.app.query_cache.stats()['external_writes'], 1)
+
+
+class TestWarmup(DatabaseTestCase):
+    """Тесты прогрева кэшей."""
+    
+    config_overrides = {'POST_CACHE_SIZE': 128, 'PAGE_CACHE_SIZE': 16}
+    
+    def setUp(self) -> None:
+        super().setUp()
+        with self.app.app_context():
+            _, _, user = self.app.auth_service.register_user('alice', 'secret123')
+            for title in ('First', 'Second', 'Third'):
+                self.app.post_service.create_post(user.id, title, 'Body')
+    
+    def test_warm_up_fills_caches_and_reports_coverage(self) -> None:
+        """Прогрев кладёт последние посты и главную страницу в кэши."""
+        from app.warmup import warm_up
+        
+        report = warm_up(self.app, recent_posts=2, listing_pages=0)
+        
+        self.assertEqual((report.posts, report.posts_total, report.authors), (2, 3, 1))
+        self.assertAlmostEqual(report.post_coverage, 2 / 3)
+        self.assertEqual(report.templates, report.templates_total)
+        self.assertEqual(report.pages, ['/'])
+        self.assertEqual(len(self.app.caches['posts']), 2)
+        
+        response = self.app.test_client().get('/')
+        self.assertEqual(response.headers['X-Page-Cache'], 'HIT')
+    
+    def test_warm_up_defaults_render_listing(self) -> None:
+        """Прогрев с настройками по умолчанию рендерит главную и список постов."""
+        from app.warmup import warm_up
+        
+        report = warm_up(self.app)
+        
+        self.assertEqual(report.errors, [])
+        self.assertEqual(report.pages, ['/', '/posts'])
+        response = self.app.test_client().get('/posts')
+        self.assertEqual(response.headers['X-Page-Cache'], 'HIT')
+        self.assertIn('Third', response.get_data(as_text=True))
+    
+    def test_warm_command(self) -> None:
+        """Команда flask warm печатает отчёт."""
+        result = self.app.test_cli_runner().invoke(args=['warm', '--posts', '5', '--pages', '0'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('посты 3/3 (100%)', result.output)
+
+
+class TestNegativeCache(unittest.TestCase):
+    """Тесты кэша отсутствующих записей с фильтром Блума."""
+    
+    def setUp(self) -> None:
+        import sqlite3
+        
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY)")
+            conn.executemany("INSERT INTO items (id) VALUES (?)", [(i,) for i in range(1, 11)])
+    
+    def tearDown(self) -> None:
+        os.unlink(self.db_path)
+    
+    def _insert(self, record_id: int) -> None:
+        import sqlite3
+        
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO items (id) VALUES (?)", (record_id,))
+    
+    def _load_ids(self) -> list[int]:
+        import sqlite3
+        
+        with sqlite3.connect(self.db_path) as conn:
+            return [row[0] for row in conn.execute("SELECT id FROM items")]
+    
+    def test_insert_in_other_process_not_reported_missing(self) -> None:
+        """Своя вставка не делает фильтр ответственным за чужие новые ID."""
+        from app.cache import NegativeCache
+        
+        worker_a = NegativeCache('a', 100, 60, self._load_ids)
+        worker_b = NegativeCache('b', 100, 60, self._load_ids)
+        # Первое обращение строит фильтры по ID 1..10
+        self.assertFalse(worker_a.is_missing(5))
+        self.assertFalse(worker_b.is_missing(5))
+        
+        self._insert(12)
+        worker_a.add(12)
+        self._insert(11)
+        worker_b.add(11)
+        
+        self.assertFalse(worker_a.is_missing(11))
+        self.assertFalse(worker_a.is_missing(12))
+        self.assertFalse(worker_b.is_missing(12))
+        
+        # После перестройки фильтр знает ID обоих процессов
+        self.assertTrue(worker_a.rebuild())
+        self.assertFalse(worker_a.is_missing(11))
+        self.assertEqual(worker_a.stats()['max_id'], 12)
+
+
+class TestAccountSelection(DatabaseTestCase):
+    """Тесты выбора аккаунта при нескольких аккаунтах с одним логином."""
+    
+    config_overrides = {'WTF_CSRF_ENABLED': True}
+    
+    def setUp(self) -> None:
+        super().setUp()
+        with self.app.app_context():
+            for _ in range(2):
+                self.app.auth_service.register_user('bob', 'secret123')
+    
+    def test_select_account_form_passes_csrf(self) -> None:
+        """Форма выбора аккаунта отправляется с включённой CSRF защитой."""
+        response = self.client.post('/auth/login', data={
+            'login': 'bob', 'password': 'secret123', 'csrf_token': self.csrf_token('/auth/login')
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.headers['Location'].endswith('/auth/select-account'))
+        
+        token = self.csrf_token('/auth/select-account')
+        with self.client.session_transaction() as session:
+            user_id = session['available_accounts'][0]['user_id']
+        
+        response = self.client.post(
+            '/auth/select-account', data={'user_id': user_id, 'csrf_token': token}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('auth_token=', ' '.join(response.headers.getlist('Set-Cookie')))
+    
+    def test_register_form_passes_csrf(self) -> None:
+        """Форма регистрации отправляется с включённой CSRF защитой."""
+        response = self.client.post('/auth/register', data={
+            'login': 'alice',
+            'password': 'secret123',
+            'password_confirm': 'secret123',
+            'csrf_token': self.csrf_token('/auth/register'),
+        })
+        self.assertEqual(response.status_code, 302)
+
+
+class TestLogoutAll(DatabaseTestCase):
+    """Тесты выхода на всех устройствах."""
+    
+    config_overrides = {'WTF_CSRF_ENABLED': True}
+    
+    def test_logout_all_requires_post_with_csrf(self) -> None:
+        """Выход на всех устройствах — POST форма с CSRF токеном."""
+        with self.app.app_context():
+            self.app.auth_service.register_user('bob', 'secret123')
+        self.client.post('/auth/login', data={
+            'login': 'bob', 'password': 'secret123', 'csrf_token': self.csrf_token('/auth/login')
+        })
+        
+        self.assertEqual(self.client.get('/auth/logout-all').status_code, 405)
+        self.assertEqual(self.client.post('/auth/logout-all').status_code, 400)
+        
+        token = self.csrf_token('/')
+        response = self.client.post('/auth/logout-all', data={'csrf_token': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('auth_token=;', ' '.join(response.headers.getlist('Set-Cookie')))
 
 
 if __name__ == '__main__':